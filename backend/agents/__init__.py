@@ -1,7 +1,7 @@
 from .profile_agent import run_profile_agent
-from .preprocessor_agent import run_preprocessor_agent
+from .preprocessor_agent import run_preprocessor_agent, next_preprocess_state
 from .baseline_agent import run_baseline_agent
-from .anomaly_agent import run_anomaly_agent
+from .anomaly_agent import run_anomaly_agent, run_fast_path_screen
 from .validator_agent import run_validator_agent
 from .summarizer_agent import run_summarizer_agent
 from .comparison_agent import run_comparison_agent
@@ -11,8 +11,10 @@ from .rulebook_editor_agent import run_rulebook_editor_agent
 __all__ = [
     "run_profile_agent",
     "run_preprocessor_agent",
+    "next_preprocess_state",
     "run_baseline_agent",
     "run_anomaly_agent",
+    "run_fast_path_screen",
     "run_validator_agent",
     "run_summarizer_agent",
     "run_comparison_agent",
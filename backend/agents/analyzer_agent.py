@@ -2,28 +2,14 @@ import time
 import logging
 
 from models.compliance import Regulation
-from models.user import UserProfile, UserBaseline
 from models.agent_log import AgentLogEntry
 from utils.llm import call_llm, MODEL_PRO
-from utils.database import get_all_profiles, get_all_baselines
+from utils.jurisdiction_stats import get_jurisdiction_summary, regulation_thresholds
 
 logger = logging.getLogger(__name__)
 
-
-def _load_users_for_jurisdiction(jurisdiction_code: str) -> list[tuple[UserProfile, UserBaseline | None]]:
-    profiles = get_all_profiles()
-    baselines = get_all_baselines()
-    baseline_map = {b["user_id"]: b for b in baselines}
-    result = []
-
-    for u in profiles:
-        if u["country"] == jurisdiction_code:
-            profile = UserProfile(**u)
-            baseline_data = baseline_map.get(u["user_id"])
-            baseline = UserBaseline(**baseline_data) if baseline_data else None
-            result.append((profile, baseline))
-
-    return result
+# Cached while the jurisdiction's population summary is unchanged.
+USE_LLM_CACHE = True
 
 
 async def run_analyzer_agent(
@@ -34,14 +20,8 @@ async def run_analyzer_agent(
 ) -> tuple[str, AgentLogEntry]:
     start = time.time()
 
-    users_data = _load_users_for_jurisdiction(jurisdiction_code)
-
-    user_baselines_text = "\n".join([
-        f"- {p.user_id} ({p.full_name}): avg tx ${b.avg_tx_amount_usd if b else 'N/A'}, "
-        f"avg daily ${b.avg_daily_total_usd if b else 'N/A'}, "
-        f"{b.avg_tx_per_day if b else 'N/A'} tx/day, income: {p.income_level}"
-        for p, b in users_data
-    ])
+    thresholds = regulation_thresholds(f"{new_regulation.update_title}. {new_regulation.summary}")
+    population = await get_jurisdiction_summary(jurisdiction_code, thresholds)
 
     old_regs_text = "\n".join([
         f"- {r.update_title}: {r.summary}"
@@ -60,8 +40,8 @@ New regulation:
 - {new_regulation.update_title}: {new_regulation.summary}
 - Effective: {new_regulation.date_effective}
 
-User baselines in this jurisdiction (current behavior):
-{user_baselines_text}
+User population in this jurisdiction (current behavior, aggregated baselines):
+{population.to_prompt()}
 
 Analyze:
 1. How many users would be affected by the new regulation? Be specific.
@@ -79,12 +59,14 @@ Return as a structured analysis paragraph (4-6 sentences). No JSON, just text.""
             json_mode=False,
             temperature=0.3,
             model=MODEL_PRO,
+            use_cache=USE_LLM_CACHE,
         )
         impact_analysis = impact_analysis.strip().strip('"')
 
     except Exception as e:
         logger.warning(f"Analyzer LLM failed: {e}")
-        num_users = len(users_data)
+        affected = population.users_above_threshold
+        num_users = population.user_count if affected is None else affected
         impact_analysis = (
             f"{num_users} users in {jurisdiction} would be affected by {new_regulation.update_title}. "
             f"Users may attempt to structure transactions below new thresholds or shift activity to "
@@ -95,13 +77,16 @@ Return as a structured analysis paragraph (4-6 sentences). No JSON, just text.""
 
     duration_ms = int((time.time() - start) * 1000)
 
-    num_affected = len(users_data)
+    num_users = population.user_count
+    num_affected = population.users_above_threshold
+    if num_affected is None:
+        num_affected = num_users
     log = AgentLogEntry(
         agent="Analyzer Agent",
         icon="📊",
         status="alert",
         message=(
-            f"Impact analysis complete — {num_affected}/{num_affected} {jurisdiction} users affected, "
+            f"Impact analysis complete — {num_affected}/{num_users} {jurisdiction} users affected, "
             f"estimated compliance cost increase"
         ),
         duration_ms=max(duration_ms, 50),
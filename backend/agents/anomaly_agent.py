@@ -1,91 +1,119 @@
 """Anomaly Detector Agent — LLM agent that reasons about anomalies."""
 
+import os
 import json
 import time
 import logging
 
 from models.user import UserProfile, UserBaseline
-from models.transaction import PreprocessedTransaction
 from models.compliance import Rulebook
 from models.risk import AnomalyResult
 from models.agent_log import AgentLogEntry
+from agents.preprocessor_agent import PreprocessedBatch
 from utils.llm import call_llm_json, MODEL_PRO
-from utils.geo import calculate_min_travel_hours
+from utils.rule_engine import get_compiled_rulebook
 
 logger = logging.getLogger(__name__)
 
+# Prompts embed each batch's fresh transactions; hits would never occur.
+USE_LLM_CACHE = False
+
 JURISDICTION_MAP = {"MT": "Malta", "AE": "UAE", "KY": "Cayman Islands"}
 
+# Tiered detection: the deterministic scorer runs first and only batches scoring
+# above FAST_PATH_MAX_SCORE, or within FAST_PATH_BAND_MARGIN points of a band
+# boundary, are escalated to the LLM detector and validator.
+FAST_PATH_ENABLED = os.getenv("ANOMALY_FAST_PATH", "true").lower() in ("1", "true", "yes")
+FAST_PATH_MAX_SCORE = int(os.getenv("ANOMALY_FAST_PATH_MAX_SCORE", "10"))
+FAST_PATH_BAND_MARGIN = int(os.getenv("ANOMALY_FAST_PATH_BAND_MARGIN", "5"))
+BAND_BOUNDARIES = (25, 50, 75)
+
 
 def _deterministic_fallback(
-    preprocessed: list[PreprocessedTransaction],
+    preprocessed: PreprocessedBatch,
     baseline: UserBaseline,
     profile: UserProfile,
     rulebook: Rulebook,
+    jurisdiction_version: str | None = None,
 ) -> AnomalyResult:
-    """Deterministic point-based fallback if LLM fails."""
-    total_points = 0
-    flags = []
-    regulations = []
-
-    for ptx in preprocessed:
-        # Amount checks
-        if baseline.avg_tx_amount_usd > 0:
-            ratio = ptx.transaction_amount_usd / baseline.avg_tx_amount_usd
-            if ratio > 5:
-                total_points += 55
-                flags.append(f"Single tx ${ptx.transaction_amount_usd:,.0f} > 5× avg ${baseline.avg_tx_amount_usd:,.0f} [+55pts]")
-            elif ratio > 3:
-                total_points += 35
-                flags.append(f"Single tx ${ptx.transaction_amount_usd:,.0f} > 3× avg ${baseline.avg_tx_amount_usd:,.0f} [+35pts]")
-
-        # Daily total check
-        if baseline.avg_daily_total_usd > 0 and ptx.daily_total_usd > 2 * baseline.avg_daily_total_usd:
-            total_points += 30
-            flags.append(f"Daily total ${ptx.daily_total_usd:,.0f} > 2× avg daily ${baseline.avg_daily_total_usd:,.0f} [+30pts]")
-
-        # Geo checks
-        if ptx.is_new_country:
-            total_points += 45
-            flags.append(f"New country {ptx.transaction_country} never seen in history [+45pts]")
-
-        if ptx.distance_km > 500 and ptx.time_since_last_sec > 0:
-            min_hours = calculate_min_travel_hours(ptx.distance_km)
-            if ptx.actual_travel_hours < min_hours:
-                speed = ptx.distance_km / max(ptx.actual_travel_hours, 0.01)
-                total_points += 60
-                flags.append(f"Impossible geo hop: {speed:,.0f} km/h exceeds 800 km/h threshold [+60pts]")
-
-        # Frequency check
-        if baseline.avg_tx_per_day > 0 and ptx.tx_count_per_day > 2 * baseline.avg_tx_per_day:
-            total_points += 35
-            flags.append(f"Frequency spike: {ptx.tx_count_per_day} tx/day > 2× avg {baseline.avg_tx_per_day} [+35pts]")
-
-    # Remove duplicate flags
-    flags = list(dict.fromkeys(flags))
-    risk_score = min(total_points, 100)
-
-    if risk_score >= 75:
-        risk_band = "HIGH"
-    elif risk_score >= 50:
-        risk_band = "MEDIUM"
-    elif risk_score >= 25:
-        risk_band = "LOW"
-    else:
-        risk_band = "CLEAN"
+    """Deterministic point-based fallback if LLM fails, scored by the compiled rulebook."""
+    compiled = get_compiled_rulebook(rulebook, profile.country, jurisdiction_version)
+    scored = compiled.score(preprocessed, baseline, profile)
 
     return AnomalyResult(
-        is_anomaly=risk_score >= 25,
-        risk_score=risk_score,
-        risk_band=risk_band,
-        flags=flags,
-        reasoning=f"Deterministic analysis: {len(flags)} flags detected with total score {risk_score}/100.",
-        regulations_violated=regulations,
+        is_anomaly=scored.risk_score >= 25,
+        risk_score=scored.risk_score,
+        risk_band=scored.risk_band,
+        flags=scored.flags,
+        reasoning=f"Deterministic analysis: {len(scored.flags)} flags detected with total score {scored.risk_score}/100.",
+        regulations_violated=[],
     )
 
 
+def _robust_baseline_lines(baseline: UserBaseline) -> str:
+    summary = (baseline.stream_stats or {}).get("summary") or {}
+    lines = []
+    amount = summary.get("amount")
+    if amount:
+        lines.append(
+            f"- Amount median ${amount['median']} (MAD ${amount['mad']}), "
+            f"p95 ${amount['p95']}, p99 ${amount['p99']}"
+        )
+    daily = summary.get("daily_total")
+    if daily:
+        lines.append(f"- Daily total median ${daily['median']}, p95 ${daily['p95']}, p99 ${daily['p99']}")
+    if baseline.excluded_anomalies_count:
+        lines.append(f"- Outliers excluded from baseline: {baseline.excluded_anomalies_count}")
+    return "\n".join(lines)
+
+
+def _near_band_boundary(score: int) -> bool:
+    return any(abs(score - boundary) <= FAST_PATH_BAND_MARGIN for boundary in BAND_BOUNDARIES)
+
+
+def run_fast_path_screen(
+    preprocessed: PreprocessedBatch,
+    baseline: UserBaseline,
+    profile: UserProfile,
+    rulebook: Rulebook,
+    jurisdiction_version: str | None = None,
+) -> tuple[AnomalyResult, AgentLogEntry] | None:
+    """
+    Deterministic first tier of anomaly detection.
+
+    Returns the deterministic result and its log entry when the batch is
+    clearly clean, or None when it must be escalated to run_anomaly_agent
+    (including whenever the rulebook has rules the engine cannot compile).
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+
+    start = time.time()
+    # Rules the engine could not compile were not scored; only the LLM can judge them.
+    if get_compiled_rulebook(rulebook, profile.country, jurisdiction_version).unmatched:
+        return None
+    result = _deterministic_fallback(preprocessed, baseline, profile, rulebook, jurisdiction_version)
+    if result.risk_score > FAST_PATH_MAX_SCORE or _near_band_boundary(result.risk_score):
+        return None
+
+    duration_ms = int((time.time() - start) * 1000)
+
+    log = AgentLogEntry(
+        agent="Anomaly Detector Agent",
+        icon="🚨",
+        status="success",
+        message=(
+            f"No anomaly — Risk: {result.risk_score}/100 {result.risk_band} | "
+            f"{len(result.flags)} flags | deterministic fast path, LLM review skipped"
+        ),
+        duration_ms=max(duration_ms, 5),
+    )
+
+    return result, log
+
+
 async def run_anomaly_agent(
-    preprocessed: list[PreprocessedTransaction],
+    preprocessed: PreprocessedBatch,
     baseline: UserBaseline,
     profile: UserProfile,
     rulebook: Rulebook,
@@ -139,7 +167,7 @@ You must return ONLY valid JSON with the specified format."""
 - Avg tx per day: {baseline.avg_tx_per_day}
 - Std deviation: ${baseline.std_dev_amount}
 - Normal hours: {baseline.normal_hour_range}
-
+{_robust_baseline_lines(baseline)}
 ## Today's Preprocessed Transactions
 {chr(10).join(tx_details)}
 
@@ -182,6 +210,7 @@ Return as JSON:
             user_prompt=user_prompt,
             temperature=0.3,
             model=MODEL_PRO,
+            use_cache=USE_LLM_CACHE,
         )
 
         anomaly_result = AnomalyResult(
@@ -195,7 +224,7 @@ Return as JSON:
 
     except Exception as e:
         logger.warning(f"Anomaly LLM failed, using fallback: {e}")
-        anomaly_result = _deterministic_fallback(preprocessed, baseline, profile, rulebook)
+        anomaly_result = _deterministic_fallback(preprocessed, baseline, profile, rulebook, jurisdiction_version)
 
     duration_ms = int((time.time() - start) * 1000)
 
@@ -1,148 +1,65 @@
 import time
 import logging
-import statistics
-from datetime import datetime
 
 from models.user import UserProfile, UserBaseline
 from models.transaction import RawTransaction
 from models.agent_log import AgentLogEntry
-from utils.llm import call_llm_json, MODEL_FAST
-from utils.database import get_baseline, upsert_baseline
+from utils.async_database import get_baseline, upsert_baseline, get_historical_transactions
+from utils.baseline_stats import BaselineStats, STATS_SCHEMA_VERSION, derive_baseline
 
 logger = logging.getLogger(__name__)
 
 
-def _compute_fallback_baseline(
-    user_id: str,
-    transactions: list[RawTransaction],
-    existing_baseline: UserBaseline | None = None,
-) -> UserBaseline:
-    if not transactions:
-        if existing_baseline:
-            return existing_baseline
-        return UserBaseline(
-            user_id=user_id,
-            avg_tx_amount_usd=100.0,
-            avg_daily_total_usd=300.0,
-            avg_tx_per_day=3,
-            std_dev_amount=30.0,
-            normal_hour_range=[9, 18],
-            excluded_anomalies_count=0,
-        )
-
-    amounts = [tx.transaction_amount_usd for tx in transactions]
-    avg_amount = statistics.mean(amounts) if amounts else 100.0
-    std_dev = statistics.stdev(amounts) if len(amounts) > 1 else 30.0
-
-    daily_totals: dict[str, float] = {}
-    daily_counts: dict[str, int] = {}
-    hours = []
-
-    for tx in transactions:
-        try:
-            ts = datetime.fromisoformat(tx.timestamp.replace("Z", "+00:00"))
-            date_key = ts.strftime("%Y-%m-%d")
-            hours.append(ts.hour)
-        except Exception:
-            date_key = "unknown"
-
-        daily_totals[date_key] = daily_totals.get(date_key, 0) + tx.transaction_amount_usd
-        daily_counts[date_key] = daily_counts.get(date_key, 0) + 1
-
-    avg_daily = statistics.mean(daily_totals.values()) if daily_totals else 300.0
-    avg_tx_per_day = int(statistics.mean(daily_counts.values())) if daily_counts else 3
-
-    min_hour = min(hours) if hours else 9
-    max_hour = max(hours) if hours else 18
-
-    return UserBaseline(
-        user_id=user_id,
-        avg_tx_amount_usd=round(avg_amount, 2),
-        avg_daily_total_usd=round(avg_daily, 2),
-        avg_tx_per_day=avg_tx_per_day,
-        std_dev_amount=round(std_dev, 2),
-        normal_hour_range=[min_hour, max_hour],
-        excluded_anomalies_count=0,
-    )
-
-
-def _load_existing_baseline(user_id: str) -> UserBaseline | None:
-    data = get_baseline(user_id)
+async def _load_existing_baseline(user_id: str) -> UserBaseline | None:
+    data = await get_baseline(user_id)
     if data:
         return UserBaseline(**data)
     return None
 
 
+async def _bootstrap_stats(user_id: str) -> BaselineStats:
+    """Build streaming statistics from stored history (once per user)."""
+    stats = BaselineStats()
+    try:
+        history = await get_historical_transactions(user_id)
+    except Exception as e:
+        logger.warning(f"Baseline bootstrap could not load history for {user_id}: {e}")
+        return stats
+
+    for tx in history:
+        stats.observe(float(tx["transaction_amount_usd"]), str(tx["timestamp"]))
+    return stats
+
+
 async def run_baseline_agent(
     user_id: str,
     transactions: list[RawTransaction],
     profile: UserProfile,
 ) -> tuple[UserBaseline, AgentLogEntry]:
+    """
+    Agent 3: Baseline Calculator Agent (Local)
+    Folds the batch into the user's streaming statistics and derives the baseline.
+    """
     start = time.time()
-    existing_baseline = _load_existing_baseline(user_id)
-
-    tx_list = "\n".join([
-        f"- ${tx.transaction_amount_usd:.2f} {tx.transaction_currency} ({tx.transaction_type}) "
-        f"at {tx.timestamp} from {tx.transaction_city}, {tx.transaction_country}"
-        for tx in transactions
-    ])
-
-    existing_info = ""
-    if existing_baseline:
-        existing_info = f"""
-Previous baseline:
-- Avg tx amount: ${existing_baseline.avg_tx_amount_usd}
-- Avg daily total: ${existing_baseline.avg_daily_total_usd}
-- Avg tx per day: {existing_baseline.avg_tx_per_day}
-- Std deviation: ${existing_baseline.std_dev_amount}
-- Normal hours: {existing_baseline.normal_hour_range}
-"""
-
-    system_prompt = "You are a financial data analyst. Given transaction data for a user, compute their behavioral baseline. Return ONLY valid JSON."
-
-    user_prompt = f"""User: {user_id} ({profile.full_name}), {profile.country}, {profile.income_level} income, {profile.occupation}
-{existing_info}
-Current batch transactions:
-{tx_list}
-
-Compute and return as JSON:
-{{
-  "avg_tx_amount_usd": <average transaction amount as float>,
-  "avg_daily_total_usd": <average total spent per day as float>,
-  "avg_tx_per_day": <average number of transactions per day as integer>,
-  "std_dev_amount": <standard deviation of transaction amounts as float>,
-  "normal_hour_range": [<earliest_typical_hour>, <latest_typical_hour>],
-  "excluded_anomalies_count": <how many transactions you'd exclude as outliers as integer>
-}}
-
-If there's a previous baseline, weight it 70% and the new data 30% to create a blended baseline.
-Return ONLY valid JSON, no explanation."""
+    existing_baseline = await _load_existing_baseline(user_id)
+
+    stats = None
+    if existing_baseline and existing_baseline.stream_stats:
+        stats = BaselineStats.from_dict(existing_baseline.stream_stats)
+        if stats.schema_version != STATS_SCHEMA_VERSION:
+            stats = None
+    if stats is not None:
+        source = "streaming stats"
+    else:
+        stats = await _bootstrap_stats(user_id)
+        source = f"history bootstrap ({stats.amount_sketch.n} tx)"
 
-    try:
-        result = await call_llm_json(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            temperature=0.1,
-            model=MODEL_FAST,
-        )
-
-        baseline = UserBaseline(
-            user_id=user_id,
-            avg_tx_amount_usd=round(float(result.get("avg_tx_amount_usd", 100)), 2),
-            avg_daily_total_usd=round(float(result.get("avg_daily_total_usd", 300)), 2),
-            avg_tx_per_day=int(result.get("avg_tx_per_day", 3)),
-            std_dev_amount=round(float(result.get("std_dev_amount", 30)), 2),
-            normal_hour_range=result.get("normal_hour_range", [9, 18]),
-            excluded_anomalies_count=int(result.get("excluded_anomalies_count", 0)),
-        )
-        source = "LLM"
+    for tx in transactions:
+        stats.observe(tx.transaction_amount_usd, tx.timestamp)
 
-    except Exception as e:
-        logger.warning(f"Baseline LLM failed, using fallback: {e}")
-        baseline = _compute_fallback_baseline(user_id, transactions, existing_baseline)
-        source = "fallback"
+    baseline = derive_baseline(user_id, stats, existing_baseline)
 
-    upsert_baseline(baseline)
+    await upsert_baseline(baseline)
 
     duration_ms = int((time.time() - start) * 1000)
 
@@ -155,7 +72,8 @@ Return ONLY valid JSON, no explanation."""
             f"avg ${baseline.avg_tx_amount_usd:.0f}/tx, "
             f"${baseline.avg_daily_total_usd:.0f}/day, "
             f"{baseline.avg_tx_per_day} tx/day, "
-            f"σ=${baseline.std_dev_amount:.0f}"
+            f"σ=${baseline.std_dev_amount:.0f}, "
+            f"{baseline.excluded_anomalies_count} outliers excluded"
         ),
         duration_ms=max(duration_ms, 50),
     )
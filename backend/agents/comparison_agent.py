@@ -10,6 +10,9 @@ from utils.llm import call_llm_json, MODEL_FAST
 
 logger = logging.getLogger(__name__)
 
+# Same old/new regulation set produces the same prompt on a re-push.
+USE_LLM_CACHE = True
+
 
 async def run_comparison_agent(
     old_regulations: list[Regulation],
@@ -57,6 +60,7 @@ Return as JSON:
             user_prompt=user_prompt,
             temperature=0.3,
             model=MODEL_FAST,
+            use_cache=USE_LLM_CACHE,
         )
         raw_points = result.get("comparison_points", [])
         if not isinstance(raw_points, list):
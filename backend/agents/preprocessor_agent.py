@@ -1,33 +1,292 @@
 """Preprocessor Agent — Local/deterministic enrichment of raw transactions."""
 
+import os
 import time
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import NamedTuple, Union
+
+import numpy as np
 
 from models.user import UserProfile
-from models.transaction import RawTransaction, PreprocessedTransaction
+from models.transaction import RawTransaction, PreprocessedTransaction, PreprocessState
 from models.agent_log import AgentLogEntry
-from utils.geo import get_distance_between_countries, calculate_min_travel_hours
+from utils.geo import (
+    distance_matrix,
+    location_index,
+    get_distance_between_locations,
+    calculate_min_travel_hours,
+)
 
+# Batches at least this large use the columnar (NumPy) path.
+PREPROCESS_COLUMNAR_MIN_BATCH = int(os.getenv("PREPROCESS_COLUMNAR_MIN_BATCH", "256"))
 
-def run_preprocessor_agent(
+_EPOCH_AWARE = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+
+
+class PreprocessedRow(NamedTuple):
+    """A PreprocessedTransaction's fields without per-row Pydantic validation."""
+
+    user_id: str
+    timestamp: str
+    transaction_amount_usd: float
+    transaction_currency: str
+    transaction_type: str
+    transaction_country: str
+    transaction_city: str
+    hour_of_day: int
+    time_since_last_sec: int
+    previous_country: str
+    previous_timestamp: str
+    distance_km: float
+    actual_travel_hours: float
+    daily_total_usd: float
+    tx_count_per_day: int
+    is_new_country: bool
+
+    def model_dump(self) -> dict:
+        return self._asdict()
+
+    def to_model(self) -> PreprocessedTransaction:
+        return PreprocessedTransaction(**self._asdict())
+
+
+@dataclass
+class PreprocessedColumns:
+    """
+    Columnar preprocessing output: one array per computed field, aligned with
+    `transactions`. Values are unrounded; rows and models get the same
+    rounding as the per-row path.
+
+    Indexing and iteration yield PreprocessedRow, which carries the attributes
+    (and model_dump) of PreprocessedTransaction, so the rule engine, prompts
+    and storage read the batch without building Pydantic models. `to_models`
+    builds them for callers that need real models.
+    """
+
+    transactions: list[RawTransaction]
+    previous_country: list[str]
+    previous_timestamp: list[str]
+    hour_of_day: np.ndarray
+    time_since_last_sec: np.ndarray
+    distance_km: np.ndarray
+    actual_travel_hours: np.ndarray
+    daily_total_usd: np.ndarray
+    tx_count_per_day: np.ndarray
+    is_new_country: np.ndarray
+    _rows: list[PreprocessedRow] | None = field(default=None, init=False, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def __iter__(self):
+        return iter(self.rows())
+
+    def __getitem__(self, index):
+        return self.rows()[index]
+
+    def to_models(self) -> list[PreprocessedTransaction]:
+        return [row.to_model() for row in self.rows()]
+
+    def rows(self) -> list[PreprocessedRow]:
+        if self._rows is None:
+            self._rows = self._build_rows()
+        return self._rows
+
+    def _build_rows(self) -> list[PreprocessedRow]:
+        return [
+            PreprocessedRow(
+                tx.user_id,
+                tx.timestamp,
+                tx.transaction_amount_usd,
+                tx.transaction_currency,
+                tx.transaction_type,
+                tx.transaction_country,
+                tx.transaction_city,
+                hour,
+                since,
+                prev_country,
+                prev_timestamp,
+                distance,
+                round(travel_hours, 2),
+                round(daily_total, 2),
+                daily_count,
+                is_new,
+            )
+            for tx, prev_country, prev_timestamp, hour, since, distance, travel_hours, daily_total, daily_count, is_new in zip(
+                self.transactions,
+                self.previous_country,
+                self.previous_timestamp,
+                self.hour_of_day.tolist(),
+                self.time_since_last_sec.tolist(),
+                self.distance_km.tolist(),
+                self.actual_travel_hours.tolist(),
+                self.daily_total_usd.tolist(),
+                self.tx_count_per_day.tolist(),
+                self.is_new_country.tolist(),
+            )
+        ]
+
+
+# What run_preprocessor_agent returns: models from the per-row path, columns
+# from the NumPy path. Both are sequences of PreprocessedTransaction-shaped rows.
+PreprocessedBatch = Union[list[PreprocessedTransaction], PreprocessedColumns]
+
+
+def preprocess_columns(
     transactions: list[RawTransaction],
     profile: UserProfile,
-) -> tuple[list[PreprocessedTransaction], AgentLogEntry]:
+    state: PreprocessState | None = None,
+) -> PreprocessedColumns | None:
     """
-    Agent 2: Preprocessor Agent (Local)
-    Enriches raw transactions with computed fields.
+    Compute the preprocessor fields with array operations.
+
+    Returns None when a timestamp cannot be parsed or naive and offset-aware
+    timestamps are mixed; the per-row path handles those cases.
     """
-    start = time.time()
+    prev_country, prev_city, prev_timestamp = _initial_previous(profile, state)
+    has_prev = bool(prev_timestamp)
+
+    # Index 0 holds the carried-over previous transaction when there is one,
+    # so deltas and distances for the whole batch come from one diff.
+    timestamps = ([prev_timestamp] if has_prev else []) + [tx.timestamp for tx in transactions]
+    n = len(transactions)
+    offset = int(has_prev)
+    epoch_us = np.empty(n + offset, dtype=np.int64)
+    hours = np.empty(n + offset, dtype=np.int64)
+    days = np.empty(n + offset, dtype=np.int64)
+    aware = None
+
+    # Each timestamp is parsed exactly once.
+    for i, timestamp in enumerate(timestamps):
+        try:
+            ts = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except Exception:
+            return None
+        is_aware = ts.utcoffset() is not None
+        if aware is None:
+            aware = is_aware
+        elif aware != is_aware:
+            return None
+        epoch_us[i] = (ts - (_EPOCH_AWARE if is_aware else _EPOCH_NAIVE)) // _ONE_US
+        hours[i] = ts.hour
+        days[i] = ts.toordinal()
+
+    amounts = np.fromiter((tx.transaction_amount_usd for tx in transactions), dtype=np.float64, count=n)
+    countries = [tx.transaction_country for tx in transactions]
+
+    # Time since previous transaction (whole seconds, never negative)
+    time_since = np.zeros(n, dtype=np.int64)
+    if n + offset > 1:
+        delta_us = np.diff(epoch_us)
+        time_since[1 - offset:] = np.where(delta_us > 0, delta_us // 1_000_000, 0)
+    travel_hours = np.where(time_since > 0, time_since / 3600.0, 0.0)
+
+    # Running daily totals and counts: cumulative sums within each calendar
+    # date, in transaction order (sequential, so sums match the per-row path).
+    # The stored running total for the state's day seeds that day's sum.
+    seed_day = date.fromisoformat(state.day_key).toordinal() if state and state.day_key else None
+    tx_days = days[offset:]
+    daily_total = np.empty(n, dtype=np.float64)
+    daily_count = np.empty(n, dtype=np.int64)
+    if n:
+        order = np.argsort(tx_days, kind="stable")
+        sorted_days = tx_days[order]
+        bounds = np.flatnonzero(np.r_[True, sorted_days[1:] != sorted_days[:-1], True])
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            idx = order[lo:hi]
+            if sorted_days[lo] == seed_day:
+                daily_total[idx] = np.cumsum(np.r_[state.day_total_usd, amounts[idx]])[1:]
+                daily_count[idx] = np.arange(1, hi - lo + 1) + state.day_tx_count
+            else:
+                daily_total[idx] = np.cumsum(amounts[idx])
+                daily_count[idx] = np.arange(1, hi - lo + 1)
 
+    # Distances from the previous transaction's location, read from the
+    # precomputed city/country distance matrix.
+    places = ([(prev_country, prev_city)] if has_prev else []) + [
+        (tx.transaction_country, tx.transaction_city) for tx in transactions
+    ]
+    locations = [location_index(country, city) for country, city in places]
+    loc_idx = np.fromiter((idx for idx, _ in locations), dtype=np.int64, count=len(places))
+    city_known = np.fromiter((known for _, known in locations), dtype=bool, count=len(places))
+    distance = np.zeros(n, dtype=np.float64)
+    if len(places) > 1:
+        prev_idx, cur_idx = loc_idx[:-1], loc_idx[1:]
+        country_arr = np.array([country.upper() for country, _ in places], dtype=object)
+        same_country = country_arr[:-1] == country_arr[1:]
+        valid = (prev_idx >= 0) & (cur_idx >= 0)
+        valid &= ~same_country | (city_known[:-1] & city_known[1:])
+        distance[1 - offset:] = np.where(
+            valid, distance_matrix()[np.maximum(prev_idx, 0), np.maximum(cur_idx, 0)], 0.0
+        )
+
+    is_new_country = ~np.isin(np.array(countries, dtype=object), list(profile.historical_countries))
+
+    return PreprocessedColumns(
+        transactions=transactions,
+        previous_country=[prev_country] + countries[:-1],
+        previous_timestamp=[prev_timestamp] + [tx.timestamp for tx in transactions[:-1]],
+        hour_of_day=hours[offset:],
+        time_since_last_sec=time_since,
+        distance_km=distance,
+        actual_travel_hours=travel_hours,
+        daily_total_usd=daily_total,
+        tx_count_per_day=daily_count,
+        is_new_country=is_new_country,
+    )
+
+
+def _initial_previous(
+    profile: UserProfile,
+    state: PreprocessState | None,
+) -> tuple[str, str | None, str]:
+    """(country, city, timestamp) of the transaction preceding this batch."""
+    if state and state.last_timestamp:
+        return state.last_country or profile.country, state.last_city or None, state.last_timestamp
+    return profile.country, None, ""
+
+
+def next_preprocess_state(
+    user_id: str,
+    preprocessed: PreprocessedBatch,
+    state: PreprocessState | None = None,
+) -> PreprocessState:
+    """Rolling state after `preprocessed`, to seed the user's next batch."""
+    if not preprocessed:
+        return state or PreprocessState(user_id=user_id)
+
+    last = preprocessed[-1]
+    try:
+        day_key = datetime.fromisoformat(last.timestamp.replace("Z", "+00:00")).strftime("%Y-%m-%d")
+    except Exception:
+        return state or PreprocessState(user_id=user_id)
+
+    return PreprocessState(
+        user_id=user_id,
+        last_timestamp=last.timestamp,
+        last_country=last.transaction_country,
+        last_city=last.transaction_city,
+        day_key=day_key,
+        day_total_usd=last.daily_total_usd,
+        day_tx_count=last.tx_count_per_day,
+    )
+
+
+def _preprocess_rows(
+    transactions: list[RawTransaction],
+    profile: UserProfile,
+    state: PreprocessState | None = None,
+) -> list[PreprocessedTransaction]:
     preprocessed = []
     daily_totals: dict[str, float] = {}
     daily_counts: dict[str, int] = {}
-    prev_country = profile.country
-    prev_timestamp = ""
-    max_distance = 0.0
-    max_time_delta = 0
-    total_daily = 0.0
-    any_new_country = False
+    prev_country, prev_city, prev_timestamp = _initial_previous(profile, state)
+    if state and state.day_key:
+        daily_totals[state.day_key] = state.day_total_usd
+        daily_counts[state.day_key] = state.day_tx_count
 
     for i, tx in enumerate(transactions):
         # Parse timestamp
@@ -52,25 +311,23 @@ def run_preprocessor_agent(
             except Exception:
                 time_since_last_sec = 0
 
-        if time_since_last_sec > 0:
-            max_time_delta = max(max_time_delta, time_since_last_sec)
-
         # Distance calculation — only meaningful when we have a real previous transaction
         # (i.e. prev_timestamp exists). Without it, the "prev_country" is just the user's
         # home country and the distance is misleading for speed/geo-hop analysis.
-        if prev_timestamp and prev_country != tx.transaction_country:
-            distance_km = get_distance_between_countries(prev_country, tx.transaction_country)
+        # City-level when both cities are known, so same-country moves
+        # (e.g. Karachi -> Islamabad) are measured too.
+        if prev_timestamp and (prev_country, prev_city) != (tx.transaction_country, tx.transaction_city):
+            distance_km = get_distance_between_locations(
+                prev_country, prev_city, tx.transaction_country, tx.transaction_city
+            )
         else:
             distance_km = 0.0
-        max_distance = max(max_distance, distance_km)
 
         # Travel time check
         actual_travel_hours = time_since_last_sec / 3600.0 if time_since_last_sec > 0 else 0
         
         # New country check
         is_new_country = tx.transaction_country not in profile.historical_countries
-        if is_new_country:
-            any_new_country = True
 
         ptx = PreprocessedTransaction(
             user_id=tx.user_id,
@@ -93,14 +350,56 @@ def run_preprocessor_agent(
         preprocessed.append(ptx)
 
         prev_country = tx.transaction_country
+        prev_city = tx.transaction_city
         prev_timestamp = tx.timestamp
 
-    duration_ms = int((time.time() - start) * 1000)
+    return preprocessed
+
+
+def run_preprocessor_agent(
+    transactions: list[RawTransaction],
+    profile: UserProfile,
+    state: PreprocessState | None = None,
+    columnar: bool | None = None,
+) -> tuple[PreprocessedBatch, AgentLogEntry]:
+    """
+    Agent 2: Preprocessor Agent (Local)
+    Enriches raw transactions with computed fields.
+
+    `state` carries the user's last transaction and running daily totals over
+    from the previous batch (see next_preprocess_state); without it the batch
+    starts from the user's home country.
+
+    `columnar` forces the NumPy path on or off; by default it is used for
+    batches of PREPROCESS_COLUMNAR_MIN_BATCH transactions or more. That path
+    returns PreprocessedColumns rather than a list of models.
+    """
+    start = time.time()
+
+    if columnar is None:
+        columnar = len(transactions) >= PREPROCESS_COLUMNAR_MIN_BATCH
 
-    # Summary for the last transaction (most relevant for display)
-    last_ptx = preprocessed[-1] if preprocessed else None
-    total_daily = last_ptx.daily_total_usd if last_ptx else 0
-    tx_count = last_ptx.tx_count_per_day if last_ptx else 0
+    columns = preprocess_columns(transactions, profile, state) if columnar else None
+    preprocessed: PreprocessedBatch
+    if columns is not None and len(columns):
+        # Summarise from the arrays so no rows are built here.
+        preprocessed = columns
+        max_distance = float(columns.distance_km.max())
+        max_time_delta = int(columns.time_since_last_sec.max())
+        any_new_country = bool(columns.is_new_country.any())
+        total_daily = round(float(columns.daily_total_usd[-1]), 2)
+        tx_count = int(columns.tx_count_per_day[-1])
+    else:
+        preprocessed = columns if columns is not None else _preprocess_rows(transactions, profile, state)
+        max_distance = max((ptx.distance_km for ptx in preprocessed), default=0.0)
+        max_time_delta = max((ptx.time_since_last_sec for ptx in preprocessed), default=0)
+        any_new_country = any(ptx.is_new_country for ptx in preprocessed)
+        # Summary for the last transaction (most relevant for display)
+        last_ptx = preprocessed[-1] if preprocessed else None
+        total_daily = last_ptx.daily_total_usd if last_ptx else 0
+        tx_count = last_ptx.tx_count_per_day if last_ptx else 0
+
+    duration_ms = int((time.time() - start) * 1000)
 
     log = AgentLogEntry(
         agent="Preprocessor Agent",
@@ -4,10 +4,12 @@ from models.agent_log import AgentLogEntry
 from utils.database import get_profile
 
 
-def run_profile_agent(user_id: str) -> tuple[UserProfile, AgentLogEntry]:
+def run_profile_agent(user_id: str, user_data: dict | None = None) -> tuple[UserProfile, AgentLogEntry]:
     start = time.time()
 
-    user_data = get_profile(user_id)
+    # Bulk runs pass rows they already fetched in one query.
+    if user_data is None:
+        user_data = get_profile(user_id)
 
     if user_data is None:
         raise ValueError(f"User {user_id} not found")
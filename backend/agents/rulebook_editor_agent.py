@@ -9,6 +9,9 @@ from utils.rulebook_guardrails import apply_guardrails
 
 logger = logging.getLogger(__name__)
 
+# A re-pushed draft sends the same impact analysis and rulebook.
+USE_LLM_CACHE = True
+
 RULEBOOK_OUTPUT_TEMPLATE = """{
   "updated_rulebook": {
     "amount_based": ["rule string 1", "rule string 2"],
@@ -82,6 +85,7 @@ Return the COMPLETE updated rulebook as valid JSON with the same structure."""
             user_prompt=user_prompt,
             temperature=0.2,
             model=MODEL_PRO,
+            use_cache=USE_LLM_CACHE,
         )
 
         rulebook_data = result.get("updated_rulebook", {})
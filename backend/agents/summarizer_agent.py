@@ -9,6 +9,9 @@ from utils.llm import call_llm, MODEL_FAST
 
 logger = logging.getLogger(__name__)
 
+# The summary depends only on the regulation text, so re-pushes can reuse it.
+USE_LLM_CACHE = True
+
 
 async def run_summarizer_agent(
     regulation: Regulation,
@@ -40,6 +43,7 @@ Write a plain-language summary suitable for a compliance officer. Return just th
             json_mode=False,
             temperature=0.4,
             model=MODEL_FAST,
+            use_cache=USE_LLM_CACHE,
         )
         summary = summary.strip().strip('"')
 
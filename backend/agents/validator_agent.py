@@ -1,22 +1,55 @@
+import re
 import json
 import time
 import logging
+from dataclasses import dataclass, field
 
 from models.user import UserProfile, UserBaseline
-from models.transaction import PreprocessedTransaction
 from models.compliance import Rulebook
 from models.risk import AnomalyResult
 from models.agent_log import AgentLogEntry
+from agents.preprocessor_agent import PreprocessedBatch
 from utils.llm import call_llm_json, MODEL_FAST
 
 logger = logging.getLogger(__name__)
 
+# Validation prompts carry this batch's detector output.
+USE_LLM_CACHE = False
+
 MAX_VALIDATION_LOOPS = 2
 
+# "[+35pts]", "(35 points)", "+35 pts" — the detector is asked to put points in every flag.
+_FLAG_POINTS = re.compile(r"\+?(\d+)\s*(?:pts?|points?)\b", re.IGNORECASE)
+_REASONING_CLEAN = re.compile(
+    r"\b(?:no (?:anomal\w*|issues?|suspicious|red flags?|concerns?)|nothing (?:suspicious|unusual)"
+    r"|(?:appears?|looks?|seems?) (?:normal|clean|legitimate)|consistent with (?:the )?(?:user'?s )?baseline)",
+    re.IGNORECASE,
+)
+_REASONING_SEVERE = re.compile(
+    r"\b(?:high[- ]risk|highly suspicious|immediate (?:block|escalation|str)|money laundering detected)",
+    re.IGNORECASE,
+)
+_ACRONYM = re.compile(r"\b[A-Z]{2,}\b")
+_ACT_NAME = re.compile(r"\b((?:[A-Z][\w()'-]*\s+){1,8}(?:Act|Regulations?|Law|Directive))\b")
+
+
+@dataclass
+class PreValidation:
+    """Outcome of the deterministic checks run before any LLM review."""
+
+    updates: dict = field(default_factory=dict)
+    corrections: list[str] = field(default_factory=list)
+    # Problems code cannot settle on its own; any of these escalates to the LLM.
+    open_issues: list[str] = field(default_factory=list)
+
+    @property
+    def conclusive(self) -> bool:
+        return not self.open_issues
+
 
 async def run_validator_agent(
     anomaly_result: AnomalyResult,
-    preprocessed: list[PreprocessedTransaction],
+    preprocessed: PreprocessedBatch,
     baseline: UserBaseline,
     profile: UserProfile,
     rulebook: Rulebook,
@@ -29,19 +62,36 @@ async def run_validator_agent(
       2. Are the cited regulations relevant to the flags?
       3. Is the risk band consistent with the score?
 
+    Deterministic checks (flag point sums, score/band/is_anomaly agreement,
+    reasoning polarity, cited acts known to the rulebook) run first and fix
+    what they can. The LLM is only consulted while they stay inconclusive,
+    and may only correct the score when the flags do not carry points. The
+    checks run once more on the LLM's final corrections before returning.
+
     Returns: (possibly_corrected_result, log_entry, loop_count)
     """
     start = time.time()
     loop_count = 0
     current_result = anomaly_result
+    known_acts = _known_acts(rulebook)
+    corrections: list[str] = []
+    llm_calls = 0
 
-    expected_band = _expected_band(current_result.risk_score)
-    if current_result.risk_band != expected_band:
-        current_result = current_result.model_copy(
-            update={"risk_band": expected_band}
+    for iteration in range(MAX_VALIDATION_LOOPS):
+        pre = _pre_validate(current_result, known_acts)
+        if pre.updates:
+            current_result = current_result.model_copy(update=pre.updates)
+            corrections.extend(pre.corrections)
+        if pre.conclusive:
+            break
+        # A score the flag points add up to is settled; the LLM may not move it.
+        score_settled = _score_from_flags(current_result.flags) is not None
+        score_field = "" if score_settled else '    "risk_score": null or corrected integer,\n'
+        score_note = (
+            f"\nThe risk_score {current_result.risk_score} is the sum of the flag points and is not open to correction."
+            if score_settled else ""
         )
 
-    for iteration in range(MAX_VALIDATION_LOOPS):
         system_prompt = (
             "You are a senior compliance quality-control analyst. "
             "Your job is to validate the output of the Anomaly Detector Agent. "
@@ -73,35 +123,39 @@ Baseline avg tx: ${baseline.avg_tx_amount_usd}, avg daily: ${baseline.avg_daily_
 Transactions summary:
 {chr(10).join(tx_summary)}
 
+## Deterministic Pre-Checks (unresolved)
+{chr(10).join(f'- {issue}' for issue in pre.open_issues)}
+
 ## Validation Checks
 1. Does the reasoning logically support the risk score? (e.g. "no issues" should NOT have score 90)
 2. Are the cited regulations relevant to the detected flags?
 3. Is the risk band consistent with the score? (HIGH >= 75, MEDIUM 50-74, LOW 25-49, CLEAN < 25)
-4. Are any flags contradictory or unsupported by the transaction data?
+4. Are any flags contradictory or unsupported by the transaction data?{score_note}
 
 Return JSON:
 {{
   "is_valid": true/false,
   "issues": ["list of specific issues found, empty if valid"],
   "suggested_corrections": {{
-    "risk_score": null or corrected integer,
-    "risk_band": null or corrected string,
+{score_field}    "risk_band": null or corrected string,
     "reasoning": null or improved reasoning string
   }},
   "validation_summary": "1-2 sentence summary of your review"
 }}"""
 
         try:
+            llm_calls += 1
             result = await call_llm_json(
                 system_prompt=system_prompt,
                 user_prompt=user_prompt,
                 temperature=0.2,
                 model=MODEL_FAST,
+                use_cache=USE_LLM_CACHE,
             )
 
             is_valid = result.get("is_valid", True)
             issues = result.get("issues", [])
-            corrections = result.get("suggested_corrections", {})
+            suggested = result.get("suggested_corrections") or {}
             validation_summary = result.get("validation_summary", "Validation complete.")
 
             if is_valid or not issues:
@@ -109,12 +163,12 @@ Return JSON:
 
             loop_count += 1
 
-            corrected_score = corrections.get("risk_score")
-            corrected_band = corrections.get("risk_band")
-            corrected_reasoning = corrections.get("reasoning")
+            corrected_score = suggested.get("risk_score")
+            corrected_band = suggested.get("risk_band")
+            corrected_reasoning = suggested.get("reasoning")
 
             updates = {}
-            if corrected_score is not None:
+            if corrected_score is not None and not score_settled:
                 updates["risk_score"] = min(int(corrected_score), 100)
             if corrected_band and corrected_band in ("HIGH", "MEDIUM", "LOW", "CLEAN"):
                 updates["risk_band"] = corrected_band
@@ -131,17 +185,28 @@ Return JSON:
             logger.warning(f"Validator LLM failed: {e}")
             break
 
+    if loop_count:
+        # The last round's corrections have not been checked yet.
+        pre = _pre_validate(current_result, known_acts)
+        if pre.updates:
+            current_result = current_result.model_copy(update=pre.updates)
+            corrections.extend(pre.corrections)
+
     duration_ms = int((time.time() - start) * 1000)
 
-    if loop_count == 0:
+    if loop_count:
+        status_msg = f"Analysis refined {loop_count} time(s) by Internal Validator for regulatory accuracy"
+    elif corrections:
+        status_msg = f"Corrected by deterministic checks — {'; '.join(dict.fromkeys(corrections))}"
+    elif llm_calls:
         status_msg = "Validated & Complete — output consistent"
     else:
-        status_msg = f"Analysis refined {loop_count} time(s) by Internal Validator for regulatory accuracy"
+        status_msg = "Validated & Complete — deterministic checks conclusive, LLM review skipped"
 
     log = AgentLogEntry(
         agent="Anomaly Validator Agent",
         icon="🛡️",
-        status="success" if loop_count == 0 else "alert",
+        status="success" if loop_count == 0 and not corrections else "alert",
         message=status_msg,
         duration_ms=max(duration_ms, 50),
     )
@@ -149,6 +214,87 @@ Return JSON:
     return current_result, log, loop_count
 
 
+def _pre_validate(result: AnomalyResult, known_acts: tuple[set[str], set[str]]) -> PreValidation:
+    pre = PreValidation()
+    score = result.risk_score
+
+    # Flag points must add up to the score (capped at 100).
+    expected = _score_from_flags(result.flags)
+    if not result.flags:
+        if score > 0:
+            pre.open_issues.append(f"risk_score {score} with no flags to support it")
+    elif expected is not None:
+        if expected != score:
+            pre.corrections.append(f"risk_score {score} -> {expected} (sum of flag points)")
+            score = expected
+            pre.updates["risk_score"] = score
+    else:
+        missing = sum(_flag_points(flag) is None for flag in result.flags)
+        pre.open_issues.append(f"{missing} of {len(result.flags)} flags carry no points; score {score} cannot be checked")
+
+    band = _expected_band(score)
+    if result.risk_band != band:
+        pre.corrections.append(f"risk_band {result.risk_band} -> {band}")
+        pre.updates["risk_band"] = band
+    is_anomaly = score >= 25
+    if result.is_anomaly != is_anomaly:
+        pre.corrections.append(f"is_anomaly -> {is_anomaly}")
+        pre.updates["is_anomaly"] = is_anomaly
+
+    if score >= 25 and _REASONING_CLEAN.search(result.reasoning):
+        pre.open_issues.append(f"reasoning describes clean activity but risk_score is {score}")
+    elif score < 25 and _REASONING_SEVERE.search(result.reasoning):
+        pre.open_issues.append(f"reasoning describes serious risk but risk_score is {score}")
+
+    unknown = [reg for reg in result.regulations_violated if not _is_known_act(reg, known_acts)]
+    if unknown:
+        pre.open_issues.append(f"cited regulations not found in the rulebook: {unknown}")
+
+    return pre
+
+
+def _score_from_flags(flags: list[str]) -> int | None:
+    """Sum of the flags' points (capped at 100), or None unless every flag carries points."""
+    points = [_flag_points(flag) for flag in flags]
+    if not points or any(p is None for p in points):
+        return None
+    return min(sum(points), 100)
+
+
+def _flag_points(flag: str) -> int | None:
+    matches = _FLAG_POINTS.findall(flag)
+    return int(matches[-1]) if matches else None
+
+
+def _known_acts(rulebook: Rulebook) -> tuple[set[str], set[str]]:
+    """(acronyms, lower-cased act names) mentioned anywhere in the rulebook text."""
+    texts = [
+        *rulebook.amount_based,
+        *rulebook.frequency_based,
+        *rulebook.location_based,
+        *rulebook.behavioural_pattern,
+        *rulebook.risk_bands.values(),
+        *(str(r.get("rule", "")) for r in rulebook.risk_score.get("rules", []) if isinstance(r, dict)),
+    ]
+    text = "\n".join(texts)
+    acronyms = set(_ACRONYM.findall(text))
+    names = {m.lower() for m in _ACT_NAME.findall(text)}
+    return acronyms, names
+
+
+def _is_known_act(citation: str, known_acts: tuple[set[str], set[str]]) -> bool:
+    acronyms, names = known_acts
+    lowered = citation.lower()
+    if any(name in lowered or lowered in name for name in names):
+        return True
+    if acronyms & set(_ACRONYM.findall(citation)):
+        return True
+    # "Virtual Financial Assets Act 2018" is the rulebook's "VFA Act".
+    words = re.split(r"[\s()/-]+", citation)
+    initials = "".join(w[0] for w in words if w[:1].isupper() and not w.isupper())
+    return any(len(a) >= 3 and initials.startswith(a) for a in acronyms)
+
+
 def _expected_band(score: int) -> str:
     if score >= 75:
         return "HIGH"
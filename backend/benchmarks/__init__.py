@@ -0,0 +1,12 @@
+"""
+Offline performance benchmarks.
+
+Nothing here touches the network: workflows run against FakeLLM (canned
+agent responses after a configurable latency) and InMemoryDatabase (seeded
+from data/).
+
+    cd backend
+    uv run python -m benchmarks.workflows --workflow ingest --clients 8 --requests 200
+    uv run python -m benchmarks.workflows --workflow push --clients 2 --requests 20
+    uv run python -m benchmarks.micro --sizes 5,100,1000,10000,100000
+"""
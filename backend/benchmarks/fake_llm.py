@@ -0,0 +1,103 @@
+"""
+Stand-in for the Gemini backend behind utils.llm.
+
+`FakeLLM.install()` replaces utils.llm._generate_content only, so call_llm's
+admission control, timeouts and response cache still run as in production.
+Each call sleeps for the configured model latency and returns canned,
+schema-valid output for whichever agent made it.
+"""
+
+import json
+import random
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+from utils import llm
+from utils.rule_engine import risk_band_for_score
+
+_RULEBOOK_START = "Current Rulebook for "
+_RULEBOOK_END = "\n\nREQUIRED OUTPUT TEMPLATE"
+
+
+def _edited_rulebook(user_prompt: str) -> dict:
+    """Echo the current rulebook from the editor prompt back unchanged."""
+    try:
+        start = user_prompt.index(_RULEBOOK_START)
+        start = user_prompt.index(":\n", start) + 2
+        end = user_prompt.index(_RULEBOOK_END, start)
+        return json.loads(user_prompt[start:end])
+    except ValueError:
+        return {}
+
+
+class FakeLLM:
+    def __init__(
+        self,
+        fast_latency_ms: float = 300.0,
+        pro_latency_ms: float = 1200.0,
+        jitter: float = 0.2,
+        anomaly_score: int = 55,
+        seed: int = 0,
+    ):
+        self.latency_ms = {llm.MODEL_FAST: fast_latency_ms, llm.MODEL_PRO: pro_latency_ms}
+        self.jitter = jitter
+        self.anomaly_score = anomaly_score
+        self.calls: Counter[str] = Counter()
+        self._rng = random.Random(seed)
+        self._original = None
+
+    def _sleep_sec(self, model: str) -> float:
+        base = self.latency_ms.get(model, self.latency_ms[llm.MODEL_FAST]) / 1000
+        return max(0.0, base * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+
+    def respond(self, system_prompt: str, user_prompt: str) -> tuple[str, str]:
+        """(agent name, response text) for a prompt."""
+        if system_prompt.startswith("You are a senior compliance analyst"):
+            score = self.anomaly_score
+            return "anomaly", json.dumps({
+                "is_anomaly": score >= 25,
+                "risk_score": score,
+                "risk_band": risk_band_for_score(score),
+                "flags": [f"Benchmark flag: amount above baseline [+{score}pts]"],
+                "reasoning": "Canned benchmark response.",
+                "regulations_violated": [],
+            })
+        if system_prompt.startswith("You are a senior compliance quality-control analyst"):
+            return "validator", json.dumps({
+                "is_valid": True,
+                "issues": [],
+                "suggested_corrections": {"risk_score": None, "risk_band": None, "reasoning": None},
+                "validation_summary": "Canned benchmark validation.",
+            })
+        if system_prompt.startswith("You are a regulatory expert"):
+            return "summarizer", "Canned benchmark summary of the regulation."
+        if system_prompt.startswith("You are a regulatory analyst"):
+            return "comparison", json.dumps({
+                "comparison_points": [f"Benchmark comparison point {i}" for i in range(1, 5)],
+            })
+        if system_prompt.startswith("You are a compliance impact analyst"):
+            return "analyzer", "Canned benchmark impact analysis."
+        if system_prompt.startswith("You are a compliance rulebook engineer"):
+            return "rulebook_editor", json.dumps({
+                "updated_rulebook": _edited_rulebook(user_prompt),
+                "changes_description": "Canned benchmark edit: rulebook unchanged.",
+            })
+        return "unknown", "{}"
+
+    async def generate_content(self, model: str, contents: str, config: dict):
+        agent, text = self.respond(config.get("system_instruction", ""), contents)
+        self.calls[agent] += 1
+        await asyncio.sleep(self._sleep_sec(model))
+        return SimpleNamespace(text=text, usage_metadata=None)
+
+    def install(self) -> "FakeLLM":
+        if self._original is None:
+            self._original = llm._generate_content
+            llm._generate_content = self.generate_content
+        return self
+
+    def uninstall(self) -> None:
+        if self._original is not None:
+            llm._generate_content = self._original
+            self._original = None
@@ -0,0 +1,328 @@
+"""
+In-memory stand-in for utils.database, seeded from the JSON files in data/.
+
+`InMemoryDatabase.install()` swaps the module-level functions the workflows
+use for dict-backed ones. utils.async_database resolves functions at call
+time, so the async wrappers (and the bounded db executor) pick these up.
+Compliance state goes through the real cache (only `_load_compliance_state`
+is replaced). `latency_ms` adds a blocking sleep per call to model
+PostgREST round-trips.
+"""
+
+import copy
+import json
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from models.transaction import PreprocessedTransaction, PreprocessState
+from models.user import UserBaseline
+from utils import database
+from utils.jurisdiction_stats import aggregate_rows
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+_COMPLIANCE_FILES = {"MT": "malta.json", "AE": "uae.json", "KY": "cayman.json"}
+
+
+def _load_json(path: Path, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+class InMemoryDatabase:
+    PATCHED = (
+        "get_all_profiles",
+        "get_profile",
+        "get_profiles",
+        "get_all_baselines",
+        "get_baseline",
+        "get_jurisdiction_aggregates",
+        "get_jurisdiction_baseline_rows",
+        "get_jurisdiction_baselines",
+        "upsert_baseline",
+        "get_all_risk_states",
+        "get_risk_state",
+        "upsert_risk_state",
+        "get_historical_transactions",
+        "get_jurisdiction_transactions",
+        "save_transactions",
+        "save_preprocessed_transactions",
+        "get_preprocess_state",
+        "upsert_preprocess_state",
+        "_load_compliance_state",
+        "get_regulation_by_id",
+        "get_available_regulations",
+        "create_agent_trace",
+        "create_agent_traces",
+        "complete_agent_trace",
+        "get_agent_trace",
+        "get_agent_steps",
+        "save_agent_steps",
+        "create_compliance_draft",
+    )
+
+    def __init__(self, data_dir: Path = DATA_DIR, latency_ms: float = 0.0):
+        self.latency_sec = latency_ms / 1000
+        self._lock = threading.Lock()
+        self._originals: dict = {}
+
+        self.profiles = {u["user_id"]: u for u in _load_json(data_dir / "users.json", [])}
+        self.baselines = {b["user_id"]: b for b in _load_json(data_dir / "baselines.json", [])}
+        self.risk_states: dict[str, dict] = {}
+        self.transactions: dict[str, list[dict]] = {
+            uid: list(txs)
+            for uid, txs in _load_json(data_dir / "historical_transactions.json", {}).items()
+        }
+        self.preprocess_states: dict[str, PreprocessState] = {}
+        self.compliance: dict[str, dict] = {}
+        self.regulations: dict[str, dict] = {}
+        for code, filename in _COMPLIANCE_FILES.items():
+            state = _load_json(data_dir / "compliance" / filename, None)
+            if state:
+                self.compliance[code] = state
+            stem = filename.removesuffix(".json")
+            for reg in _load_json(data_dir / "compliance" / "new_regulations" / f"{stem}_v2.json", []):
+                self.regulations[reg["regulation_update_id"]] = {
+                    **reg, "jurisdiction_code": code, "is_pushed": False,
+                }
+        self.traces: dict[str, dict] = {}
+        self.steps: dict[str, list[dict]] = {}
+        self.drafts: dict[str, dict] = {}
+
+    def _io(self) -> None:
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+
+    # ── Installation ──
+
+    def install(self) -> "InMemoryDatabase":
+        for name in self.PATCHED:
+            self._originals.setdefault(name, getattr(database, name))
+            setattr(database, name, getattr(self, name))
+        database.invalidate_compliance_cache()
+        return self
+
+    def uninstall(self) -> None:
+        for name, fn in self._originals.items():
+            setattr(database, name, fn)
+        self._originals.clear()
+        database.invalidate_compliance_cache()
+
+    # ── Profiles / Baselines / Risk State ──
+
+    def get_all_profiles(self) -> list[dict]:
+        self._io()
+        return [dict(p) for p in self.profiles.values()]
+
+    def get_profile(self, user_id: str) -> dict | None:
+        self._io()
+        p = self.profiles.get(user_id)
+        return dict(p) if p else None
+
+    def get_profiles(self, user_ids: list[str] | None = None, country: str | None = None) -> list[dict]:
+        self._io()
+        rows = self.profiles.values()
+        if user_ids is not None:
+            wanted = set(user_ids)
+            rows = [p for p in rows if p["user_id"] in wanted]
+        if country:
+            rows = [p for p in rows if p["country"] == country.upper()]
+        return [dict(p) for p in rows]
+
+    def get_all_baselines(self) -> list[dict]:
+        self._io()
+        return [dict(b) for b in self.baselines.values()]
+
+    def get_baseline(self, user_id: str) -> dict | None:
+        self._io()
+        b = self.baselines.get(user_id)
+        return copy.deepcopy(b) if b else None
+
+    def get_jurisdiction_baseline_rows(self, jurisdiction_code: str, page_size: int = 1000) -> list[dict]:
+        self._io()
+        code = jurisdiction_code.upper()
+        return [
+            {
+                "user_id": p["user_id"],
+                "income_level": p["income_level"],
+                **{
+                    k: self.baselines.get(p["user_id"], {}).get(k)
+                    for k in ("avg_tx_amount_usd", "avg_daily_total_usd", "max_tx_amount_usd")
+                },
+            }
+            for p in self.profiles.values()
+            if p["country"] == code
+        ]
+
+    def get_jurisdiction_baselines(self, jurisdiction_code: str) -> list[dict]:
+        self._io()
+        code = jurisdiction_code.upper()
+        return [
+            copy.deepcopy(b)
+            for uid, b in sorted(self.baselines.items())
+            if uid in self.profiles and self.profiles[uid]["country"] == code
+        ]
+
+    def get_jurisdiction_aggregates(
+        self,
+        jurisdiction_code: str,
+        edges: list[float],
+        percentiles: list[float],
+        thresholds: list[float],
+    ) -> dict:
+        rows = self.get_jurisdiction_baseline_rows(jurisdiction_code)
+        return aggregate_rows(rows, edges, percentiles, thresholds)
+
+    def upsert_baseline(self, baseline: UserBaseline) -> None:
+        self._io()
+        with self._lock:
+            self.baselines[baseline.user_id] = baseline.model_dump()
+
+    def get_all_risk_states(self) -> dict[str, dict]:
+        self._io()
+        return dict(self.risk_states)
+
+    def get_risk_state(self, user_id: str) -> dict | None:
+        self._io()
+        return self.risk_states.get(user_id)
+
+    def upsert_risk_state(self, user_id: str, risk_score: int, risk_band: str, risk_profile: str) -> None:
+        self._io()
+        with self._lock:
+            self.risk_states[user_id] = {
+                "user_id": user_id,
+                "risk_score": risk_score,
+                "risk_band": risk_band,
+                "risk_profile": risk_profile,
+            }
+
+    # ── Transactions / Preprocess State ──
+
+    def get_historical_transactions(self, user_id: str | None = None, page_size: int = 1000) -> dict | list:
+        self._io()
+        if user_id:
+            return list(self.transactions.get(user_id, []))
+        return {uid: list(txs) for uid, txs in self.transactions.items()}
+
+    def get_jurisdiction_transactions(self, jurisdiction_code: str, since: str | None = None) -> list[dict]:
+        self._io()
+        code = jurisdiction_code.upper()
+        rows = []
+        for uid in sorted(self.transactions):
+            if uid not in self.profiles or self.profiles[uid]["country"] != code:
+                continue
+            rows.extend(sorted(
+                (
+                    dict(tx) for tx in self.transactions[uid]
+                    if since is None or tx["timestamp"] >= since
+                ),
+                key=lambda tx: tx["timestamp"],
+            ))
+        return rows
+
+    def save_transactions(self, transactions: list[dict], batch_id: str | None = None) -> None:
+        self._io()
+        with self._lock:
+            for tx in transactions:
+                self.transactions.setdefault(tx["user_id"], []).append({**tx, "batch_id": batch_id})
+
+    def save_preprocessed_transactions(self, preprocessed: list[PreprocessedTransaction], batch_id: str) -> None:
+        self._io()
+        with self._lock:
+            for ptx in preprocessed:
+                row = {**ptx.model_dump(), "batch_id": batch_id, "is_preprocessed": True}
+                self.transactions.setdefault(ptx.user_id, []).append(row)
+
+    def get_preprocess_state(self, user_id: str) -> PreprocessState | None:
+        self._io()
+        return self.preprocess_states.get(user_id)
+
+    def upsert_preprocess_state(self, state: PreprocessState) -> None:
+        self._io()
+        with self._lock:
+            self.preprocess_states[state.user_id] = state
+
+    # ── Compliance / Regulations ──
+
+    def _load_compliance_state(self, jurisdiction_code: str) -> dict | None:
+        self._io()
+        state = self.compliance.get(jurisdiction_code.upper())
+        return copy.deepcopy(state) if state else None
+
+    def get_regulation_by_id(self, regulation_update_id: str) -> dict | None:
+        self._io()
+        return self.regulations.get(regulation_update_id)
+
+    def get_available_regulations(self, jurisdiction_code: str) -> list[dict]:
+        self._io()
+        code = jurisdiction_code.upper()
+        return [
+            r for r in self.regulations.values()
+            if r["jurisdiction_code"] == code and not r["is_pushed"]
+        ]
+
+    # ── Agent Traces / Drafts ──
+
+    def create_agent_trace(
+        self,
+        trace_type: str,
+        user_id: str | None = None,
+        jurisdiction_code: str | None = None,
+        trace_id: str | None = None,
+    ) -> str:
+        self._io()
+        trace_id = trace_id or str(uuid.uuid4())
+        with self._lock:
+            self.traces[trace_id] = {
+                "id": trace_id,
+                "trace_type": trace_type,
+                "user_id": user_id,
+                "jurisdiction_code": jurisdiction_code,
+                "status": "running",
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }
+        return trace_id
+
+    def create_agent_traces(self, traces: list[dict]) -> None:
+        for trace in traces:
+            self.create_agent_trace(
+                trace["trace_type"], trace.get("user_id"), trace.get("jurisdiction_code"), trace["id"]
+            )
+
+    def complete_agent_trace(self, trace_id: str, result: dict | None = None, failed: bool = False) -> None:
+        self._io()
+        with self._lock:
+            trace = self.traces.setdefault(trace_id, {"id": trace_id})
+            trace.update(
+                status="failed" if failed else "completed",
+                result=result,
+                completed_at=datetime.now(timezone.utc).isoformat(),
+            )
+
+    def get_agent_trace(self, trace_id: str) -> dict | None:
+        self._io()
+        return self.traces.get(trace_id)
+
+    def get_agent_steps(self, trace_id: str) -> list[dict]:
+        self._io()
+        return sorted(self.steps.get(trace_id, []), key=lambda s: s["step_order"])
+
+    def save_agent_steps(self, steps: list[dict]) -> None:
+        if not steps:
+            return
+        self._io()
+        with self._lock:
+            for step in steps:
+                self.steps.setdefault(step["trace_id"], []).append(step)
+
+    def create_compliance_draft(self, **fields) -> str:
+        self._io()
+        draft_id = str(uuid.uuid4())
+        with self._lock:
+            self.drafts[draft_id] = {"id": draft_id, "status": "pending", **fields}
+        return draft_id
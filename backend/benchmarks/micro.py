@@ -0,0 +1,138 @@
+"""
+Microbenchmarks for the local (non-LLM) hot paths, across batch sizes.
+
+  - generate_transactions
+  - run_preprocessor_agent (auto, forced row loop, forced columnar)
+  - _deterministic_fallback (compiled-rulebook scoring)
+  - apply_guardrails (size = number of risk_score rules)
+
+Usage:
+    cd backend
+    uv run python -m benchmarks.micro --sizes 5,100,1000,10000,100000 --json bench_micro.json
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("LLM_API_KEY", "benchmark")
+
+import time
+import random
+import logging
+import argparse
+import statistics
+from typing import Callable
+
+from models import UserProfile, UserBaseline, Rulebook
+from agents.preprocessor_agent import run_preprocessor_agent
+from agents.anomaly_agent import _deterministic_fallback
+from utils.rulebook_guardrails import apply_guardrails
+from utils.baseline_stats import DEFAULT_BASELINE
+from scripts.faker_generator import generate_transactions
+from benchmarks.reporting import format_table, write_json
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+
+def measure(fn: Callable[[], object], min_time: float, max_repeats: int) -> dict:
+    """Call fn repeatedly (at least once, up to min_time seconds); times in ms."""
+    times: list[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < max_repeats:
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() >= deadline and len(times) >= min(3, max_repeats):
+            break
+        if times[0] > min_time * 1000:
+            break
+    return {"repeats": len(times), "best_ms": min(times), "median_ms": statistics.median(times)}
+
+
+def _fixtures(jurisdiction: str) -> tuple[UserProfile, UserBaseline, Rulebook]:
+    with open(DATA_DIR / "users.json") as f:
+        profile = next(UserProfile(**u) for u in json.load(f) if u["country"] == jurisdiction)
+    with open(DATA_DIR / "baselines.json") as f:
+        baseline = next(
+            (UserBaseline(**b) for b in json.load(f) if b["user_id"] == profile.user_id),
+            None,
+        ) or UserBaseline(user_id=profile.user_id, **DEFAULT_BASELINE)
+    filename = {"MT": "malta.json", "AE": "uae.json", "KY": "cayman.json"}[jurisdiction]
+    with open(DATA_DIR / "compliance" / filename) as f:
+        rulebook = Rulebook(**json.load(f)["rulebook"])
+    return profile, baseline, rulebook
+
+
+def _scaled_rulebook(rulebook: Rulebook, n_rules: int) -> dict:
+    data = rulebook.model_dump()
+    rules = data["risk_score"]["rules"]
+    data["risk_score"]["rules"] = [dict(rules[i % len(rules)]) for i in range(n_rules)]
+    return data
+
+
+def run(sizes: list[int], jurisdiction: str, min_time: float, max_repeats: int) -> list[dict]:
+    profile, baseline, rulebook = _fixtures(jurisdiction)
+    rows = []
+
+    def record(name: str, size: int, fn: Callable[[], object]) -> None:
+        result = measure(fn, min_time, max_repeats)
+        result.update(benchmark=name, size=size, per_item_us=result["best_ms"] * 1000 / size)
+        rows.append(result)
+        print(
+            f"  {name:<32} n={size:<7} best {result['best_ms']:10.3f} ms  "
+            f"({result['per_item_us']:.2f} us/item, {result['repeats']} runs)",
+            flush=True,
+        )
+
+    for size in sizes:
+        transactions = generate_transactions(profile.user_id, profile, num_transactions=size)
+        preprocessed, _ = run_preprocessor_agent(transactions, profile)
+        guardrail_input = _scaled_rulebook(rulebook, size)
+
+        record("generate_transactions", size,
+               lambda: generate_transactions(profile.user_id, profile, num_transactions=size))
+        record("run_preprocessor_agent", size,
+               lambda: run_preprocessor_agent(transactions, profile))
+        record("run_preprocessor_agent[rows]", size,
+               lambda: run_preprocessor_agent(transactions, profile, columnar=False))
+        record("run_preprocessor_agent[columnar]", size,
+               lambda: run_preprocessor_agent(transactions, profile, columnar=True))
+        record("_deterministic_fallback", size,
+               lambda: _deterministic_fallback(preprocessed, baseline, profile, rulebook, "bench"))
+        record("apply_guardrails", size,
+               lambda: apply_guardrails(guardrail_input, jurisdiction, rulebook))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="5,100,1000,10000,100000")
+    parser.add_argument("--jurisdiction", choices=["MT", "AE", "KY"], default="MT")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per measurement")
+    parser.add_argument("--max-repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    random.seed(args.seed)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    rows = run(sizes, args.jurisdiction, args.min_time, args.max_repeats)
+    print()
+    print(format_table(
+        ["benchmark", "size", "best_ms", "median_ms", "us/item", "runs"],
+        [
+            [r["benchmark"], r["size"], r["best_ms"], r["median_ms"], r["per_item_us"], r["repeats"]]
+            for r in rows
+        ],
+    ))
+    if args.json:
+        write_json(args.json, {"sizes": sizes, "jurisdiction": args.jurisdiction, "results": rows})
+
+
+if __name__ == "__main__":
+    main()
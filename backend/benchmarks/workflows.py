@@ -0,0 +1,256 @@
+"""
+End-to-end benchmark of the ingest-batch and compliance-push workflows.
+
+N concurrent clients issue requests back to back against the workflow
+functions behind /api/ingest-batch and /api/compliance/{code}/push, with
+FakeLLM and InMemoryDatabase installed. Reports request latency
+percentiles, throughput and a per-agent breakdown timed by the harness
+around each agent call (AgentLogEntry.duration_ms is floored by the agents,
+so it is not used).
+
+Usage:
+    cd backend
+    uv run python -m benchmarks.workflows --workflow ingest --clients 8 --requests 200 \
+        --fast-latency-ms 300 --pro-latency-ms 1200 --json bench_ingest.json
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# utils.llm builds its client at import time and main opens the job store;
+# neither may reach real services here.
+os.environ.setdefault("LLM_API_KEY", "benchmark")
+os.environ.setdefault("JOB_STORE_BACKEND", "sqlite")
+os.environ.setdefault("JOB_SQLITE_PATH", str(Path(tempfile.gettempdir()) / "complai_bench_jobs.sqlite3"))
+
+import time
+import random
+import asyncio
+import logging
+import argparse
+import functools
+import inspect
+import itertools
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+from utils import llm_cache
+from benchmarks.fake_llm import FakeLLM
+from benchmarks.memory_db import InMemoryDatabase
+from benchmarks.reporting import summarize, format_table, write_json
+
+
+async def run_clients(
+    call: Callable[[int], Awaitable[object]],
+    clients: int,
+    requests: int,
+) -> tuple[list[float], list[object], list[str], float]:
+    """Run `requests` calls over `clients` concurrent loops; latencies in ms."""
+    counter = itertools.count()
+    latencies: list[float] = []
+    results: list[object] = []
+    errors: list[str] = []
+
+    async def client() -> None:
+        while (i := next(counter)) < requests:
+            start = time.perf_counter()
+            try:
+                results.append(await call(i))
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {getattr(e, 'detail', e)}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, results, errors, time.perf_counter() - start
+
+
+class AgentTimer:
+    """
+    Wraps the agent functions `main` calls and records each call's wall time
+    in ms. Async agents are timed from call to completion, so the figures
+    include event-loop waits under concurrency, as request latency does.
+    """
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self._originals: dict[str, Callable] = {}
+
+    def install(self, module, names: list[str]) -> "AgentTimer":
+        for name in names:
+            fn = getattr(module, name)
+            self._originals[name] = fn
+            setattr(module, name, self._wrap(name, fn))
+        self._module = module
+        return self
+
+    def uninstall(self) -> None:
+        for name, fn in self._originals.items():
+            setattr(self._module, name, fn)
+        self._originals.clear()
+
+    def _wrap(self, name: str, fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.durations[name].append((time.perf_counter() - start) * 1000)
+            return timed_async
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.durations[name].append((time.perf_counter() - start) * 1000)
+        return timed
+
+    def breakdown(self) -> dict[str, dict]:
+        return {name: summarize(values) for name, values in self.durations.items()}
+
+
+WORKFLOW_AGENTS = {
+    "ingest": [
+        "run_profile_agent",
+        "run_preprocessor_agent",
+        "run_baseline_agent",
+        "run_fast_path_screen",
+        "run_anomaly_agent",
+        "run_validator_agent",
+    ],
+    "push": [
+        "run_summarizer_agent",
+        "run_comparison_agent",
+        "run_analyzer_agent",
+        "run_rulebook_editor_agent",
+    ],
+}
+
+
+async def bench(args: argparse.Namespace, store: InMemoryDatabase, fake: FakeLLM) -> dict:
+    import main
+    from utils.trace_recorder import get_trace_writer
+
+    if args.workflow == "ingest":
+        user_ids = sorted(store.profiles)
+
+        def call(i: int):
+            request = main.IngestBatchRequest(
+                user_id=user_ids[i % len(user_ids)],
+                num_transactions=args.transactions,
+            )
+            return main._run_ingest_batch(request)
+    else:
+        regulations = sorted(store.regulations.values(), key=lambda r: r["regulation_update_id"])
+
+        def call(i: int):
+            reg = regulations[i % len(regulations)]
+            request = main.CompliancePushRequest(regulation_update_id=reg["regulation_update_id"])
+            return main._run_push_compliance(reg["jurisdiction_code"], request)
+
+    timer = AgentTimer().install(main, WORKFLOW_AGENTS[args.workflow])
+    try:
+        if args.warmup:
+            await run_clients(call, min(args.clients, args.warmup), args.warmup)
+            fake.calls.clear()
+            timer.durations.clear()
+
+        latencies, _, errors, wall = await run_clients(call, args.clients, args.requests)
+        await get_trace_writer().flush()
+    finally:
+        timer.uninstall()
+
+    return {
+        "workflow": args.workflow,
+        "clients": args.clients,
+        "requests": args.requests,
+        "transactions_per_request": args.transactions if args.workflow == "ingest" else None,
+        "llm_latency_ms": {"fast": args.fast_latency_ms, "pro": args.pro_latency_ms},
+        "db_latency_ms": args.db_latency_ms,
+        "llm_cache": args.llm_cache,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_sec": wall,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "latency_ms": summarize(latencies),
+        "agents_ms": timer.breakdown(),
+        "llm_calls": dict(fake.calls),
+    }
+
+
+def print_report(report: dict) -> None:
+    lat = report["latency_ms"]
+    print(
+        f"\n{report['workflow']}: {report['completed']}/{report['requests']} ok, "
+        f"{report['errors']} errors, {report['clients']} clients, "
+        f"{report['wall_sec']:.2f}s wall, {report['throughput_rps']:.2f} req/s"
+    )
+    print(format_table(
+        ["latency (ms)", "mean", "p50", "p95", "p99", "max"],
+        [["request", lat["mean"], lat["p50"], lat["p95"], lat["p99"], lat["max"]]],
+    ))
+    print()
+    print(format_table(
+        ["agent (ms)", "n", "mean", "p50", "p95", "p99"],
+        [
+            [agent, s["n"], s["mean"], s["p50"], s["p95"], s["p99"]]
+            for agent, s in report["agents_ms"].items()
+        ],
+    ))
+    print(f"\nLLM calls: {report['llm_calls'] or 'none'}")
+    for sample in report["error_samples"]:
+        print(f"  error: {sample}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workflow", choices=["ingest", "push"], default="ingest")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--transactions", type=int, default=5, help="transactions per ingest batch")
+    parser.add_argument("--fast-latency-ms", type=float, default=300.0)
+    parser.add_argument("--pro-latency-ms", type=float, default=1200.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--anomaly-score", type=int, default=55)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--llm-cache", choices=["off", "memory"], default="off",
+        help="response cache backend; repeated prompts hit it when enabled",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    random.seed(args.seed)
+    llm_cache.LLM_CACHE_BACKEND = args.llm_cache
+    store = InMemoryDatabase(latency_ms=args.db_latency_ms).install()
+    fake = FakeLLM(
+        fast_latency_ms=args.fast_latency_ms,
+        pro_latency_ms=args.pro_latency_ms,
+        jitter=args.jitter,
+        anomaly_score=args.anomaly_score,
+        seed=args.seed,
+    ).install()
+    # main configures INFO logging on import; keep benchmark output readable.
+    import main as _  # noqa: F401
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = asyncio.run(bench(args, store, fake))
+    print_report(report)
+    if args.json:
+        write_json(args.json, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
 import os
+import json
+import time
 import asyncio
 import logging
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Awaitable, Callable, Optional, TypeVar
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,17 +19,24 @@ from models import (
     UserProfile,
     UserBaseline,
     RawTransaction,
+    PreprocessedTransaction,
     Regulation,
     Rulebook,
+    PreprocessState,
     AgentLogEntry,
     FullAnalysisResponse,
     CompliancePushResponse,
+    BulkUserResult,
+    BulkIngestResponse,
+    ImpactSimulation,
 )
 from agents import (
     run_profile_agent,
     run_preprocessor_agent,
+    next_preprocess_state,
     run_baseline_agent,
     run_anomaly_agent,
+    run_fast_path_screen,
     run_validator_agent,
     run_summarizer_agent,
     run_comparison_agent,
@@ -35,6 +45,11 @@ from agents import (
 )
 from scripts.faker_generator import generate_transactions
 from utils import database as db
+from utils import async_database as adb
+from utils.llm import get_llm_metrics
+from utils.trace_recorder import get_trace_writer, TraceRecorder
+from utils.job_queue import get_job_queue
+from utils.impact_simulator import simulate_draft_impact, shutdown_pool, IMPACT_SIM_HISTORY_DAYS
 
 logging.basicConfig(level=logging.INFO, stream=__import__("sys").stdout)
 logger = logging.getLogger(__name__)
@@ -64,6 +79,18 @@ if frontend_url:
         if stripped:
             ALLOWED_ORIGINS.append(stripped)
 
+# Recent-history window sent with /api/init; older rows are paged via
+# /api/users/{user_id}/transactions.
+INIT_HISTORY_DAYS = int(os.getenv("INIT_HISTORY_DAYS", "7"))
+INIT_HISTORY_PER_USER = int(os.getenv("INIT_HISTORY_PER_USER", "50"))
+HISTORY_PAGE_MAX = 500
+
+# Bulk ingest runs the per-user workflow with at most this many users in
+# flight; requests may lower it or raise it up to the hard cap.
+BULK_INGEST_CONCURRENCY = int(os.getenv("BULK_INGEST_CONCURRENCY", "8"))
+BULK_INGEST_MAX_CONCURRENCY = int(os.getenv("BULK_INGEST_MAX_CONCURRENCY", "32"))
+BULK_INGEST_MAX_USERS = int(os.getenv("BULK_INGEST_MAX_USERS", "1000"))
+
 # app.add_middleware(
 #     CORSMiddleware,
 #     allow_origins=ALLOWED_ORIGINS,
@@ -91,6 +118,19 @@ class IngestBatchRequest(BaseModel):
     overrides: Optional[dict] = None
 
 
+class BulkIngestRequest(BaseModel):
+    # Exactly one of user_ids / jurisdiction_code selects the users to screen.
+    user_ids: Optional[list[str]] = None
+    jurisdiction_code: Optional[str] = None
+    num_transactions: int = 5
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    variance: Optional[float] = None
+    countries: Optional[list[str]] = None
+    overrides: Optional[dict] = None
+    concurrency: Optional[int] = None
+
+
 class CompliancePushRequest(BaseModel):
     regulation_update_id: str
 
@@ -105,7 +145,9 @@ def _get_init_sync() -> dict:
     profiles = db.get_all_profiles()
     baselines = db.get_all_baselines()
     risk_states = db.get_all_risk_states()
-    all_history = db.get_historical_transactions()
+    since = (datetime.now(timezone.utc) - timedelta(days=INIT_HISTORY_DAYS)).isoformat()
+    all_history = db.get_recent_transactions(since, INIT_HISTORY_PER_USER)
+    latest_analyses = db.get_latest_analyses()
     baseline_map = {b["user_id"]: b for b in baselines}
     result = []
     for u in profiles:
@@ -122,17 +164,16 @@ def _get_init_sync() -> dict:
             "max_tx_amount_usd": 0.0,
         })
         risk_state = risk_states.get(user_id, {})
-        history = all_history.get(user_id, []) if isinstance(all_history, dict) else []
+        history = all_history.get(user_id, [])
         profile_data = {**u}
         if "risk_profile" in risk_state:
             profile_data["risk_profile"] = risk_state["risk_profile"]
-        latest_analysis = db.get_latest_analysis(user_id)
         result.append({
             "profile": profile_data,
             "baseline": baseline,
             "current_risk_score": risk_state.get("risk_score", 0),
             "current_risk_band": risk_state.get("risk_band", "CLEAN"),
-            "latest_analysis": latest_analysis,
+            "latest_analysis": latest_analyses.get(user_id),
             "historical_transactions": history,
         })
     return {"users": result}
@@ -147,7 +188,7 @@ async def get_init_ping():
 async def get_init():
     logger.info("GET /api/init received")
     try:
-        out = await asyncio.to_thread(_get_init_sync)
+        out = await adb.run_db(_get_init_sync)
         logger.info("GET /api/init completed")
         return out
     except Exception as e:
@@ -158,15 +199,40 @@ async def get_init():
         )
 
 
+@app.get("/api/users/{user_id}/transactions")
+async def get_user_transactions(
+    user_id: str,
+    limit: int = Query(100, ge=1, le=HISTORY_PAGE_MAX),
+    before: Optional[str] = None,
+    before_id: Optional[int] = None,
+):
+    rows = await adb.get_transactions_page(
+        user_id,
+        limit=limit,
+        before_timestamp=before,
+        before_id=before_id,
+    )
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = {"before": last["timestamp"], "before_id": last["id"]}
+    return {
+        "user_id": user_id,
+        "transactions": rows,
+        "next_cursor": next_cursor,
+    }
+
+
 @app.get("/api/compliance/{jurisdiction_code}")
 async def get_compliance_endpoint(jurisdiction_code: str):
     code = jurisdiction_code.upper()
-    compliance = db.get_compliance_state(code)
+    compliance, available = await asyncio.gather(
+        adb.get_compliance_state(code),
+        adb.get_available_regulations(code),
+    )
     if not compliance:
         raise HTTPException(status_code=404, detail=f"Unknown jurisdiction: {code}")
 
-    available = db.get_available_regulations(code)
-
     return {
         **compliance,
         "available_new_regulations": [
@@ -184,7 +250,7 @@ async def get_compliance_endpoint(jurisdiction_code: str):
 @app.get("/api/rules/{jurisdiction_code}")
 async def get_rules_endpoint(jurisdiction_code: str):
     code = jurisdiction_code.upper()
-    compliance = db.get_compliance_state(code)
+    compliance = await adb.get_compliance_state(code)
     if not compliance:
         raise HTTPException(status_code=404, detail=f"Unknown jurisdiction: {code}")
     return {
@@ -194,33 +260,142 @@ async def get_rules_endpoint(jurisdiction_code: str):
     }
 
 
-@app.post("/api/ingest-batch")
-async def ingest_batch(request: IngestBatchRequest):
-    agent_chain: list[AgentLogEntry] = []
-    batch_id = str(uuid.uuid4())
-    step_order = 0
+# Streamed (SSE) workflows report progress through this callback:
+# ("trace", {"trace_id"}) once, then ("step", AgentLogEntry dict) per agent.
+# Bulk ingest instead sends ("job", {...}) once, then ("user", BulkUserResult
+# dict) as each user finishes.
+EventCallback = Callable[[str, dict], Awaitable[None]]
+T = TypeVar("T")
+
+SSE_KEEPALIVE_SEC = float(os.getenv("SSE_KEEPALIVE_SEC", "15"))
+
+# Streamed workflows keep running if the client disconnects, so the trace
+# still completes; hold references until they finish.
+_stream_tasks: set[asyncio.Task] = set()
+
+
+async def _record_step(
+    log: AgentLogEntry,
+    agent_chain: list[AgentLogEntry],
+    trace: TraceRecorder,
+    on_event: EventCallback | None,
+) -> None:
+    agent_chain.append(log)
+    trace.record(log)
+    if on_event:
+        await on_event("step", log.model_dump())
+
+
+async def _emit_when_done(agent_call: Awaitable[tuple], on_event: EventCallback | None) -> tuple:
+    """Await an agent returning (..., AgentLogEntry) and stream its log entry immediately."""
+    result = await agent_call
+    if on_event:
+        await on_event("step", result[-1].model_dump())
+    return result
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+
+
+def _stream_workflow(run: Callable[[EventCallback], Awaitable[BaseModel]]) -> StreamingResponse:
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def on_event(event: str, data: dict) -> None:
+        await queue.put((event, data))
+
+    async def runner() -> None:
+        try:
+            result = await run(on_event)
+            await queue.put(("result", result.model_dump(mode="json")))
+        except HTTPException as e:
+            await queue.put(("error", {"status_code": e.status_code, "detail": e.detail}))
+        except Exception as e:
+            logger.exception("Streamed workflow failed")
+            await queue.put(("error", {"status_code": 500, "detail": str(e)}))
+        finally:
+            await queue.put(None)
+
+    async def events():
+        task = asyncio.create_task(runner())
+        _stream_tasks.add(task)
+        task.add_done_callback(_stream_tasks.discard)
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SEC)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            yield _sse(*item)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _load_preprocess_state(user_id: str) -> PreprocessState | None:
+    try:
+        return await adb.get_preprocess_state(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to load preprocess state for {user_id}: {e}")
+        return None
+
 
-    trace_id = db.create_agent_trace(
+async def _fail_trace_on_error(trace: TraceRecorder, work: Awaitable[T]) -> T:
+    """Await a workflow body, marking its trace failed if it raises or is cancelled."""
+    try:
+        return await work
+    except BaseException:
+        await trace.complete(failed=True)
+        raise
+
+
+async def _run_ingest_batch(
+    request: IngestBatchRequest,
+    on_event: EventCallback | None = None,
+    user_data: dict | None = None,
+    active_rulebook: tuple[Rulebook, str] | None = None,
+) -> FullAnalysisResponse:
+    trace = TraceRecorder(
         trace_type="transaction_analysis",
         user_id=request.user_id,
     )
+    trace_id = await trace.start()
+    if on_event:
+        await on_event("trace", {"trace_id": trace_id})
+    return await _fail_trace_on_error(
+        trace, _ingest_batch_steps(request, trace, on_event, user_data, active_rulebook)
+    )
+
+
+async def _ingest_batch_steps(
+    request: IngestBatchRequest,
+    trace: TraceRecorder,
+    on_event: EventCallback | None,
+    user_data: dict | None,
+    active_rulebook: tuple[Rulebook, str] | None,
+) -> FullAnalysisResponse:
+    agent_chain: list[AgentLogEntry] = []
+    batch_id = str(uuid.uuid4())
+    trace_id = trace.trace_id
+
+    # Rolling preprocessor state from the user's previous batch, fetched
+    # while the profile loads.
+    preprocess_state_task = asyncio.create_task(_load_preprocess_state(request.user_id))
 
     # 1. Profile Agent
     try:
-        profile, profile_log = run_profile_agent(request.user_id)
-        agent_chain.append(profile_log)
-        step_order += 1
-        db.save_agent_step(
-            trace_id=trace_id,
-            step_order=step_order,
-            agent=profile_log.agent,
-            icon=profile_log.icon,
-            status=profile_log.status,
-            message=profile_log.message,
-            duration_ms=profile_log.duration_ms,
-        )
+        if user_data is not None:
+            profile, profile_log = run_profile_agent(request.user_id, user_data)
+        else:
+            profile, profile_log = await adb.run_db(run_profile_agent, request.user_id)
+        await _record_step(profile_log, agent_chain, trace, on_event)
     except Exception:
-        db.complete_agent_trace(trace_id, failed=True)
+        preprocess_state_task.cancel()
         raise HTTPException(status_code=404, detail=f"User not found: {request.user_id}")
 
     jurisdiction_map = {"MT": "Malta", "AE": "UAE", "KY": "Cayman Islands"}
@@ -238,8 +413,9 @@ async def ingest_batch(request: IngestBatchRequest):
     )
 
     # 2 & 3. Preprocessor + Baseline in parallel
+    preprocess_state = await preprocess_state_task
     preprocessor_task = asyncio.to_thread(
-        run_preprocessor_agent, raw_transactions, profile
+        run_preprocessor_agent, raw_transactions, profile, preprocess_state
     )
     baseline_task = run_baseline_agent(request.user_id, raw_transactions, profile)
 
@@ -247,90 +423,66 @@ async def ingest_batch(request: IngestBatchRequest):
         preprocessor_task, baseline_task
     )
 
-    agent_chain.append(preprocessor_log)
-    step_order += 1
-    db.save_agent_step(
-        trace_id=trace_id,
-        step_order=step_order,
-        agent=preprocessor_log.agent,
-        icon=preprocessor_log.icon,
-        status=preprocessor_log.status,
-        message=preprocessor_log.message,
-        duration_ms=preprocessor_log.duration_ms,
-    )
+    await _record_step(preprocessor_log, agent_chain, trace, on_event)
 
-    agent_chain.append(baseline_log)
-    step_order += 1
-    db.save_agent_step(
-        trace_id=trace_id,
-        step_order=step_order,
-        agent=baseline_log.agent,
-        icon=baseline_log.icon,
-        status=baseline_log.status,
-        message=baseline_log.message,
-        duration_ms=baseline_log.duration_ms,
-    )
+    await _record_step(baseline_log, agent_chain, trace, on_event)
 
     # 4. Anomaly Detector
-    compliance = db.get_compliance_state(profile.country)
-    if not compliance:
-        db.complete_agent_trace(trace_id, failed=True)
+    if active_rulebook is None:
+        active_rulebook = await adb.get_compliance_rulebook(profile.country)
+    if not active_rulebook:
         raise HTTPException(status_code=500, detail="Compliance state not found")
 
-    rulebook = Rulebook(**compliance["rulebook"])
+    rulebook, jurisdiction_version = active_rulebook
 
-    anomaly_result, anomaly_log = await run_anomaly_agent(
-        preprocessed=preprocessed,
-        baseline=baseline,
-        profile=profile,
-        rulebook=rulebook,
-        jurisdiction_version=compliance["current_version"],
+    # Clearly clean batches are settled by the deterministic tier and skip
+    # both LLM agents.
+    fast_path = run_fast_path_screen(
+        preprocessed, baseline, profile, rulebook, jurisdiction_version
     )
+    if fast_path:
+        anomaly_result, anomaly_log = fast_path
+    else:
+        anomaly_result, anomaly_log = await run_anomaly_agent(
+            preprocessed=preprocessed,
+            baseline=baseline,
+            profile=profile,
+            rulebook=rulebook,
+            jurisdiction_version=jurisdiction_version,
+        )
 
-    agent_chain.append(anomaly_log)
-    step_order += 1
-    db.save_agent_step(
-        trace_id=trace_id,
-        step_order=step_order,
-        agent=anomaly_log.agent,
-        icon=anomaly_log.icon,
-        status=anomaly_log.status,
-        message=anomaly_log.message,
-        duration_ms=anomaly_log.duration_ms,
-    )
+    await _record_step(anomaly_log, agent_chain, trace, on_event)
 
     # 5. Validator Agent (quality control)
-    validated_result, validator_log, validator_loops = await run_validator_agent(
-        anomaly_result=anomaly_result,
-        preprocessed=preprocessed,
-        baseline=baseline,
-        profile=profile,
-        rulebook=rulebook,
-    )
-    anomaly_result = validated_result
-
-    validator_log_entry = AgentLogEntry(
-        agent=validator_log.agent,
-        icon=validator_log.icon,
-        status=validator_log.status,
-        message=validator_log.message,
-        duration_ms=validator_log.duration_ms,
-        retry_count=validator_loops,
-        retry_type="logical" if validator_loops > 0 else None,
-    )
-    agent_chain.append(validator_log_entry)
-    step_order += 1
-    db.save_agent_step(
-        trace_id=trace_id,
-        step_order=step_order,
-        agent=validator_log.agent,
-        icon=validator_log.icon,
-        status=validator_log.status,
-        message=validator_log.message,
-        duration_ms=validator_log.duration_ms,
-        retry_count=validator_loops,
-        retry_type="logical" if validator_loops > 0 else None,
-    )
+    if fast_path:
+        validator_loops = 0
+        validator_log_entry = AgentLogEntry(
+            agent="Anomaly Validator Agent",
+            icon="🛡️",
+            status="success",
+            message="Skipped — deterministic fast-path result below escalation threshold",
+            duration_ms=0,
+        )
+    else:
+        validated_result, validator_log, validator_loops = await run_validator_agent(
+            anomaly_result=anomaly_result,
+            preprocessed=preprocessed,
+            baseline=baseline,
+            profile=profile,
+            rulebook=rulebook,
+        )
+        anomaly_result = validated_result
+
+        validator_log_entry = AgentLogEntry(
+            agent=validator_log.agent,
+            icon=validator_log.icon,
+            status=validator_log.status,
+            message=validator_log.message,
+            duration_ms=validator_log.duration_ms,
+            retry_count=validator_loops,
+            retry_type="logical" if validator_loops > 0 else None,
+        )
+    await _record_step(validator_log_entry, agent_chain, trace, on_event)
 
     # Derive risk profile
     if anomaly_result.risk_score >= 50:
@@ -341,20 +493,28 @@ async def ingest_batch(request: IngestBatchRequest):
         derived_risk_profile = "low"
 
     # Persist risk state to Supabase
-    db.upsert_risk_state(
+    await adb.upsert_risk_state(
         user_id=request.user_id,
         risk_score=anomaly_result.risk_score,
         risk_band=anomaly_result.risk_band,
         risk_profile=derived_risk_profile,
     )
 
-    # Save preprocessed transactions
-    try:
-        db.save_preprocessed_transactions(preprocessed, batch_id)
-    except Exception as e:
-        logger.warning(f"Failed to save preprocessed transactions: {e}")
+    # Save preprocessed transactions and carry the preprocessor state forward
+    saved, state_saved = await asyncio.gather(
+        adb.save_preprocessed_transactions(preprocessed, batch_id),
+        adb.upsert_preprocess_state(
+            next_preprocess_state(request.user_id, preprocessed, preprocess_state)
+        ),
+        return_exceptions=True,
+    )
+    if isinstance(saved, Exception):
+        logger.warning(f"Failed to save preprocessed transactions: {saved}")
+    if isinstance(state_saved, Exception):
+        logger.warning(f"Failed to save preprocess state: {state_saved}")
 
-    last_preprocessed = preprocessed[-1] if preprocessed else preprocessed[0]
+    # Columnar batches hold plain rows; only the response needs a model.
+    last_preprocessed = PreprocessedTransaction.model_validate(preprocessed[-1].model_dump())
 
     response = FullAnalysisResponse(
         user_id=request.user_id,
@@ -375,31 +535,174 @@ async def ingest_batch(request: IngestBatchRequest):
         validator_loops=validator_loops,
     )
 
-    db.complete_agent_trace(trace_id, result=response.model_dump())
+    await trace.complete(result=response.model_dump())
 
     return response
 
 
-@app.post("/api/compliance/{jurisdiction_code}/push")
-async def push_compliance(jurisdiction_code: str, request: CompliancePushRequest):
+@app.post("/api/ingest-batch")
+async def ingest_batch(request: IngestBatchRequest):
+    return await _run_ingest_batch(request)
+
+
+@app.post("/api/ingest-batch/stream")
+async def ingest_batch_stream(request: IngestBatchRequest):
+    """SSE variant of /api/ingest-batch: one `step` event per agent, then `result`."""
+    return _stream_workflow(lambda on_event: _run_ingest_batch(request, on_event))
+
+
+async def _run_bulk_ingest(
+    request: BulkIngestRequest,
+    on_event: EventCallback | None = None,
+) -> BulkIngestResponse:
+    if bool(request.user_ids) == bool(request.jurisdiction_code):
+        raise HTTPException(status_code=400, detail="Provide either user_ids or jurisdiction_code")
+
+    job_id = str(uuid.uuid4())
+    start = time.time()
+    code = request.jurisdiction_code.upper() if request.jurisdiction_code else None
+    concurrency = max(1, min(request.concurrency or BULK_INGEST_CONCURRENCY, BULK_INGEST_MAX_CONCURRENCY))
+
+    # One profile query for the whole job instead of one per user.
+    if code:
+        profiles = await adb.get_profiles(country=code)
+        user_ids = [p["user_id"] for p in profiles]
+    else:
+        user_ids = list(dict.fromkeys(request.user_ids))
+        profiles = await adb.get_profiles(user_ids=user_ids)
+    if len(user_ids) > BULK_INGEST_MAX_USERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Bulk ingest is limited to {BULK_INGEST_MAX_USERS} users per job",
+        )
+    profiles_by_id = {p["user_id"]: p for p in profiles}
+
+    # Resolve each jurisdiction's rulebook once, so every user in the job is
+    # screened against the same version even if a draft is approved mid-run.
+    countries = sorted({p["country"] for p in profiles})
+    rulebooks = dict(zip(countries, await asyncio.gather(*(adb.get_compliance_rulebook(c) for c in countries))))
+    if code and rulebooks.get(code) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown jurisdiction: {code}")
+
+    logger.info(f"Bulk ingest {job_id}: {len(user_ids)} users, concurrency {concurrency}")
+    if on_event:
+        await on_event("job", {"job_id": job_id, "total_users": len(user_ids), "concurrency": concurrency})
+
+    semaphore = asyncio.Semaphore(concurrency)
+    fields = request.model_dump(exclude={"user_ids", "jurisdiction_code", "concurrency"})
+
+    async def screen(user_id: str) -> BulkUserResult:
+        async with semaphore:
+            user_start = time.time()
+            user_data = profiles_by_id.get(user_id)
+            try:
+                if user_data is None:
+                    raise HTTPException(status_code=404, detail=f"User not found: {user_id}")
+                active_rulebook = rulebooks.get(user_data["country"])
+                if active_rulebook is None:
+                    raise HTTPException(status_code=500, detail="Compliance state not found")
+                response = await _run_ingest_batch(
+                    IngestBatchRequest(user_id=user_id, **fields),
+                    user_data=user_data,
+                    active_rulebook=active_rulebook,
+                )
+                result = BulkUserResult(
+                    user_id=user_id,
+                    status="success",
+                    risk_score=response.risk_score,
+                    risk_band=response.risk_band,
+                    risk_profile=response.risk_profile,
+                    flags=response.flags,
+                    trace_id=response.trace_id,
+                )
+            except Exception as e:
+                if not isinstance(e, HTTPException):
+                    logger.exception(f"Bulk ingest {job_id}: {user_id} failed")
+                result = BulkUserResult(
+                    user_id=user_id,
+                    status="error",
+                    error=str(e.detail) if isinstance(e, HTTPException) else str(e),
+                )
+            result.duration_ms = int((time.time() - user_start) * 1000)
+        if on_event:
+            await on_event("user", result.model_dump())
+        return result
+
+    results = await asyncio.gather(*(screen(user_id) for user_id in user_ids))
+
+    succeeded = [r for r in results if r.status == "success"]
+    band_counts = {band: 0 for band in ("HIGH", "MEDIUM", "LOW", "CLEAN")}
+    for r in succeeded:
+        band_counts[r.risk_band] += 1
+
+    response = BulkIngestResponse(
+        job_id=job_id,
+        jurisdiction_code=code,
+        rulebook_versions={c: rb[1] for c, rb in rulebooks.items() if rb},
+        concurrency=concurrency,
+        total_users=len(results),
+        succeeded=len(succeeded),
+        failed=len(results) - len(succeeded),
+        band_counts=band_counts,
+        avg_risk_score=(
+            round(sum(r.risk_score for r in succeeded) / len(succeeded), 2) if succeeded else None
+        ),
+        duration_ms=int((time.time() - start) * 1000),
+        results=results,
+    )
+    logger.info(
+        f"Bulk ingest {job_id} done: {response.succeeded}/{response.total_users} succeeded "
+        f"in {response.duration_ms}ms, bands {band_counts}"
+    )
+    return response
+
+
+@app.post("/api/ingest-batch/bulk")
+async def ingest_batch_bulk(request: BulkIngestRequest):
+    return await _run_bulk_ingest(request)
+
+
+@app.post("/api/ingest-batch/bulk/stream")
+async def ingest_batch_bulk_stream(request: BulkIngestRequest):
+    """SSE variant of /api/ingest-batch/bulk: `job`, one `user` event per finished user, then `result`."""
+    return _stream_workflow(lambda on_event: _run_bulk_ingest(request, on_event))
+
+
+async def _run_push_compliance(
+    jurisdiction_code: str,
+    request: CompliancePushRequest,
+    on_event: EventCallback | None = None,
+) -> CompliancePushResponse:
     jurisdiction_code = jurisdiction_code.upper()
-    agent_chain: list[AgentLogEntry] = []
-    step_order = 0
 
-    compliance = db.get_compliance_state(jurisdiction_code)
+    compliance = await adb.get_compliance_state(jurisdiction_code)
     if not compliance:
         raise HTTPException(status_code=404, detail=f"Unknown jurisdiction: {jurisdiction_code}")
 
-    jurisdiction = compliance["jurisdiction"]
-
-    trace_id = db.create_agent_trace(
+    trace = TraceRecorder(
         trace_type="compliance_push",
         jurisdiction_code=jurisdiction_code,
     )
+    trace_id = await trace.start()
+    if on_event:
+        await on_event("trace", {"trace_id": trace_id})
+    return await _fail_trace_on_error(
+        trace, _push_compliance_steps(jurisdiction_code, compliance, request, trace, on_event)
+    )
+
 
-    reg_data = db.get_regulation_by_id(request.regulation_update_id)
+async def _push_compliance_steps(
+    jurisdiction_code: str,
+    compliance: dict,
+    request: CompliancePushRequest,
+    trace: TraceRecorder,
+    on_event: EventCallback | None,
+) -> CompliancePushResponse:
+    agent_chain: list[AgentLogEntry] = []
+    jurisdiction = compliance["jurisdiction"]
+
+    reg_data = await adb.get_regulation_by_id(request.regulation_update_id)
     if not reg_data:
-        db.complete_agent_trace(trace_id, failed=True)
         raise HTTPException(
             status_code=404,
             detail=f"Regulation {request.regulation_update_id} not found",
@@ -418,67 +721,59 @@ async def push_compliance(jurisdiction_code: str, request: CompliancePushRequest
     ver_num = int(current_ver.replace("v", "")) + 1
     new_version = f"v{ver_num}"
 
-    # 1. Summarizer
-    summary, summarizer_log = await run_summarizer_agent(regulation)
-    agent_chain.append(summarizer_log)
-    step_order += 1
-    db.save_agent_step(
-        trace_id=trace_id, step_order=step_order,
-        agent=summarizer_log.agent, icon=summarizer_log.icon,
-        status=summarizer_log.status, message=summarizer_log.message,
-        duration_ms=summarizer_log.duration_ms,
-    )
-
-    # 2. Comparison
-    comparison_points, comparison_log = await run_comparison_agent(
-        old_regulations=old_regulations,
-        new_regulation=regulation,
-        jurisdiction=jurisdiction,
-    )
-    agent_chain.append(comparison_log)
-    step_order += 1
-    db.save_agent_step(
-        trace_id=trace_id, step_order=step_order,
-        agent=comparison_log.agent, icon=comparison_log.icon,
-        status=comparison_log.status, message=comparison_log.message,
-        duration_ms=comparison_log.duration_ms,
-    )
-
-    # 3. Analyzer
-    impact_analysis, analyzer_log = await run_analyzer_agent(
-        old_regulations=old_regulations,
-        new_regulation=regulation,
-        jurisdiction=jurisdiction,
-        jurisdiction_code=jurisdiction_code,
-    )
-    agent_chain.append(analyzer_log)
-    step_order += 1
-    db.save_agent_step(
-        trace_id=trace_id, step_order=step_order,
-        agent=analyzer_log.agent, icon=analyzer_log.icon,
-        status=analyzer_log.status, message=analyzer_log.message,
-        duration_ms=analyzer_log.duration_ms,
+    # The agents form a small DAG: the summarizer, comparison and analyzer
+    # are independent, and only the editor waits on the analyzer. Steps are
+    # still recorded in pipeline order once everything has finished; streamed
+    # step events go out as each agent completes.
+    async def analyze_then_edit():
+        # 3. Analyzer
+        analysis = await _emit_when_done(
+            run_analyzer_agent(
+                old_regulations=old_regulations,
+                new_regulation=regulation,
+                jurisdiction=jurisdiction,
+                jurisdiction_code=jurisdiction_code,
+            ),
+            on_event,
+        )
+        # 4. Rulebook Editor (with integrity guardrails)
+        edit = await _emit_when_done(
+            run_rulebook_editor_agent(
+                impact_analysis=analysis[0],
+                current_rulebook=current_rulebook,
+                jurisdiction=jurisdiction,
+                jurisdiction_code=jurisdiction_code,
+                new_version=new_version,
+            ),
+            on_event,
+        )
+        return analysis, edit
+
+    (
+        (summary, summarizer_log),
+        (comparison_points, comparison_log),
+        ((impact_analysis, analyzer_log), (updated_rulebook, rulebook_changes, editor_log)),
+    ) = await asyncio.gather(
+        # 1. Summarizer
+        _emit_when_done(run_summarizer_agent(regulation), on_event),
+        # 2. Comparison
+        _emit_when_done(
+            run_comparison_agent(
+                old_regulations=old_regulations,
+                new_regulation=regulation,
+                jurisdiction=jurisdiction,
+            ),
+            on_event,
+        ),
+        analyze_then_edit(),
     )
 
-    # 4. Rulebook Editor (with integrity guardrails)
-    updated_rulebook, rulebook_changes, editor_log = await run_rulebook_editor_agent(
-        impact_analysis=impact_analysis,
-        current_rulebook=current_rulebook,
-        jurisdiction=jurisdiction,
-        jurisdiction_code=jurisdiction_code,
-        new_version=new_version,
-    )
-    agent_chain.append(editor_log)
-    step_order += 1
-    db.save_agent_step(
-        trace_id=trace_id, step_order=step_order,
-        agent=editor_log.agent, icon=editor_log.icon,
-        status=editor_log.status, message=editor_log.message,
-        duration_ms=editor_log.duration_ms,
-    )
+    for log in (summarizer_log, comparison_log, analyzer_log, editor_log):
+        agent_chain.append(log)
+        trace.record(log)
 
     # HITL: Write to compliance_drafts instead of directly activating
-    draft_id = db.create_compliance_draft(
+    draft_id = await adb.create_compliance_draft(
         jurisdiction_code=jurisdiction_code,
         proposed_version=new_version,
         rulebook=updated_rulebook.model_dump(),
@@ -491,7 +786,7 @@ async def push_compliance(jurisdiction_code: str, request: CompliancePushRequest
         regulation_id=request.regulation_update_id,
     )
 
-    db.complete_agent_trace(trace_id, result={"draft_id": draft_id})
+    await trace.complete(result={"draft_id": draft_id})
 
     response = CompliancePushResponse(
         jurisdiction_code=jurisdiction_code,
@@ -509,25 +804,139 @@ async def push_compliance(jurisdiction_code: str, request: CompliancePushRequest
     return response
 
 
+@app.post("/api/compliance/{jurisdiction_code}/push")
+async def push_compliance(jurisdiction_code: str, request: CompliancePushRequest):
+    return await _run_push_compliance(jurisdiction_code, request)
+
+
+@app.post("/api/compliance/{jurisdiction_code}/push/stream")
+async def push_compliance_stream(jurisdiction_code: str, request: CompliancePushRequest):
+    """SSE variant of /api/compliance/{code}/push: one `step` event per agent, then `result`."""
+    return _stream_workflow(
+        lambda on_event: _run_push_compliance(jurisdiction_code, request, on_event)
+    )
+
+
+# ── Background Jobs ──
+# Submit endpoints persist a job and return 202 straight away; a worker pool
+# runs the same workflows as the synchronous endpoints. Poll
+# /api/jobs/{job_id} for status, result and the agent trace.
+
+job_queue = get_job_queue()
+job_queue.register(
+    "ingest_batch",
+    lambda payload, on_event: _run_ingest_batch(IngestBatchRequest(**payload), on_event),
+)
+job_queue.register(
+    "bulk_ingest",
+    lambda payload, on_event: _run_bulk_ingest(BulkIngestRequest(**payload), on_event),
+)
+job_queue.register(
+    "compliance_push",
+    lambda payload, on_event: _run_push_compliance(
+        payload["jurisdiction_code"],
+        CompliancePushRequest(regulation_update_id=payload["regulation_update_id"]),
+        on_event,
+    ),
+)
+
+
+@app.post("/api/jobs/ingest-batch", status_code=202)
+async def submit_ingest_batch_job(request: IngestBatchRequest, priority: Optional[int] = None):
+    return await job_queue.submit("ingest_batch", request.model_dump(), priority)
+
+
+@app.post("/api/jobs/ingest-batch/bulk", status_code=202)
+async def submit_bulk_ingest_job(request: BulkIngestRequest, priority: Optional[int] = None):
+    if bool(request.user_ids) == bool(request.jurisdiction_code):
+        raise HTTPException(status_code=400, detail="Provide either user_ids or jurisdiction_code")
+    return await job_queue.submit("bulk_ingest", request.model_dump(), priority)
+
+
+@app.post("/api/jobs/compliance/{jurisdiction_code}/push", status_code=202)
+async def submit_push_compliance_job(
+    jurisdiction_code: str, request: CompliancePushRequest, priority: Optional[int] = None
+):
+    payload = {
+        "jurisdiction_code": jurisdiction_code.upper(),
+        "regulation_update_id": request.regulation_update_id,
+    }
+    return await job_queue.submit("compliance_push", payload, priority)
+
+
+@app.get("/api/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = Query(default=50, ge=1, le=500)):
+    return {"jobs": await job_queue.list_jobs(status, limit), **job_queue.stats()}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    trace, steps = None, []
+    if job.trace_id:
+        try:
+            trace, steps = await asyncio.gather(
+                adb.get_agent_trace(job.trace_id),
+                adb.get_agent_steps(job.trace_id),
+            )
+        except Exception as e:
+            logger.warning(f"Failed to load trace {job.trace_id} for job {job_id}: {e}")
+
+    return {"job": job, "trace": trace, "steps": steps}
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = await job_queue.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/jobs/{job_id}/retry")
+async def retry_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status not in ("failed", "cancelled"):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}; only failed or cancelled jobs can be retried")
+    return await job_queue.retry(job_id)
+
+
 # ── HITL Endpoints ──
 
 @app.get("/api/drafts")
 async def list_drafts(jurisdiction_code: str | None = None):
-    drafts = db.get_pending_drafts(jurisdiction_code)
+    drafts = await adb.get_pending_drafts(jurisdiction_code)
     return {"drafts": drafts}
 
 
 @app.get("/api/drafts/{draft_id}")
 async def get_draft(draft_id: str):
-    draft = db.get_draft_by_id(draft_id)
+    draft = await adb.get_draft_by_id(draft_id)
     if not draft:
         raise HTTPException(status_code=404, detail="Draft not found")
     return draft
 
 
+@app.get("/api/drafts/{draft_id}/impact", response_model=ImpactSimulation)
+async def get_draft_impact(draft_id: str, days: int = Query(IMPACT_SIM_HISTORY_DAYS, ge=0)):
+    """Replay the jurisdiction's last `days` of history (0 = all) under the current and proposed rulebooks."""
+    draft = await adb.get_draft_by_id(draft_id)
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    try:
+        return await simulate_draft_impact(draft, history_days=days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/api/drafts/{draft_id}/approve")
 async def approve_draft_endpoint(draft_id: str, request: DraftApproveRequest = DraftApproveRequest()):
-    result = db.approve_draft(draft_id, edited_rulebook=request.edited_rulebook)
+    result = await adb.approve_draft(draft_id, edited_rulebook=request.edited_rulebook)
     if not result:
         raise HTTPException(
             status_code=400,
@@ -542,7 +951,7 @@ async def approve_draft_endpoint(draft_id: str, request: DraftApproveRequest = D
 
 @app.post("/api/drafts/{draft_id}/reject")
 async def reject_draft_endpoint(draft_id: str):
-    result = db.reject_draft(draft_id)
+    result = await adb.reject_draft(draft_id)
     if not result:
         raise HTTPException(
             status_code=400,
@@ -559,23 +968,16 @@ async def reject_draft_endpoint(draft_id: str):
 
 @app.get("/api/traces/{trace_id}")
 async def get_trace(trace_id: str):
-    from utils.supabase_client import get_supabase
-    sb = get_supabase()
-    trace = sb.table("agent_traces").select("*").eq("id", trace_id).execute()
-    if not trace.data:
-        raise HTTPException(status_code=404, detail="Trace not found")
-
-    steps = (
-        sb.table("agent_steps")
-        .select("*")
-        .eq("trace_id", trace_id)
-        .order("step_order")
-        .execute()
+    trace, steps = await asyncio.gather(
+        adb.get_agent_trace(trace_id),
+        adb.get_agent_steps(trace_id),
     )
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found")
 
     return {
-        "trace": trace.data[0],
-        "steps": steps.data,
+        "trace": trace,
+        "steps": steps,
     }
 
 
@@ -592,10 +994,22 @@ async def health_check():
             "rulebook_integrity_guardrails",
             "hitl_draft_review",
             "agent_trace_logging",
+            "buffered_trace_writes",
+            "async_data_layer",
+            "llm_response_cache",
+            "tiered_anomaly_fast_path",
+            "streaming_baselines",
+            "background_job_queue",
+            "draft_impact_simulation",
         ],
     }
 
 
+@app.get("/api/metrics/llm")
+async def llm_metrics():
+    return get_llm_metrics()
+
+
 @app.get("/api/debug")
 async def debug_info():
     return {
@@ -614,6 +1028,15 @@ async def startup_log():
     logger.info(f"SUPABASE_URL set: {bool(os.getenv('SUPABASE_URL'))}")
     logger.info(f"SUPABASE_KEY set: {bool(os.getenv('SUPABASE_KEY'))}")
     logger.info(f"ALLOWED_ORIGINS: {ALLOWED_ORIGINS}")
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def flush_on_shutdown():
+    await job_queue.shutdown()
+    await get_trace_writer().shutdown()
+    shutdown_pool()
+    adb.shutdown_executor()
 
 
 if __name__ == "__main__":
@@ -1,14 +1,23 @@
 from .user import UserProfile, UserBaseline
-from .transaction import RawTransaction, PreprocessedTransaction
+from .transaction import RawTransaction, PreprocessedTransaction, PreprocessState
 from .compliance import Regulation, RuleEntry, Rulebook, JurisdictionCompliance
 from .risk import AnomalyResult, RiskBand
-from .agent_log import AgentLogEntry, FullAnalysisResponse, CompliancePushResponse
+from .agent_log import (
+    AgentLogEntry,
+    FullAnalysisResponse,
+    CompliancePushResponse,
+    BulkUserResult,
+    BulkIngestResponse,
+)
+from .job import AnalysisJob, JobStatus
+from .impact import ImpactSimulation, UserBandChange
 
 __all__ = [
     "UserProfile",
     "UserBaseline",
     "RawTransaction",
     "PreprocessedTransaction",
+    "PreprocessState",
     "Regulation",
     "RuleEntry",
     "Rulebook",
@@ -18,4 +27,10 @@ __all__ = [
     "AgentLogEntry",
     "FullAnalysisResponse",
     "CompliancePushResponse",
+    "BulkUserResult",
+    "BulkIngestResponse",
+    "AnalysisJob",
+    "JobStatus",
+    "ImpactSimulation",
+    "UserBandChange",
 ]
@@ -46,3 +46,29 @@ class CompliancePushResponse(BaseModel):
     agent_chain: list[AgentLogEntry]
     draft_id: Optional[str] = None
     status: str = "pending_review"
+
+
+class BulkUserResult(BaseModel):
+    user_id: str
+    status: Literal["success", "error"]
+    risk_score: Optional[int] = None
+    risk_band: Optional[Literal["HIGH", "MEDIUM", "LOW", "CLEAN"]] = None
+    risk_profile: Optional[Literal["low", "medium", "high"]] = None
+    flags: list[str] = []
+    trace_id: Optional[str] = None
+    duration_ms: int = 0
+    error: Optional[str] = None
+
+
+class BulkIngestResponse(BaseModel):
+    job_id: str
+    jurisdiction_code: Optional[str] = None
+    rulebook_versions: dict[str, str] = {}
+    concurrency: int
+    total_users: int
+    succeeded: int
+    failed: int
+    band_counts: dict[str, int]
+    avg_risk_score: Optional[float] = None
+    duration_ms: int
+    results: list[BulkUserResult]
@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+
+
+Band = Literal["HIGH", "MEDIUM", "LOW", "CLEAN"]
+
+
+class UserBandChange(BaseModel):
+    user_id: str
+    old_band: Band
+    new_band: Band
+    old_score: int
+    new_score: int
+
+
+class ImpactSimulation(BaseModel):
+    draft_id: str
+    jurisdiction_code: str
+    proposed_version: str
+    history_since: Optional[str] = None
+    users: int
+    transactions: int
+    days_scored: int
+    users_band_changed: int
+    users_escalated: int
+    users_deescalated: int
+    transactions_band_changed: int
+    transactions_flagged_old: int
+    transactions_flagged_new: int
+    user_bands_old: dict[str, int]
+    user_bands_new: dict[str, int]
+    user_band_transitions: dict[str, int]
+    transaction_band_transitions: dict[str, int]
+    top_changes: list[UserBandChange]
+    unmatched_rules_old: list[str]
+    unmatched_rules_new: list[str]
+    partitions: int
+    workers: int
+    duration_ms: int
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+
+
+JobStatus = Literal["queued", "running", "completed", "failed", "cancelled"]
+
+
+class AnalysisJob(BaseModel):
+    id: str
+    kind: str
+    priority: int
+    status: JobStatus = "queued"
+    payload: dict
+    trace_id: Optional[str] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: str
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
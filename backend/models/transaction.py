@@ -31,3 +31,13 @@ class PreprocessedTransaction(BaseModel):
     daily_total_usd: float = 0.0
     tx_count_per_day: int = 0
     is_new_country: bool = False
+
+
+class PreprocessState(BaseModel):
+    user_id: str
+    last_timestamp: str = ""
+    last_country: str = ""
+    last_city: str = ""
+    day_key: str = ""
+    day_total_usd: float = 0.0
+    day_tx_count: int = 0
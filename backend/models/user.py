@@ -24,3 +24,5 @@ class UserBaseline(BaseModel):
     excluded_anomalies_count: int = 0
     min_tx_amount_usd: float = 0.0
     max_tx_amount_usd: float = 0.0
+    # Streaming sufficient statistics (utils/baseline_stats.BaselineStats)
+    stream_stats: dict | None = None
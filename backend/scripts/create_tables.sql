@@ -26,9 +26,13 @@ CREATE TABLE IF NOT EXISTS baselines (
     excluded_anomalies_count INTEGER NOT NULL DEFAULT 0,
     min_tx_amount_usd DOUBLE PRECISION DEFAULT 0.0,
     max_tx_amount_usd DOUBLE PRECISION DEFAULT 0.0,
+    stream_stats JSONB,
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Streaming baseline statistics (for databases created before the column existed)
+ALTER TABLE baselines ADD COLUMN IF NOT EXISTS stream_stats JSONB;
+
 -- 3. risk_state
 CREATE TABLE IF NOT EXISTS risk_state (
     user_id TEXT PRIMARY KEY REFERENCES profiles(user_id) ON DELETE CASCADE,
@@ -65,6 +69,7 @@ CREATE TABLE IF NOT EXISTS transactions (
 CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_id);
 CREATE INDEX IF NOT EXISTS idx_transactions_batch_id ON transactions(batch_id);
 CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_timestamp ON transactions(user_id, timestamp DESC, id DESC);
 
 -- 5. compliance_state
 CREATE TABLE IF NOT EXISTS compliance_state (
@@ -156,8 +161,146 @@ CREATE TABLE IF NOT EXISTS compliance_drafts (
 
 CREATE INDEX IF NOT EXISTS idx_compliance_drafts_status ON compliance_drafts(jurisdiction_code, status);
 
+-- 11. latest_analyses (most recent completed transaction analysis per user)
+CREATE INDEX IF NOT EXISTS idx_agent_traces_latest_analysis
+    ON agent_traces(user_id, created_at DESC)
+    WHERE trace_type = 'transaction_analysis' AND status = 'completed';
+
+CREATE OR REPLACE VIEW latest_analyses AS
+SELECT DISTINCT ON (user_id)
+    user_id,
+    id AS trace_id,
+    result,
+    created_at
+FROM agent_traces
+WHERE trace_type = 'transaction_analysis'
+  AND status = 'completed'
+  AND user_id IS NOT NULL
+ORDER BY user_id, created_at DESC;
+
+-- 12. recent_transactions (windowed history for /api/init)
+CREATE OR REPLACE FUNCTION recent_transactions(p_since TIMESTAMPTZ, p_per_user_limit INTEGER)
+RETURNS SETOF transactions
+LANGUAGE sql STABLE
+AS $$
+    SELECT t.*
+    FROM (
+        SELECT tx.id,
+               ROW_NUMBER() OVER (PARTITION BY tx.user_id ORDER BY tx.timestamp DESC, tx.id DESC) AS rn
+        FROM transactions tx
+        WHERE tx.timestamp >= p_since
+    ) ranked
+    JOIN transactions t ON t.id = ranked.id
+    WHERE ranked.rn <= p_per_user_limit
+    ORDER BY t.user_id, t.timestamp ASC, t.id ASC;
+$$;
+
+-- 13. preprocess_state (rolling per-user preprocessor state between batches)
+CREATE TABLE IF NOT EXISTS preprocess_state (
+    user_id TEXT PRIMARY KEY REFERENCES profiles(user_id) ON DELETE CASCADE,
+    last_timestamp TEXT NOT NULL DEFAULT '',
+    last_country TEXT NOT NULL DEFAULT '',
+    last_city TEXT NOT NULL DEFAULT '',
+    day_key DATE,
+    day_total_usd DOUBLE PRECISION NOT NULL DEFAULT 0,
+    day_tx_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- 14. analysis_jobs (background workflow queue)
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    kind TEXT NOT NULL CHECK (kind IN ('ingest_batch', 'bulk_ingest', 'compliance_push')),
+    priority INTEGER NOT NULL DEFAULT 10,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed', 'cancelled')),
+    payload JSONB NOT NULL,
+    trace_id UUID,
+    result JSONB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    completed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status ON analysis_jobs(status, priority, created_at);
+
+-- 15. jurisdiction_baseline_aggregates (population summary for impact analysis)
+CREATE INDEX IF NOT EXISTS idx_profiles_country ON profiles(country);
+
+CREATE OR REPLACE FUNCTION jurisdiction_baseline_aggregates(
+    p_country TEXT,
+    p_edges DOUBLE PRECISION[],
+    p_percentiles DOUBLE PRECISION[],
+    p_thresholds DOUBLE PRECISION[]
+)
+RETURNS JSONB
+LANGUAGE sql STABLE
+AS $$
+    WITH users AS (
+        SELECT p.income_level, b.avg_tx_amount_usd, b.avg_daily_total_usd, b.max_tx_amount_usd
+        FROM profiles p
+        LEFT JOIN baselines b ON b.user_id = p.user_id
+        WHERE p.country = p_country
+    ),
+    metrics AS (
+        SELECT m.metric, m.value
+        FROM users u
+        CROSS JOIN LATERAL (VALUES
+            ('avg_tx_amount_usd', u.avg_tx_amount_usd),
+            ('avg_daily_total_usd', u.avg_daily_total_usd)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ),
+    histograms AS (
+        SELECT metric, jsonb_object_agg(bucket, n) AS histogram
+        FROM (
+            SELECT metric, width_bucket(value, p_edges) AS bucket, COUNT(*) AS n
+            FROM metrics
+            GROUP BY metric, bucket
+        ) h
+        GROUP BY metric
+    ),
+    summaries AS (
+        SELECT s.metric, jsonb_build_object(
+            'mean', s.mean,
+            'max', s.max,
+            'percentiles', s.percentiles,
+            'histogram', h.histogram
+        ) AS summary
+        FROM (
+            SELECT metric,
+                   AVG(value) AS mean,
+                   MAX(value) AS max,
+                   percentile_cont(p_percentiles) WITHIN GROUP (ORDER BY value) AS percentiles
+            FROM metrics
+            GROUP BY metric
+        ) s
+        JOIN histograms h ON h.metric = s.metric
+    )
+    SELECT jsonb_build_object(
+        'user_count', (SELECT COUNT(*) FROM users),
+        'with_baseline', (SELECT COUNT(avg_tx_amount_usd) FROM users),
+        'income_levels', (
+            SELECT COALESCE(jsonb_object_agg(income_level, n), '{}'::jsonb)
+            FROM (SELECT income_level, COUNT(*) AS n FROM users GROUP BY income_level) i
+        ),
+        'metrics', (SELECT COALESCE(jsonb_object_agg(metric, summary), '{}'::jsonb) FROM summaries),
+        'thresholds', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'threshold_usd', t,
+                'avg_tx_above', (SELECT COUNT(*) FROM users WHERE avg_tx_amount_usd > t),
+                'avg_daily_above', (SELECT COUNT(*) FROM users WHERE avg_daily_total_usd > t),
+                'max_tx_above', (SELECT COUNT(*) FROM users WHERE GREATEST(max_tx_amount_usd, avg_tx_amount_usd) > t)
+            ) ORDER BY t), '[]'::jsonb)
+            FROM unnest(p_thresholds) AS t
+        )
+    );
+$$;
+
 -- Enable Realtime for key tables
 ALTER PUBLICATION supabase_realtime ADD TABLE agent_traces;
 ALTER PUBLICATION supabase_realtime ADD TABLE agent_steps;
 ALTER PUBLICATION supabase_realtime ADD TABLE risk_state;
 ALTER PUBLICATION supabase_realtime ADD TABLE compliance_drafts;
+ALTER PUBLICATION supabase_realtime ADD TABLE analysis_jobs;
@@ -0,0 +1,408 @@
+"""
+High-volume synthetic load generator.
+
+Builds tens of thousands of synthetic users and millions of transactions over
+several weeks, using vectorised NumPy sampling from a fixed seed. Amount
+ranges, currencies, transaction types and the country/city lookup are shared
+with scripts/faker_generator.py. Anomalies are injected as extra
+transactions at per-user-day rates:
+
+  geo_hop      home-country tx, then one in a distant country 10-60 min later
+  structuring  3-6 tx just below the structuring threshold within 6 hours
+  burst        4-8 tx within 15 minutes
+  new_country  one tx in a country outside the user's history
+
+Users are processed in chunks and each chunk is written out before the next
+is sampled, so memory stays flat however many rows are generated. Output, in
+--out:
+
+  profiles.ndjson                    profiles table rows
+  transactions.ndjson[.gz]           one RawTransaction per line (--format ndjson)
+  transactions-00000.npz             column arrays per chunk      (--format npz)
+  transactions-00000.parquet         per chunk, needs pyarrow     (--format parquet)
+  manifest.json                      parameters and row / anomaly counts
+
+Usage:
+    cd backend
+    uv run python scripts/generate_load.py --users 20000 --days 28 --out data/load
+    uv run python scripts/generate_load.py --users 50000 --days 42 --format npz --labels
+"""
+
+import sys
+import gzip
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.faker_generator import AMOUNT_RANGES, CURRENCIES, TX_TYPES, COUNTRY_CITIES
+
+JURISDICTIONS = {"MT": 0.4, "AE": 0.35, "KY": 0.25}
+
+# Mirrors utils.rule_engine (not imported: the utils package needs an LLM key).
+STRUCTURING_THRESHOLD_USD = 10_000.0
+STRUCTURING_BAND = 0.9
+SANCTIONED_COUNTRIES = {"KP", "IR", "SY", "CU"}
+
+# Countries a user from each jurisdiction plausibly has in their history.
+TRAVEL_COUNTRIES = {
+    "MT": ["IT", "DE", "GB", "FR", "ES"],
+    "AE": ["SA", "BH", "PK", "IN", "QA"],
+    "KY": ["US", "JM", "GB"],
+}
+# Destinations for injected geo hops: far from all three jurisdictions.
+HOP_COUNTRIES = ["US", "JP", "SG", "ZA", "CN", "IN", "RU", "NG"]
+
+INCOME_LEVELS = {"low": 0.35, "medium": 0.45, "high": 0.2}
+OCCUPATIONS = [
+    "Student", "Engineer", "Freelancer", "Financial Analyst", "Entrepreneur",
+    "Marketing Manager", "Software Developer", "Fund Manager", "Teacher", "Consultant",
+]
+
+ANOMALY_TYPES = ["", "geo_hop", "structuring", "burst", "new_country"]
+
+COUNTRIES = list(COUNTRY_CITIES)
+_COUNTRY_INDEX = {c: i for i, c in enumerate(COUNTRIES)}
+_MAX_CITIES = max(len(c) for c in COUNTRY_CITIES.values())
+CITY_TABLE = np.array(
+    [cities + [""] * (_MAX_CITIES - len(cities)) for cities in COUNTRY_CITIES.values()]
+)
+CITY_COUNTS = np.array([len(c) for c in COUNTRY_CITIES.values()])
+NEW_COUNTRY_POOL = np.array(
+    [i for i, c in enumerate(COUNTRIES) if c not in SANCTIONED_COUNTRIES]
+)
+
+_AMOUNT_SIGMA = 0.45
+_MAX_HISTORY = 1 + max(len(v) for v in TRAVEL_COUNTRIES.values())
+
+
+def _weighted(rng: np.random.Generator, options: dict, size: int) -> np.ndarray:
+    keys = list(options)
+    return np.array(keys)[rng.choice(len(keys), size=size, p=list(options.values()))]
+
+
+def _cities(rng: np.random.Generator, country_idx: np.ndarray) -> np.ndarray:
+    pick = (rng.random(len(country_idx)) * CITY_COUNTS[country_idx]).astype(np.int64)
+    return CITY_TABLE[country_idx, pick]
+
+
+class UserChunk:
+    """Per-user parameters for one chunk of synthetic users."""
+
+    def __init__(self, rng: np.random.Generator, first_id: int, size: int, tx_per_day: float):
+        self.size = size
+        self.country = _weighted(rng, JURISDICTIONS, size)
+        self.home_idx = np.array([_COUNTRY_INDEX[c] for c in self.country])
+        self.income = _weighted(rng, INCOME_LEVELS, size)
+        self.user_id = np.array(
+            [f"{c}-LOAD-{first_id + i:06d}" for i, c in enumerate(self.country)]
+        )
+
+        # History: home country first, then 0-2 travel countries (-1 = unused slot).
+        self.history = np.full((size, _MAX_HISTORY), -1, dtype=np.int64)
+        self.history[:, 0] = self.home_idx
+        self.history_len = rng.choice([1, 2, 3], size=size, p=[0.5, 0.35, 0.15])
+        for code, travel in TRAVEL_COUNTRIES.items():
+            members = np.nonzero(self.country == code)[0]
+            travel_idx = np.array([_COUNTRY_INDEX[c] for c in travel])
+            for slot in (1, 2):
+                picks = travel_idx[rng.integers(0, len(travel_idx), size=len(members))]
+                self.history[members, slot] = np.where(
+                    self.history_len[members] > slot, picks, -1
+                )
+
+        # Typical amount (log-space) from the income range; daily activity is
+        # gamma-distributed so a few users are much busier than the rest.
+        lo = np.array([AMOUNT_RANGES[i][0] for i in self.income], dtype=float)
+        hi = np.array([AMOUNT_RANGES[i][1] for i in self.income], dtype=float)
+        self.log_amount = np.log(rng.uniform(lo, hi))
+        self.daily_rate = rng.gamma(2.0, tx_per_day / 2.0, size=size)
+
+    def profiles(self, rng: np.random.Generator) -> list[dict]:
+        ages = rng.integers(19, 70, size=self.size)
+        occupations = rng.integers(0, len(OCCUPATIONS), size=self.size)
+        kyc = rng.random(self.size) < 0.92
+        rows = []
+        for i in range(self.size):
+            history = list(dict.fromkeys(COUNTRIES[c] for c in self.history[i, : self.history_len[i]]))
+            rows.append({
+                "user_id": self.user_id[i],
+                "age": int(ages[i]),
+                "country": self.country[i],
+                "full_name": f"Load User {self.user_id[i]}",
+                "income_level": self.income[i],
+                "occupation": OCCUPATIONS[occupations[i]],
+                "kyc_status": "verified" if kyc[i] else "pending",
+                "risk_profile": "low",
+                "historical_countries": history,
+            })
+        return rows
+
+
+def _sample_normal(rng, users: UserChunk, days: int, start_epoch: int, travel_share: float) -> dict:
+    counts = rng.poisson(users.daily_rate[:, None], size=(users.size, days)).ravel()
+    user_day = np.repeat(np.arange(users.size * days), counts)
+    user, day = np.divmod(user_day, days)
+    n = len(user)
+
+    hour = np.clip(np.rint(rng.normal(14.0, 3.5, size=n)), 0, 23).astype(np.int64)
+    ts = start_epoch + day * 86400 + hour * 3600 + rng.integers(0, 3600, size=n)
+
+    # Mostly the home country; otherwise a random country from the user's history.
+    slot = (rng.random(n) * users.history_len[user]).astype(np.int64)
+    travelling = rng.random(n) < travel_share
+    country = np.where(travelling, users.history[user, slot], users.home_idx[user])
+
+    amount = np.exp(users.log_amount[user] + _AMOUNT_SIGMA * rng.standard_normal(n))
+    return {"user": user, "ts": ts, "country": country, "amount": amount,
+            "anomaly": np.zeros(n, dtype=np.int8)}
+
+
+def _events(rng, users: UserChunk, days: int, rate: float) -> tuple[np.ndarray, np.ndarray]:
+    """(user, day) of the user-days selected for an injected pattern."""
+    selected = np.nonzero(rng.random(users.size * days) < rate)[0]
+    return np.divmod(selected, days)
+
+
+def _expand(user: np.ndarray, base_ts: np.ndarray, sizes: np.ndarray) -> tuple:
+    """Repeat per-event values once per injected row; also each row's position in its event."""
+    rows_user = np.repeat(user, sizes)
+    rows_ts = np.repeat(base_ts, sizes)
+    starts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    position = np.arange(sizes.sum()) - starts
+    return rows_user, rows_ts, position
+
+
+def _inject(rng, users: UserChunk, days: int, start_epoch: int, rates: dict) -> list[dict]:
+    parts = []
+
+    def event_times(day, low_hour=8, high_hour=20):
+        return start_epoch + day * 86400 + rng.integers(low_hour * 3600, high_hour * 3600, size=len(day))
+
+    def typical_amounts(user):
+        return np.exp(users.log_amount[user] + _AMOUNT_SIGMA * rng.standard_normal(len(user)))
+
+    # Geo hop: home, then a distant country 10-60 minutes later.
+    user, day = _events(rng, users, days, rates["geo_hop"])
+    if len(user):
+        u, ts, pos = _expand(user, event_times(day), np.full(len(user), 2))
+        ts = ts + pos * rng.integers(600, 3600, size=len(u))
+        hop = np.array([_COUNTRY_INDEX[c] for c in HOP_COUNTRIES])[
+            rng.integers(0, len(HOP_COUNTRIES), size=len(u))
+        ]
+        country = np.where(pos == 0, users.home_idx[u], hop)
+        parts.append({"user": u, "ts": ts, "country": country, "amount": typical_amounts(u),
+                      "anomaly": np.full(len(u), 1, dtype=np.int8)})
+
+    # Structuring: several amounts just under the threshold within six hours.
+    user, day = _events(rng, users, days, rates["structuring"])
+    if len(user):
+        u, ts, _ = _expand(user, event_times(day, 8, 14), rng.integers(3, 7, size=len(user)))
+        ts = ts + rng.integers(0, 6 * 3600, size=len(u))
+        threshold = STRUCTURING_THRESHOLD_USD
+        amount = rng.uniform(threshold * STRUCTURING_BAND, threshold * 0.999, size=len(u))
+        parts.append({"user": u, "ts": ts, "country": users.home_idx[u], "amount": amount,
+                      "anomaly": np.full(len(u), 2, dtype=np.int8)})
+
+    # Burst: 4-8 transactions inside 15 minutes.
+    user, day = _events(rng, users, days, rates["burst"])
+    if len(user):
+        u, ts, _ = _expand(user, event_times(day), rng.integers(4, 9, size=len(user)))
+        ts = ts + rng.integers(0, 900, size=len(u))
+        parts.append({"user": u, "ts": ts, "country": users.home_idx[u], "amount": typical_amounts(u),
+                      "anomaly": np.full(len(u), 3, dtype=np.int8)})
+
+    # New country: one transaction outside the user's history.
+    user, day = _events(rng, users, days, rates["new_country"])
+    if len(user):
+        country = NEW_COUNTRY_POOL[rng.integers(0, len(NEW_COUNTRY_POOL), size=len(user))]
+        for _ in range(8):
+            seen = (users.history[user] == country[:, None]).any(axis=1)
+            if not seen.any():
+                break
+            country[seen] = NEW_COUNTRY_POOL[rng.integers(0, len(NEW_COUNTRY_POOL), size=seen.sum())]
+        parts.append({"user": user, "ts": event_times(day), "country": country,
+                      "amount": typical_amounts(user), "anomaly": np.full(len(user), 4, dtype=np.int8)})
+
+    return parts
+
+
+def generate_chunk(
+    rng: np.random.Generator,
+    users: UserChunk,
+    days: int,
+    start_epoch: int,
+    travel_share: float,
+    rates: dict,
+) -> dict[str, np.ndarray]:
+    """Transactions for one chunk of users as column arrays, sorted by user then time."""
+    parts = [_sample_normal(rng, users, days, start_epoch, travel_share)]
+    parts += _inject(rng, users, days, start_epoch, rates)
+    cols = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+
+    order = np.lexsort((cols["ts"], cols["user"]))
+    cols = {k: v[order] for k, v in cols.items()}
+    n = len(order)
+
+    timestamps = np.datetime_as_string(cols["ts"].astype("datetime64[s]"), unit="s")
+    return {
+        "user_id": users.user_id[cols["user"]],
+        "timestamp": np.char.add(timestamps, "+00:00"),
+        "transaction_amount_usd": np.round(cols["amount"], 2),
+        "transaction_currency": np.array(CURRENCIES)[rng.integers(0, len(CURRENCIES), size=n)],
+        "transaction_type": np.array(TX_TYPES)[rng.integers(0, len(TX_TYPES), size=n)],
+        "transaction_country": np.array(COUNTRIES)[cols["country"]],
+        "transaction_city": _cities(rng, cols["country"]),
+        "anomaly": np.array(ANOMALY_TYPES)[cols["anomaly"]],
+    }
+
+
+# ── Writers ──
+
+class NDJSONWriter:
+    def __init__(self, out: Path, compress: bool, labels: bool):
+        path = out / ("transactions.ndjson.gz" if compress else "transactions.ndjson")
+        self._f = gzip.open(path, "wt", encoding="utf-8") if compress else open(path, "w", encoding="utf-8")
+        self._labels = labels
+        self.paths = [path]
+
+    def write(self, cols: dict[str, np.ndarray]) -> None:
+        keys = [k for k in cols if self._labels or k != "anomaly"]
+        columns = [cols[k].tolist() for k in keys]
+        dumps = json.JSONEncoder(ensure_ascii=False).encode
+        self._f.writelines(
+            dumps(dict(zip(keys, row))) + "\n" for row in zip(*columns)
+        )
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class ChunkFileWriter:
+    """One columnar file per chunk (.npz, or .parquet when pyarrow is installed)."""
+
+    def __init__(self, out: Path, fmt: str, labels: bool):
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit("--format parquet needs pyarrow (pip install pyarrow)")
+        self._out = out
+        self._fmt = fmt
+        self._labels = labels
+        self.paths: list[Path] = []
+
+    def write(self, cols: dict[str, np.ndarray]) -> None:
+        if not self._labels:
+            cols = {k: v for k, v in cols.items() if k != "anomaly"}
+        path = self._out / f"transactions-{len(self.paths):05d}.{self._fmt}"
+        if self._fmt == "npz":
+            np.savez_compressed(path, **cols)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            pq.write_table(pa.table({k: v.tolist() if v.dtype.kind == "U" else v for k, v in cols.items()}), path)
+        self.paths.append(path)
+
+    def close(self) -> None:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate high-volume synthetic transactions.")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--tx-per-day", type=float, default=3.0, help="mean transactions per user per day")
+    parser.add_argument("--travel-share", type=float, default=0.15,
+                        help="share of normal transactions made in a non-home history country")
+    parser.add_argument("--geo-hop-rate", type=float, default=0.002, help="per user-day")
+    parser.add_argument("--structuring-rate", type=float, default=0.001, help="per user-day")
+    parser.add_argument("--burst-rate", type=float, default=0.003, help="per user-day")
+    parser.add_argument("--new-country-rate", type=float, default=0.002, help="per user-day")
+    parser.add_argument("--end-date", help="last generated day, YYYY-MM-DD (default: yesterday, UTC)")
+    parser.add_argument("--chunk-users", type=int, default=5_000)
+    parser.add_argument("--format", choices=["ndjson", "npz", "parquet"], default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="gzip the NDJSON output")
+    parser.add_argument("--labels", action="store_true",
+                        help="keep the injected-anomaly label column (not a transactions table column)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=str(Path(__file__).parent.parent / "data" / "load"))
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(args.seed)
+
+    if args.end_date:
+        end = datetime.strptime(args.end_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    else:
+        end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    start_epoch = int((end - timedelta(days=args.days - 1)).timestamp())
+
+    rates = {
+        "geo_hop": args.geo_hop_rate,
+        "structuring": args.structuring_rate,
+        "burst": args.burst_rate,
+        "new_country": args.new_country_rate,
+    }
+    writer = (
+        NDJSONWriter(out, args.gzip, args.labels)
+        if args.format == "ndjson"
+        else ChunkFileWriter(out, args.format, args.labels)
+    )
+
+    started = time.time()
+    total_rows = 0
+    anomaly_rows = {name: 0 for name in ANOMALY_TYPES if name}
+    with open(out / "profiles.ndjson", "w", encoding="utf-8") as profiles_file:
+        for first in range(0, args.users, args.chunk_users):
+            users = UserChunk(rng, first, min(args.chunk_users, args.users - first), args.tx_per_day)
+            for profile in users.profiles(rng):
+                profiles_file.write(json.dumps(profile, ensure_ascii=False) + "\n")
+
+            cols = generate_chunk(rng, users, args.days, start_epoch, args.travel_share, rates)
+            writer.write(cols)
+
+            total_rows += len(cols["user_id"])
+            labels, counts = np.unique(cols["anomaly"], return_counts=True)
+            for label, count in zip(labels, counts):
+                if label:
+                    anomaly_rows[label] += int(count)
+            elapsed = time.time() - started
+            print(
+                f"  users {first + users.size:>8,}/{args.users:,}  rows {total_rows:>12,}  "
+                f"{total_rows / elapsed:>10,.0f} rows/s",
+                flush=True,
+            )
+    writer.close()
+
+    manifest = {
+        "seed": args.seed,
+        "users": args.users,
+        "days": args.days,
+        "start_date": datetime.fromtimestamp(start_epoch, timezone.utc).strftime("%Y-%m-%d"),
+        "end_date": end.strftime("%Y-%m-%d"),
+        "tx_per_day": args.tx_per_day,
+        "travel_share": args.travel_share,
+        "anomaly_rates": rates,
+        "format": args.format,
+        "labels": args.labels,
+        "rows": total_rows,
+        "anomaly_rows": anomaly_rows,
+        "files": [p.name for p in writer.paths],
+    }
+    with open(out / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    elapsed = time.time() - started
+    print(f"Wrote {total_rows:,} transactions for {args.users:,} users to {out} in {elapsed:.1f}s")
+    print(f"Injected anomaly rows: {anomaly_rows}")
+
+
+if __name__ == "__main__":
+    main()
@@ -76,6 +76,12 @@ def reset_all():
     sb.table("transactions").delete().gte("id", 0).execute()
     print("Cleared transactions")
 
+    sb.table("preprocess_state").delete().neq("user_id", "").execute()
+    print("Cleared preprocess_state")
+
+    sb.table("analysis_jobs").delete().neq("status", "").execute()
+    print("Cleared analysis_jobs")
+
     sb.table("compliance_drafts").delete().in_(
         "jurisdiction_code", JURISDICTIONS
     ).execute()
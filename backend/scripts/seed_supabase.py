@@ -1,8 +1,31 @@
-"""Seed Supabase tables from existing JSON data files."""
+"""
+Seed Supabase tables from existing JSON data files, or bulk-load the output
+of scripts/generate_load.py.
 
-import json
+Large tables go through a chunked loader: rows are split into chunks of
+--chunk-size, sent by --concurrency worker threads, and each finished chunk is
+recorded in a checkpoint file so an interrupted load resumes where it
+stopped. Append-only tables (transactions) use Postgres COPY when
+DATABASE_URL is set and psycopg is installed; otherwise they go through
+PostgREST inserts. Loading is at-least-once: a chunk that committed just
+before a crash is sent again on resume.
+
+Usage:
+    cd backend
+    python scripts/seed_supabase.py
+    python scripts/seed_supabase.py --load data/load --chunk-size 5000 --concurrency 8
+"""
+
+import os
 import sys
+import gzip
+import json
+import time
+import argparse
+import threading
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
@@ -13,6 +36,322 @@ from utils.supabase_client import get_supabase
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 
+SEED_CHUNK_SIZE = int(os.getenv("SEED_CHUNK_SIZE", "1000"))
+SEED_CONCURRENCY = int(os.getenv("SEED_CONCURRENCY", "4"))
+SEED_MAX_RETRIES = int(os.getenv("SEED_MAX_RETRIES", "3"))
+# Direct Postgres connection string (Supabase: Settings -> Database), for COPY.
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+TRANSACTION_COLUMNS = (
+    "user_id",
+    "batch_id",
+    "timestamp",
+    "transaction_amount_usd",
+    "transaction_currency",
+    "transaction_type",
+    "transaction_country",
+    "transaction_city",
+    "is_preprocessed",
+)
+
+
+# ── Chunked Loader ──
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    chunk: list[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Checkpoint:
+    """
+    Finished chunks per load key, persisted after every chunk.
+
+    Each key stores its chunk size, a high-water mark (every chunk below it is
+    done) and the few chunks finished out of order above it, so a save costs
+    O(concurrency) however long the load runs.
+    """
+
+    def __init__(self, path: Path | None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state: dict[str, dict] = {}
+        if path and path.exists():
+            with open(path, "r") as f:
+                self._state = {
+                    key: {**entry, "above": set(entry["above"])}
+                    for key, entry in json.load(f).items()
+                }
+
+    def begin(self, key: str, chunk_size: int) -> None:
+        """Start or resume `key`; chunk indexes only line up for the same chunk size."""
+        with self._lock:
+            entry = self._state.setdefault(key, {"chunk_size": chunk_size, "high_water": 0, "above": set()})
+        if entry["chunk_size"] != chunk_size:
+            raise ValueError(
+                f"{key}: checkpoint {self.path} was written with --chunk-size {entry['chunk_size']}, "
+                f"not {chunk_size}; rerun with that size or pass --fresh"
+            )
+
+    def is_done(self, key: str, index: int) -> bool:
+        entry = self._state.get(key)
+        return bool(entry) and (index < entry["high_water"] or index in entry["above"])
+
+    def mark(self, key: str, index: int) -> None:
+        with self._lock:
+            entry = self._state[key]
+            entry["above"].add(index)
+            while entry["high_water"] in entry["above"]:
+                entry["above"].remove(entry["high_water"])
+                entry["high_water"] += 1
+            if not self.path:
+                return
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump({k: {**e, "above": sorted(e["above"])} for k, e in self._state.items()}, f)
+            os.replace(tmp, self.path)
+
+
+class Progress:
+    def __init__(self, label: str, total: int | None = None, interval_sec: float = 2.0):
+        self.label = label
+        self.total = total
+        self.rows = 0
+        self.skipped = 0
+        self._interval = interval_sec
+        self._started = time.time()
+        self._last = 0.0
+
+    def add(self, rows: int, skipped: bool = False) -> None:
+        if skipped:
+            self.skipped += rows
+        else:
+            self.rows += rows
+        now = time.time()
+        if now - self._last >= self._interval:
+            self._last = now
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        elapsed = max(time.time() - self._started, 1e-9)
+        done = self.rows + self.skipped
+        of_total = f"/{self.total:,}" if self.total else ""
+        skipped = f", {self.skipped:,} from checkpoint" if self.skipped else ""
+        prefix = "Loaded" if final else " "
+        print(
+            f"{prefix} {self.label}: {done:,}{of_total} rows{skipped}  "
+            f"{self.rows / elapsed:,.0f} rows/s  {elapsed:.1f}s",
+            flush=True,
+        )
+
+
+class PostgrestSink:
+    def __init__(self, table: str, on_conflict: str | None = None):
+        self.table = table
+        self.on_conflict = on_conflict
+        self.name = "postgrest"
+
+    def write(self, rows: list[dict]) -> None:
+        query = get_supabase().table(self.table)
+        if self.on_conflict:
+            query.upsert(rows, on_conflict=self.on_conflict).execute()
+        else:
+            query.insert(rows).execute()
+
+    def close(self) -> None:
+        pass
+
+
+class CopySink:
+    """COPY FROM STDIN over one psycopg connection per worker thread."""
+
+    def __init__(self, table: str, columns: tuple[str, ...], dsn: str):
+        import psycopg
+
+        self._psycopg = psycopg
+        self.table = table
+        self.columns = columns
+        self.name = "copy"
+        self._dsn = dsn
+        self._local = threading.local()
+        self._conns: list = []
+        self._lock = threading.Lock()
+        cols = ", ".join(f'"{c}"' for c in columns)
+        self._sql = f'COPY "{table}" ({cols}) FROM STDIN'
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            conn = self._psycopg.connect(self._dsn)
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def write(self, rows: list[dict]) -> None:
+        conn = self._conn()
+        try:
+            with conn.cursor() as cur, cur.copy(self._sql) as copy:
+                for row in rows:
+                    copy.write_row(tuple(row.get(c) for c in self.columns))
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+
+
+def append_sink(table: str, columns: tuple[str, ...], use_copy: bool = True):
+    """COPY when DATABASE_URL and psycopg are available, PostgREST inserts otherwise."""
+    if use_copy and DATABASE_URL:
+        try:
+            return CopySink(table, columns, DATABASE_URL)
+        except ImportError:
+            print("DATABASE_URL is set but psycopg is not installed; using PostgREST inserts")
+    return PostgrestSink(table)
+
+
+def bulk_load(
+    key: str,
+    rows: Iterable[dict],
+    sink,
+    chunk_size: int = SEED_CHUNK_SIZE,
+    concurrency: int = SEED_CONCURRENCY,
+    checkpoint: Checkpoint | None = None,
+    total: int | None = None,
+) -> int:
+    """Send rows in chunks with at most `concurrency` chunks in flight; returns rows sent."""
+    checkpoint = checkpoint or Checkpoint(None)
+    checkpoint.begin(key, chunk_size)
+    progress = Progress(f"{key} via {sink.name}", total)
+
+    def send(index: int, chunk: list[dict]) -> int:
+        for attempt in range(SEED_MAX_RETRIES + 1):
+            try:
+                sink.write(chunk)
+                break
+            except Exception as e:
+                if attempt == SEED_MAX_RETRIES:
+                    raise RuntimeError(f"{key}: chunk {index} failed after {attempt + 1} attempts: {e}") from e
+                time.sleep(0.5 * 2 ** attempt)
+        checkpoint.mark(key, index)
+        return len(chunk)
+
+    pending = set()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for index, chunk in enumerate(_chunks(rows, chunk_size)):
+                if checkpoint.is_done(key, index):
+                    progress.add(len(chunk), skipped=True)
+                    continue
+                # Bound memory: never read more than two chunks per worker ahead.
+                while len(pending) >= concurrency * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        progress.add(future.result())
+                pending.add(pool.submit(send, index, chunk))
+            for future in pending:
+                progress.add(future.result())
+            pending = set()
+    finally:
+        for future in pending:
+            future.cancel()
+        sink.close()
+    progress.report(final=True)
+    return progress.rows
+
+
+# ── Generated Load (scripts/generate_load.py) ──
+
+def _read_ndjson(path: Path) -> Iterator[dict]:
+    opener: Callable = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_columnar(path: Path) -> Iterator[dict]:
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        columns = pq.read_table(path).to_pydict()
+    else:
+        import numpy as np
+
+        with np.load(path) as data:
+            columns = {name: data[name].tolist() for name in data.files}
+    keys = list(columns)
+    for values in zip(*(columns[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def _transaction_rows(rows: Iterable[dict], batch_id: str) -> Iterator[dict]:
+    for tx in rows:
+        yield {
+            "user_id": tx["user_id"],
+            "batch_id": batch_id,
+            "timestamp": tx["timestamp"],
+            "transaction_amount_usd": tx["transaction_amount_usd"],
+            "transaction_currency": tx["transaction_currency"],
+            "transaction_type": tx["transaction_type"],
+            "transaction_country": tx["transaction_country"],
+            "transaction_city": tx["transaction_city"],
+            "is_preprocessed": False,
+        }
+
+
+def load_generated(
+    load_dir: Path,
+    chunk_size: int,
+    concurrency: int,
+    checkpoint: Checkpoint,
+    use_copy: bool,
+    batch_id: str,
+) -> None:
+    with open(load_dir / "manifest.json", "r") as f:
+        manifest = json.load(f)
+    print(
+        f"Loading {manifest['rows']:,} transactions for {manifest['users']:,} users "
+        f"({manifest['start_date']} .. {manifest['end_date']}) from {load_dir}"
+    )
+
+    bulk_load(
+        "profiles",
+        _read_ndjson(load_dir / "profiles.ndjson"),
+        PostgrestSink("profiles", on_conflict="user_id"),
+        chunk_size=chunk_size,
+        concurrency=concurrency,
+        checkpoint=checkpoint,
+        total=manifest["users"],
+    )
+
+    sink = append_sink("transactions", TRANSACTION_COLUMNS, use_copy)
+    remaining = manifest["rows"]
+    for name in manifest["files"]:
+        path = load_dir / name
+        reader = _read_ndjson(path) if ".ndjson" in path.suffixes else _read_columnar(path)
+        total = remaining if len(manifest["files"]) == 1 else None
+        bulk_load(
+            f"transactions:{name}",
+            _transaction_rows(reader, batch_id),
+            sink,
+            chunk_size=chunk_size,
+            concurrency=concurrency,
+            checkpoint=checkpoint,
+            total=total,
+        )
+
 
 def seed_profiles():
     sb = get_supabase()
@@ -57,8 +396,11 @@ def seed_risk_state():
     print(f"Seeded {len(rows)} risk states")
 
 
-def seed_historical_transactions():
-    sb = get_supabase()
+def seed_historical_transactions(
+    chunk_size: int = SEED_CHUNK_SIZE,
+    concurrency: int = SEED_CONCURRENCY,
+    use_copy: bool = True,
+):
     tx_path = DATA_DIR / "historical_transactions.json"
     try:
         with open(tx_path, "r") as f:
@@ -67,26 +409,18 @@ def seed_historical_transactions():
         print("No historical_transactions.json found, skipping")
         return
 
-    rows = []
-    for user_id, txs in all_tx.items():
-        for tx in txs:
-            rows.append({
-                "user_id": tx.get("user_id", user_id),
-                "timestamp": tx["timestamp"],
-                "transaction_amount_usd": tx["transaction_amount_usd"],
-                "transaction_currency": tx["transaction_currency"],
-                "transaction_type": tx["transaction_type"],
-                "transaction_country": tx["transaction_country"],
-                "transaction_city": tx["transaction_city"],
-                "batch_id": "historical",
-                "is_preprocessed": False,
-            })
-
-    batch_size = 100
-    for i in range(0, len(rows), batch_size):
-        batch = rows[i : i + batch_size]
-        sb.table("transactions").insert(batch).execute()
-    print(f"Seeded {len(rows)} historical transactions")
+    rows = _transaction_rows(
+        ({**tx, "user_id": tx.get("user_id", user_id)} for user_id, txs in all_tx.items() for tx in txs),
+        "historical",
+    )
+    sent = bulk_load(
+        "historical_transactions",
+        rows,
+        append_sink("transactions", TRANSACTION_COLUMNS, use_copy),
+        chunk_size=chunk_size,
+        concurrency=concurrency,
+    )
+    print(f"Seeded {sent} historical transactions")
 
 
 def seed_compliance_state():
@@ -171,11 +505,38 @@ def seed_new_regulations():
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Seed Supabase from data/ or bulk-load generated data.")
+    parser.add_argument("--load", metavar="DIR", help="bulk-load the output of scripts/generate_load.py")
+    parser.add_argument("--chunk-size", type=int, default=SEED_CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=SEED_CONCURRENCY)
+    parser.add_argument("--checkpoint", help="checkpoint file (default: DIR/seed_checkpoint.json)")
+    parser.add_argument("--fresh", action="store_true", help="ignore and overwrite an existing checkpoint")
+    parser.add_argument("--no-copy", action="store_true", help="use PostgREST even if DATABASE_URL is set")
+    parser.add_argument("--batch-id", default="load", help="batch_id for loaded transactions")
+    args = parser.parse_args()
+
+    if args.load:
+        load_dir = Path(args.load)
+        checkpoint_path = Path(args.checkpoint) if args.checkpoint else load_dir / "seed_checkpoint.json"
+        if args.fresh and checkpoint_path.exists():
+            checkpoint_path.unlink()
+        print("=== Bulk loading Supabase ===")
+        load_generated(
+            load_dir,
+            chunk_size=args.chunk_size,
+            concurrency=args.concurrency,
+            checkpoint=Checkpoint(checkpoint_path),
+            use_copy=not args.no_copy,
+            batch_id=args.batch_id,
+        )
+        print("=== Bulk load complete ===")
+        return
+
     print("=== Seeding Supabase ===")
     seed_profiles()
     seed_baselines()
     seed_risk_state()
-    seed_historical_transactions()
+    seed_historical_transactions(args.chunk_size, args.concurrency, not args.no_copy)
     seed_compliance_state()
     seed_new_regulations()
     print("=== Seeding complete ===")
@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+import random
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("LLM_API_KEY", "test")
+
+from models import Rulebook, UserProfile, UserBaseline
+from agents.anomaly_agent import run_fast_path_screen
+from agents.preprocessor_agent import run_preprocessor_agent
+from scripts.faker_generator import generate_transactions
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+
+class FastPathTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        with open(DATA_DIR / "users.json") as f:
+            self.profile = next(UserProfile(**u) for u in json.load(f) if u["user_id"] == "MT-USER-003")
+        with open(DATA_DIR / "baselines.json") as f:
+            self.baseline = next(UserBaseline(**b) for b in json.load(f) if b["user_id"] == "MT-USER-003")
+        with open(DATA_DIR / "compliance" / "malta.json") as f:
+            self.rulebook = Rulebook(**json.load(f)["rulebook"])
+        transactions = generate_transactions(self.profile.user_id, self.profile, num_transactions=5)
+        self.preprocessed, _ = run_preprocessor_agent(transactions, self.profile)
+
+    def test_clean_batch_skips_llm(self):
+        screened = run_fast_path_screen(self.preprocessed, self.baseline, self.profile, self.rulebook, "v1")
+        self.assertIsNotNone(screened)
+        self.assertEqual(screened[0].risk_band, "CLEAN")
+
+    def test_uncompilable_rule_escalates(self):
+        data = self.rulebook.model_dump()
+        data["risk_score"]["rules"].append(
+            {"category": "Behaviour", "rule": "Counterparty linked to adverse media", "points": 40}
+        )
+        screened = run_fast_path_screen(self.preprocessed, self.baseline, self.profile, Rulebook(**data), "v1")
+        self.assertIsNone(screened)
+
+
+if __name__ == "__main__":
+    unittest.main()
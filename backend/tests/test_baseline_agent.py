@@ -0,0 +1,77 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("LLM_API_KEY", "test")
+
+from agents.baseline_agent import _bootstrap_stats
+from utils import database as db
+
+ROW_CAP = 1000
+
+
+class _Query:
+    """Enough of the PostgREST builder for paged reads; like the server, caps results at ROW_CAP."""
+
+    def __init__(self, rows: list[dict]):
+        self._rows = rows
+        self._order: list[tuple[str, bool]] = []
+        self._range = (0, ROW_CAP - 1)
+
+    def select(self, _columns):
+        return self
+
+    def eq(self, column, value):
+        self._rows = [row for row in self._rows if row[column] == value]
+        return self
+
+    def order(self, column, desc=False):
+        self._order.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def execute(self):
+        rows = list(self._rows)
+        for column, desc in reversed(self._order):
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        start, end = self._range
+        return mock.Mock(data=rows[start:min(end + 1, start + ROW_CAP)])
+
+
+class _Supabase:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def table(self, _name):
+        return _Query(self._rows)
+
+
+class BootstrapHistoryTest(unittest.IsolatedAsyncioTestCase):
+    async def test_history_longer_than_row_cap_is_read_in_full(self):
+        start = datetime(2025, 1, 1, 9, tzinfo=timezone.utc)
+        rows = [
+            {
+                "id": i,
+                "user_id": "MT-USER-001",
+                "transaction_amount_usd": 100.0 if i < 2000 else 5000.0,
+                "timestamp": (start + timedelta(hours=6 * i)).isoformat(),
+            }
+            for i in range(2500)
+        ]
+        with mock.patch.object(db, "get_supabase", lambda: _Supabase(rows)):
+            stats = await _bootstrap_stats("MT-USER-001")
+
+        self.assertEqual(stats.amount_sketch.n, 2500)
+        self.assertEqual(stats.max_amount, 5000.0)
+        self.assertEqual(stats.day_key, rows[-1]["timestamp"][:10])
+
+
+if __name__ == "__main__":
+    unittest.main()
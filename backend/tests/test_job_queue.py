@@ -0,0 +1,66 @@
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("LLM_API_KEY", "test")
+
+from pydantic import BaseModel
+
+from utils.job_queue import JobQueue, SQLiteJobStore
+
+
+class _Done(BaseModel):
+    ok: bool = True
+
+
+class JobQueueCancelTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(SQLiteJobStore(str(Path(self._tmp.name) / "jobs.sqlite3")), workers=1)
+        self.release = asyncio.Event()
+        self.runs: list[str] = []
+
+        async def handler(payload: dict, on_event) -> _Done:
+            self.runs.append(payload["name"])
+            if payload.get("block"):
+                await self.release.wait()
+            return _Done()
+
+        self.queue.register("test", handler)
+
+    async def asyncTearDown(self):
+        await self.queue.shutdown()
+        self._tmp.cleanup()
+
+    async def _drain(self):
+        self.release.set()
+        await asyncio.wait_for(self.queue._queue.join(), timeout=5)
+
+    async def test_cancelled_queued_job_does_not_run(self):
+        await self.queue.submit("test", {"name": "blocker", "block": True})
+        job = await self.queue.submit("test", {"name": "victim"})
+        cancelled = await self.queue.cancel(job.id)
+        self.assertEqual(cancelled.status, "cancelled")
+
+        await self._drain()
+        self.assertEqual(self.runs, ["blocker"])
+        self.assertEqual((await self.queue.get(job.id)).status, "cancelled")
+
+    async def test_retry_of_queued_cancel_runs_once(self):
+        await self.queue.submit("test", {"name": "blocker", "block": True})
+        job = await self.queue.submit("test", {"name": "victim"})
+        await self.queue.cancel(job.id)
+        await self.queue.retry(job.id)
+        await self.queue.retry(job.id)
+
+        await self._drain()
+        self.assertEqual(self.runs, ["blocker", "victim"])
+        self.assertEqual((await self.queue.get(job.id)).status, "completed")
+
+
+if __name__ == "__main__":
+    unittest.main()
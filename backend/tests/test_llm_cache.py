@@ -0,0 +1,52 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("LLM_API_KEY", "test")
+
+from utils.llm_cache import SQLiteLLMCache
+
+
+class SQLiteLLMCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self._dir.name) / "cache.sqlite3")
+        self.cache = SQLiteLLMCache(path=self.path, ttl_sec=60, max_entries=2)
+
+    def tearDown(self):
+        self.cache._conn.close()
+        self._dir.cleanup()
+
+    def test_hit_does_not_commit(self):
+        self.cache.set("a", "1")
+        before = self.cache._conn.total_changes
+        self.assertEqual(self.cache.get("a"), "1")
+        self.assertEqual(self.cache._conn.total_changes, before)
+        self.assertFalse(self.cache._conn.in_transaction)
+
+    def test_recent_hit_survives_eviction(self):
+        self.cache.set("a", "1")
+        self.cache.set("b", "2")
+        self.assertEqual(self.cache.get("a"), "1")
+        self.cache.set("c", "3")
+        self.assertEqual(self.cache.get("a"), "1")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.size(), 2)
+
+    def test_expired_rows_are_pruned_on_write(self):
+        self.cache.set("a", "1")
+        self.cache._conn.execute("UPDATE llm_cache SET expires_at = 0")
+        self.cache._conn.commit()
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.set("b", "2")
+        with sqlite3.connect(self.path) as conn:
+            keys = [row[0] for row in conn.execute("SELECT key FROM llm_cache")]
+        self.assertEqual(keys, ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import asyncio
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("LLM_API_KEY", "test")
+
+from utils.llm_limits import TokenBucket, LLMAdmissionTimeout
+
+
+class TokenBucketTest(unittest.IsolatedAsyncioTestCase):
+    async def test_queued_waiter_times_out_at_its_own_deadline(self):
+        bucket = TokenBucket(per_minute=60)  # 1 token/s
+        bucket.tokens = 0.0
+        now = time.monotonic()
+        # The head of the queue sleeps ~1s for its token.
+        head = asyncio.create_task(bucket.acquire(1, now + 5))
+        await asyncio.sleep(0)
+
+        start = time.monotonic()
+        with self.assertRaises(LLMAdmissionTimeout):
+            await bucket.acquire(1, start + 0.1)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+        await head
+        self.assertFalse(bucket._lock.locked())
+
+    async def test_waiters_are_served_in_order(self):
+        bucket = TokenBucket(per_minute=600)  # 10 tokens/s
+        bucket.tokens = 0.0
+        deadline = time.monotonic() + 5
+        order: list[int] = []
+
+        async def take(i: int) -> None:
+            await bucket.acquire(1, deadline)
+            order.append(i)
+
+        await asyncio.gather(*(take(i) for i in range(3)))
+        self.assertEqual(order, [0, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("LLM_API_KEY", "test")
+
+from models import AgentLogEntry
+from utils import database as db
+from utils.trace_recorder import TraceWriter, TraceRecorder
+
+
+def _log(agent: str) -> AgentLogEntry:
+    return AgentLogEntry(agent=agent, icon="🧪", status="success", message="ok", duration_ms=1)
+
+
+class TraceWriterTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls: list[tuple[str, object]] = []
+        patches = {
+            "create_agent_traces": lambda traces: self.calls.append(("create", [t["id"] for t in traces])),
+            "save_agent_steps": lambda steps: self.calls.append(("steps", [s["trace_id"] for s in steps])),
+            "complete_agent_trace": lambda trace_id, result=None, failed=False: self.calls.append(
+                ("complete", (trace_id, failed))
+            ),
+        }
+        for name, fn in patches.items():
+            patcher = mock.patch.object(db, name, fn)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_steps_are_written_before_completion(self):
+        writer = TraceWriter(flushers=1)
+        trace = TraceRecorder("transaction_analysis", user_id="MT-USER-001", writer=writer)
+        await trace.start()
+        trace.record(_log("Profile Agent"))
+        await writer.flush()
+        self.assertEqual(self.calls, [("create", [trace.trace_id]), ("steps", [trace.trace_id])])
+
+        await trace.complete(failed=True)
+        await trace.complete()
+        await writer.shutdown()
+        self.assertEqual(self.calls[-1], ("complete", (trace.trace_id, True)))
+        self.assertEqual(sum(kind == "complete" for kind, _ in self.calls), 1)
+
+    async def test_queued_writes_are_batched_in_order(self):
+        writer = TraceWriter(flushers=2, batch_max=500)
+        traces = [TraceRecorder("transaction_analysis", writer=writer) for _ in range(40)]
+        for trace in traces:
+            await trace.start()
+            trace.record(_log("Profile Agent"))
+            trace.record(_log("Preprocessor Agent"))
+            await trace.complete()
+        await writer.shutdown()
+
+        step_calls = [ids for kind, ids in self.calls if kind == "steps"]
+        self.assertLessEqual(len(step_calls), 2)
+        self.assertEqual(sum(len(ids) for ids in step_calls), 80)
+        for trace in traces:
+            order = [kind for kind, ids in self.calls if trace.trace_id in (ids if isinstance(ids, list) else ids[:1])]
+            self.assertEqual(order, ["create", "steps", "complete"])
+
+    async def test_full_queue_drops_instead_of_blocking(self):
+        writer = TraceWriter(max_queue=2, flushers=1)
+        trace = TraceRecorder("transaction_analysis", writer=writer)
+        await trace.start()
+        with self.assertLogs("utils.trace_recorder", "WARNING"):
+            for i in range(5):
+                trace.record(_log(f"Agent {i}"))
+        self.assertEqual(writer.dropped, 4)
+        await writer.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Async data access layer.
+
+Mirrors utils.database function-for-function (same names, same arguments)
+but runs each call on a dedicated, bounded thread pool. Async handlers await
+these instead of calling the synchronous Supabase client on the event loop,
+and database work never competes with other users of the default executor.
+"""
+
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from utils import database
+
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "16"))
+
+R = TypeVar("R")
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="db")
+
+
+async def run_db(fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+    """Run a blocking database-bound callable on the database executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _async(name: str):
+    # Resolve the sync function at call time so patched implementations
+    # (e.g. an in-memory store) are picked up.
+    async def wrapper(*args, **kwargs):
+        return await run_db(getattr(database, name), *args, **kwargs)
+
+    wrapper.__name__ = name
+    wrapper.__qualname__ = name
+    wrapper.__doc__ = getattr(database, name).__doc__
+    return wrapper
+
+
+def shutdown_executor() -> None:
+    _executor.shutdown(wait=True)
+
+
+# ── Profiles ──
+get_all_profiles = _async("get_all_profiles")
+get_profile = _async("get_profile")
+get_profiles = _async("get_profiles")
+
+# ── Baselines ──
+get_all_baselines = _async("get_all_baselines")
+get_baseline = _async("get_baseline")
+get_jurisdiction_aggregates = _async("get_jurisdiction_aggregates")
+get_jurisdiction_baseline_rows = _async("get_jurisdiction_baseline_rows")
+get_jurisdiction_baselines = _async("get_jurisdiction_baselines")
+upsert_baseline = _async("upsert_baseline")
+
+# ── Risk State ──
+get_all_risk_states = _async("get_all_risk_states")
+get_risk_state = _async("get_risk_state")
+upsert_risk_state = _async("upsert_risk_state")
+
+# ── Transactions ──
+get_historical_transactions = _async("get_historical_transactions")
+get_jurisdiction_transactions = _async("get_jurisdiction_transactions")
+get_recent_transactions = _async("get_recent_transactions")
+get_transactions_page = _async("get_transactions_page")
+save_transactions = _async("save_transactions")
+save_preprocessed_transactions = _async("save_preprocessed_transactions")
+
+# ── Preprocess State ──
+get_preprocess_state = _async("get_preprocess_state")
+upsert_preprocess_state = _async("upsert_preprocess_state")
+
+# ── Compliance State ──
+get_compliance_state = _async("get_compliance_state")
+get_compliance_rulebook = _async("get_compliance_rulebook")
+update_compliance_version = _async("update_compliance_version")
+add_pushed_regulation = _async("add_pushed_regulation")
+
+# ── Rulebooks ──
+get_active_rulebook = _async("get_active_rulebook")
+save_rulebook = _async("save_rulebook")
+
+# ── New Regulations ──
+get_available_regulations = _async("get_available_regulations")
+get_regulation_by_id = _async("get_regulation_by_id")
+
+# ── Agent Traces ──
+create_agent_trace = _async("create_agent_trace")
+create_agent_traces = _async("create_agent_traces")
+complete_agent_trace = _async("complete_agent_trace")
+get_agent_trace = _async("get_agent_trace")
+get_agent_steps = _async("get_agent_steps")
+save_agent_step = _async("save_agent_step")
+save_agent_steps = _async("save_agent_steps")
+
+# ── Compliance Drafts (HITL) ──
+create_compliance_draft = _async("create_compliance_draft")
+get_pending_drafts = _async("get_pending_drafts")
+get_draft_by_id = _async("get_draft_by_id")
+approve_draft = _async("approve_draft")
+reject_draft = _async("reject_draft")
+
+# ── Latest Analysis ──
+get_latest_analysis = _async("get_latest_analysis")
+get_latest_analyses = _async("get_latest_analyses")
+
+# ── Analysis Jobs ──
+create_analysis_job = _async("create_analysis_job")
+update_analysis_job = _async("update_analysis_job")
+get_analysis_job = _async("get_analysis_job")
+list_analysis_jobs = _async("list_analysis_jobs")
+get_unfinished_analysis_jobs = _async("get_unfinished_analysis_jobs")
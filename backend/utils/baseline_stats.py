@@ -0,0 +1,252 @@
+"""
+Streaming per-user baseline statistics.
+
+Keeps sufficient statistics instead of raw history, so each transaction
+updates a user's baseline in O(1) amortised:
+  - count, mean and M2 of amounts (Welford), giving an exact std deviation,
+  - min / max amount,
+  - an hour-of-day histogram,
+  - EWMA of daily totals and daily counts over completed days,
+  - KLL quantile sketches of amounts and of completed-day totals.
+
+Once a sketch has enough samples, a transaction (or a completed day) whose
+modified z-score against the sketch's median/MAD exceeds ROBUST_Z_THRESHOLD
+is counted as an outlier: it still enters the sketch, but not the mean,
+std deviation, min/max or daily EWMAs.
+
+The state is stored as JSON in `baselines.stream_stats`.
+"""
+
+import os
+import math
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+
+from models.user import UserBaseline
+from utils.quantile_sketch import KLLSketch
+
+# Weight of the newest completed day in the daily EWMAs (0.3 keeps the old
+# 70% history / 30% new blend).
+BASELINE_EWMA_ALPHA = float(os.getenv("BASELINE_EWMA_ALPHA", "0.3"))
+# Share of activity trimmed from each end of the hour histogram when
+# deriving normal_hour_range.
+BASELINE_HOUR_TAIL = float(os.getenv("BASELINE_HOUR_TAIL", "0.05"))
+
+# Iglewicz & Hoaglin modified z-score cut-off: 0.6745 * |x - median| / MAD
+ROBUST_Z_THRESHOLD = float(os.getenv("BASELINE_ROBUST_Z", "3.5"))
+# Samples a sketch needs before it is trusted to flag outliers.
+ROBUST_MIN_TX = int(os.getenv("BASELINE_ROBUST_MIN_TX", "20"))
+ROBUST_MIN_DAYS = int(os.getenv("BASELINE_ROBUST_MIN_DAYS", "7"))
+# Outlier bounds are re-derived from the sketch every this many updates.
+_BOUNDS_REFRESH = 16
+
+# Bumped when the stored layout changes; older states are rebuilt from history.
+STATS_SCHEMA_VERSION = 2
+
+DEFAULT_BASELINE = {
+    "avg_tx_amount_usd": 100.0,
+    "avg_daily_total_usd": 300.0,
+    "avg_tx_per_day": 3,
+    "std_dev_amount": 30.0,
+    "normal_hour_range": [9, 18],
+}
+
+
+def _robust_bounds(sketch: KLLSketch) -> tuple[float, float] | None:
+    """Inclusive [low, high] range of non-outlier values, from median and MAD."""
+    summary = sketch.median_and_mad()
+    if summary is None:
+        return None
+    median, mad = summary
+    if mad > 0:
+        spread = ROBUST_Z_THRESHOLD * mad / 0.6745
+        return median - spread, median + spread
+    # Degenerate (mostly identical values): fall back to the p1-p99 range.
+    return sketch.quantile(0.01), sketch.quantile(0.99)
+
+
+def _sketch_summary(sketch: KLLSketch) -> dict | None:
+    summary = sketch.median_and_mad()
+    if summary is None:
+        return None
+    median, mad = summary
+    return {
+        "median": round(median, 2),
+        "mad": round(mad, 2),
+        "p95": round(sketch.quantile(0.95), 2),
+        "p99": round(sketch.quantile(0.99), 2),
+    }
+
+
+@dataclass
+class BaselineStats:
+    schema_version: int = STATS_SCHEMA_VERSION
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min_amount: float = 0.0
+    max_amount: float = 0.0
+    hour_counts: list[int] = field(default_factory=lambda: [0] * 24)
+    # Day currently being accumulated (not yet folded into the EWMAs)
+    day_key: str = ""
+    day_total: float = 0.0
+    day_count: int = 0
+    days_observed: int = 0
+    ewma_daily_total: float = 0.0
+    ewma_daily_count: float = 0.0
+    excluded_count: int = 0
+    excluded_days: int = 0
+    amount_sketch: KLLSketch = field(default_factory=KLLSketch)
+    daily_total_sketch: KLLSketch = field(default_factory=KLLSketch)
+
+    def __post_init__(self):
+        self._bounds: dict[str, tuple[int, tuple[float, float] | None]] = {}
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "BaselineStats":
+        if not data:
+            return cls()
+        known = {k: v for k, v in data.items() if k in cls.__dataclass_fields__}
+        known["schema_version"] = int(data.get("schema_version", 1))
+        known["amount_sketch"] = KLLSketch.from_dict(data.get("amount_sketch"))
+        known["daily_total_sketch"] = KLLSketch.from_dict(data.get("daily_total_sketch"))
+        return cls(**known)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        # Cent precision is plenty for the quantiles and keeps the JSON small.
+        data["amount_sketch"] = self.amount_sketch.to_dict(ndigits=2)
+        data["daily_total_sketch"] = self.daily_total_sketch.to_dict(ndigits=2)
+        return data
+
+    def summary(self) -> dict:
+        """Robust quantile summary (median, MAD, p95, p99) of amounts and daily totals."""
+        return {
+            "amount": _sketch_summary(self.amount_sketch),
+            "daily_total": _sketch_summary(self.daily_total_sketch),
+        }
+
+    def _is_outlier(self, name: str, sketch: KLLSketch, value: float, min_samples: int) -> bool:
+        if sketch.n < min_samples:
+            return False
+        refresh = sketch.n // _BOUNDS_REFRESH
+        cached = self._bounds.get(name)
+        if cached is None or cached[0] != refresh:
+            cached = (refresh, _robust_bounds(sketch))
+            self._bounds[name] = cached
+        bounds = cached[1]
+        return bounds is not None and not (bounds[0] <= value <= bounds[1])
+
+    def observe(self, amount: float, timestamp: str) -> None:
+        """Fold one transaction into the statistics."""
+        outlier = self._is_outlier("amount", self.amount_sketch, amount, ROBUST_MIN_TX)
+        self.amount_sketch.update(amount)
+
+        if outlier:
+            self.excluded_count += 1
+        else:
+            self.count += 1
+            delta = amount - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (amount - self.mean)
+            if self.count == 1:
+                self.min_amount = self.max_amount = amount
+            else:
+                self.min_amount = min(self.min_amount, amount)
+                self.max_amount = max(self.max_amount, amount)
+
+        try:
+            ts = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except Exception:
+            return
+        self.hour_counts[ts.hour] += 1
+
+        day_key = ts.strftime("%Y-%m-%d")
+        if day_key == self.day_key:
+            self.day_total += amount
+            self.day_count += 1
+        elif day_key > self.day_key:
+            self._close_day()
+            self.day_key = day_key
+            self.day_total = amount
+            self.day_count = 1
+        # Transactions for days already folded into the EWMAs only count
+        # towards the amount and hour statistics.
+
+    def _close_day(self) -> None:
+        if not self.day_key:
+            return
+        outlier = self._is_outlier("daily_total", self.daily_total_sketch, self.day_total, ROBUST_MIN_DAYS)
+        self.daily_total_sketch.update(self.day_total)
+        if outlier:
+            self.excluded_days += 1
+            return
+        if self.days_observed == 0:
+            self.ewma_daily_total = self.day_total
+            self.ewma_daily_count = float(self.day_count)
+        else:
+            alpha = BASELINE_EWMA_ALPHA
+            self.ewma_daily_total = alpha * self.day_total + (1 - alpha) * self.ewma_daily_total
+            self.ewma_daily_count = alpha * self.day_count + (1 - alpha) * self.ewma_daily_count
+        self.days_observed += 1
+
+    @property
+    def std_dev(self) -> float | None:
+        if self.count < 2:
+            return None
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def daily_total(self) -> float | None:
+        # Completed days only; a partial current day would understate it.
+        if self.days_observed:
+            return self.ewma_daily_total
+        return self.day_total if self.day_count else None
+
+    def daily_count(self) -> float | None:
+        if self.days_observed:
+            return self.ewma_daily_count
+        return float(self.day_count) if self.day_count else None
+
+    def hour_range(self) -> list[int] | None:
+        total = sum(self.hour_counts)
+        if not total:
+            return None
+        low_cut = total * BASELINE_HOUR_TAIL
+        high_cut = total * (1 - BASELINE_HOUR_TAIL)
+        running = 0
+        low = high = None
+        for hour, n in enumerate(self.hour_counts):
+            running += n
+            if low is None and running > low_cut:
+                low = hour
+            if high is None and running >= high_cut:
+                high = hour
+                break
+        return [low, high if high is not None else 23]
+
+
+def derive_baseline(
+    user_id: str,
+    stats: BaselineStats,
+    existing: UserBaseline | None = None,
+) -> UserBaseline:
+    """Baseline fields from the statistics; gaps fall back to `existing`, then defaults."""
+    fallback = existing.model_dump() if existing else DEFAULT_BASELINE
+
+    avg_amount = stats.mean if stats.count else fallback["avg_tx_amount_usd"]
+    std_dev = stats.std_dev
+    daily_total = stats.daily_total()
+    daily_count = stats.daily_count()
+
+    return UserBaseline(
+        user_id=user_id,
+        avg_tx_amount_usd=round(avg_amount, 2),
+        avg_daily_total_usd=round(daily_total if daily_total is not None else fallback["avg_daily_total_usd"], 2),
+        avg_tx_per_day=int(round(daily_count)) if daily_count is not None else fallback["avg_tx_per_day"],
+        std_dev_amount=round(std_dev if std_dev is not None else fallback["std_dev_amount"], 2),
+        normal_hour_range=stats.hour_range() or fallback["normal_hour_range"],
+        excluded_anomalies_count=stats.excluded_count,
+        min_tx_amount_usd=round(stats.min_amount, 2),
+        max_tx_amount_usd=round(stats.max_amount, 2),
+        stream_stats={**stats.to_dict(), "summary": stats.summary()},
+    )
@@ -1,10 +1,16 @@
+import os
+import copy
 import json
+import time
 import uuid
 import logging
+import threading
 from datetime import datetime, timezone
 
+from pydantic import ValidationError
+
 from models.user import UserProfile, UserBaseline
-from models.transaction import RawTransaction, PreprocessedTransaction
+from models.transaction import RawTransaction, PreprocessedTransaction, PreprocessState
 from models.compliance import Regulation, Rulebook
 from utils.supabase_client import get_supabase
 
@@ -12,6 +18,27 @@ logger = logging.getLogger(__name__)
 
 VALID_JURISDICTIONS = {"MT", "AE", "KY"}
 
+# Compliance state + active rulebook are cached per jurisdiction. Local writes
+# invalidate immediately; the TTL bounds staleness for writes made by other
+# worker processes.
+COMPLIANCE_CACHE_TTL_SEC = float(os.getenv("COMPLIANCE_CACHE_TTL_SEC", "60"))
+# Rows per PostgREST insert; large batches are split to stay under request limits.
+DB_INSERT_CHUNK_SIZE = int(os.getenv("DB_INSERT_CHUNK_SIZE", "500"))
+# Rows per page for reads that can exceed PostgREST's max-rows limit.
+DB_PAGE_SIZE = int(os.getenv("DB_PAGE_SIZE", "1000"))
+
+
+def _fetch_all(build_query, page_size: int = DB_PAGE_SIZE) -> list[dict]:
+    """Page through a query with .range(); build_query must return a fresh, ordered query."""
+    rows: list[dict] = []
+    start = 0
+    while True:
+        page = build_query().range(start, start + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
 
 # ── Profiles ──
 
@@ -27,6 +54,23 @@ def get_profile(user_id: str) -> dict | None:
     return res.data[0] if res.data else None
 
 
+def get_profiles(user_ids: list[str] | None = None, country: str | None = None) -> list[dict]:
+    """Profiles filtered by user id list and/or country (jurisdiction code), in one query."""
+    if user_ids is not None and not user_ids:
+        return []
+    sb = get_supabase()
+
+    def build_query():
+        query = sb.table("profiles").select("*")
+        if user_ids is not None:
+            query = query.in_("user_id", user_ids)
+        if country:
+            query = query.eq("country", country.upper())
+        return query.order("user_id")
+
+    return _fetch_all(build_query)
+
+
 # ── Baselines ──
 
 def get_all_baselines() -> list[dict]:
@@ -35,6 +79,64 @@ def get_all_baselines() -> list[dict]:
     return res.data
 
 
+def get_jurisdiction_aggregates(
+    jurisdiction_code: str,
+    edges: list[float],
+    percentiles: list[float],
+    thresholds: list[float],
+) -> dict:
+    """Population summary computed in Postgres by jurisdiction_baseline_aggregates()."""
+    sb = get_supabase()
+    res = sb.rpc(
+        "jurisdiction_baseline_aggregates",
+        {
+            "p_country": jurisdiction_code.upper(),
+            "p_edges": edges,
+            "p_percentiles": percentiles,
+            "p_thresholds": thresholds,
+        },
+    ).execute()
+    return res.data
+
+
+def get_jurisdiction_baseline_rows(jurisdiction_code: str, page_size: int = DB_PAGE_SIZE) -> list[dict]:
+    """Income level and baseline amounts of every user in a jurisdiction, filtered server-side."""
+    sb = get_supabase()
+    page = _fetch_all(
+        lambda: (
+            sb.table("profiles")
+            .select("user_id,income_level,baselines(avg_tx_amount_usd,avg_daily_total_usd,max_tx_amount_usd)")
+            .eq("country", jurisdiction_code.upper())
+            .order("user_id")
+        ),
+        page_size,
+    )
+    rows = []
+    for row in page:
+        baseline = row.pop("baselines", None) or {}
+        if isinstance(baseline, list):
+            baseline = baseline[0] if baseline else {}
+        rows.append({**row, **baseline})
+    return rows
+
+
+def get_jurisdiction_baselines(jurisdiction_code: str) -> list[dict]:
+    """Baselines of every user in a jurisdiction (joined to profiles server-side)."""
+    sb = get_supabase()
+    rows = _fetch_all(
+        lambda: (
+            sb.table("baselines")
+            .select("*,profiles!inner(country)")
+            .eq("profiles.country", jurisdiction_code.upper())
+            .order("user_id")
+        )
+    )
+    for row in rows:
+        row.pop("profiles", None)
+        row.pop("updated_at", None)
+    return rows
+
+
 def get_baseline(user_id: str) -> dict | None:
     sb = get_supabase()
     res = sb.table("baselines").select("*").eq("user_id", user_id).execute()
@@ -78,44 +180,155 @@ def upsert_risk_state(user_id: str, risk_score: int, risk_band: str, risk_profil
 
 # ── Transactions ──
 
-def get_historical_transactions(user_id: str | None = None) -> dict | list:
+def get_historical_transactions(user_id: str | None = None, page_size: int = DB_PAGE_SIZE) -> dict | list:
+    """Full stored history, oldest first; paged so it is not cut off at the row cap."""
     sb = get_supabase()
-    query = sb.table("transactions").select("*").order("timestamp", desc=False)
-    if user_id:
-        query = query.eq("user_id", user_id)
-    res = query.execute()
+
+    def build_query():
+        query = sb.table("transactions").select("*")
+        if user_id:
+            query = query.eq("user_id", user_id)
+        return query.order("timestamp", desc=False).order("id", desc=False)
+
+    rows = _fetch_all(build_query, page_size)
     if user_id:
-        return res.data
+        return rows
     grouped: dict[str, list] = {}
-    for row in res.data:
+    for row in rows:
         uid = row["user_id"]
         grouped.setdefault(uid, []).append(row)
     return grouped
 
 
-def save_transactions(transactions: list[dict], batch_id: str | None = None) -> None:
+def get_jurisdiction_transactions(jurisdiction_code: str, since: str | None = None) -> list[dict]:
+    """
+    Raw transaction fields for every user in a jurisdiction, ordered by user
+    then time. Seeded and ingested (is_preprocessed) rows both carry them.
+    """
     sb = get_supabase()
+
+    def build_query():
+        query = (
+            sb.table("transactions")
+            .select(
+                "id,user_id,timestamp,transaction_amount_usd,transaction_currency,"
+                "transaction_type,transaction_country,transaction_city,profiles!inner(country)"
+            )
+            .eq("profiles.country", jurisdiction_code.upper())
+        )
+        if since:
+            query = query.gte("timestamp", since)
+        return query.order("user_id").order("timestamp").order("id")
+
+    rows = _fetch_all(build_query)
+    for row in rows:
+        row.pop("profiles", None)
+    return rows
+
+
+def get_recent_transactions(since: str, per_user_limit: int) -> dict[str, list]:
+    sb = get_supabase()
+    # The RPC returns a set, so PostgREST's max-rows cap applies to it too.
+    rows = _fetch_all(
+        lambda: (
+            sb.rpc("recent_transactions", {"p_since": since, "p_per_user_limit": per_user_limit})
+            .order("user_id")
+            .order("timestamp")
+            .order("id")
+        )
+    )
+    grouped: dict[str, list] = {}
+    for row in rows:
+        grouped.setdefault(row["user_id"], []).append(row)
+    return grouped
+
+
+def get_transactions_page(
+    user_id: str,
+    limit: int,
+    before_timestamp: str | None = None,
+    before_id: int | None = None,
+) -> list[dict]:
+    sb = get_supabase()
+    query = sb.table("transactions").select("*").eq("user_id", user_id)
+    if before_timestamp is not None:
+        if before_id is not None:
+            query = query.or_(
+                f'timestamp.lt."{before_timestamp}",'
+                f'and(timestamp.eq."{before_timestamp}",id.lt.{before_id})'
+            )
+        else:
+            query = query.lt("timestamp", before_timestamp)
+    res = (
+        query.order("timestamp", desc=True)
+        .order("id", desc=True)
+        .limit(limit)
+        .execute()
+    )
+    return res.data
+
+
+def _insert_chunked(table: str, rows: list[dict]) -> None:
+    sb = get_supabase()
+    for i in range(0, len(rows), DB_INSERT_CHUNK_SIZE):
+        sb.table(table).insert(rows[i : i + DB_INSERT_CHUNK_SIZE]).execute()
+
+
+def save_transactions(transactions: list[dict], batch_id: str | None = None) -> None:
     for tx in transactions:
         tx["batch_id"] = batch_id
-    sb.table("transactions").insert(transactions).execute()
+    _insert_chunked("transactions", transactions)
 
 
 def save_preprocessed_transactions(
     preprocessed: list[PreprocessedTransaction], batch_id: str
 ) -> None:
-    sb = get_supabase()
     rows = []
     for ptx in preprocessed:
         row = ptx.model_dump()
         row["batch_id"] = batch_id
         row["is_preprocessed"] = True
         rows.append(row)
-    sb.table("transactions").insert(rows).execute()
+    _insert_chunked("transactions", rows)
+
+
+# ── Preprocess State ──
+
+def get_preprocess_state(user_id: str) -> PreprocessState | None:
+    sb = get_supabase()
+    res = sb.table("preprocess_state").select("*").eq("user_id", user_id).execute()
+    if not res.data:
+        return None
+    row = res.data[0]
+    row.pop("updated_at", None)
+    row["day_key"] = row.get("day_key") or ""
+    return PreprocessState(**row)
+
+
+def upsert_preprocess_state(state: PreprocessState) -> None:
+    sb = get_supabase()
+    row = state.model_dump()
+    row["day_key"] = row["day_key"] or None
+    row["updated_at"] = datetime.now(timezone.utc).isoformat()
+    sb.table("preprocess_state").upsert(row, on_conflict="user_id").execute()
 
 
 # ── Compliance State ──
 
-def get_compliance_state(jurisdiction_code: str) -> dict | None:
+_compliance_cache: dict[str, tuple[float, dict, Rulebook | None]] = {}
+_compliance_cache_generation: dict[str, int] = {}
+_compliance_cache_lock = threading.Lock()
+
+
+def invalidate_compliance_cache(jurisdiction_code: str | None = None) -> None:
+    with _compliance_cache_lock:
+        codes = [jurisdiction_code.upper()] if jurisdiction_code else list(_compliance_cache)
+        for code in codes:
+            _compliance_cache.pop(code, None)
+            _compliance_cache_generation[code] = _compliance_cache_generation.get(code, 0) + 1
+
+
+def _load_compliance_state(jurisdiction_code: str) -> dict | None:
     sb = get_supabase()
     res = (
         sb.table("compliance_state")
@@ -140,6 +353,50 @@ def get_compliance_state(jurisdiction_code: str) -> dict | None:
     return state
 
 
+def _get_cached_compliance(jurisdiction_code: str) -> tuple[dict, Rulebook | None] | None:
+    code = jurisdiction_code.upper()
+    with _compliance_cache_lock:
+        entry = _compliance_cache.get(code)
+        generation = _compliance_cache_generation.get(code, 0)
+    if entry and time.monotonic() - entry[0] < COMPLIANCE_CACHE_TTL_SEC:
+        return entry[1], entry[2]
+
+    state = _load_compliance_state(code)
+    if state is None:
+        return None
+    try:
+        rulebook = Rulebook(**state["rulebook"])
+    except (ValidationError, TypeError) as e:
+        logger.warning(f"Active rulebook for {code} failed to parse: {e}")
+        rulebook = None
+
+    with _compliance_cache_lock:
+        # Skip the store if a write invalidated this jurisdiction mid-load.
+        if _compliance_cache_generation.get(code, 0) == generation:
+            _compliance_cache[code] = (time.monotonic(), state, rulebook)
+    return state, rulebook
+
+
+def get_compliance_state(jurisdiction_code: str) -> dict | None:
+    cached = _get_cached_compliance(jurisdiction_code)
+    if cached is None:
+        return None
+    return copy.deepcopy(cached[0])
+
+
+def get_compliance_rulebook(jurisdiction_code: str) -> tuple[Rulebook, str] | None:
+    """
+    Return the parsed active rulebook and current version for a jurisdiction.
+
+    The Rulebook instance is shared with the cache — copy it before mutating.
+    """
+    cached = _get_cached_compliance(jurisdiction_code)
+    if cached is None or cached[1] is None:
+        return None
+    state, rulebook = cached
+    return rulebook, state["current_version"]
+
+
 def update_compliance_version(jurisdiction_code: str, new_version: str) -> None:
     sb = get_supabase()
     sb.table("compliance_state").update(
@@ -148,6 +405,7 @@ def update_compliance_version(jurisdiction_code: str, new_version: str) -> None:
             "updated_at": datetime.now(timezone.utc).isoformat(),
         }
     ).eq("jurisdiction_code", jurisdiction_code).execute()
+    invalidate_compliance_cache(jurisdiction_code)
 
 
 def add_pushed_regulation(jurisdiction_code: str, regulation_data: dict) -> None:
@@ -169,6 +427,7 @@ def add_pushed_regulation(jurisdiction_code: str, regulation_data: dict) -> None
     sb.table("new_regulations").update(
         {"is_pushed": True}
     ).eq("regulation_update_id", regulation_data["regulation_update_id"]).execute()
+    invalidate_compliance_cache(jurisdiction_code)
 
 
 # ── Rulebooks ──
@@ -201,6 +460,7 @@ def save_rulebook(jurisdiction_code: str, version: str, rulebook: dict, activate
             "is_active": activate,
         }
     ).execute()
+    invalidate_compliance_cache(jurisdiction_code)
 
 
 # ── New Regulations ──
@@ -234,9 +494,10 @@ def create_agent_trace(
     trace_type: str,
     user_id: str | None = None,
     jurisdiction_code: str | None = None,
+    trace_id: str | None = None,
 ) -> str:
     sb = get_supabase()
-    trace_id = str(uuid.uuid4())
+    trace_id = trace_id or str(uuid.uuid4())
     sb.table("agent_traces").insert(
         {
             "id": trace_id,
@@ -249,6 +510,14 @@ def create_agent_trace(
     return trace_id
 
 
+def create_agent_traces(traces: list[dict]) -> None:
+    """Insert several trace rows ({id, trace_type, user_id, jurisdiction_code}) as running."""
+    if not traces:
+        return
+    sb = get_supabase()
+    sb.table("agent_traces").insert([{**trace, "status": "running"} for trace in traces]).execute()
+
+
 def complete_agent_trace(trace_id: str, result: dict | None = None, failed: bool = False) -> None:
     sb = get_supabase()
     sb.table("agent_traces").update(
@@ -260,6 +529,24 @@ def complete_agent_trace(trace_id: str, result: dict | None = None, failed: bool
     ).eq("id", trace_id).execute()
 
 
+def get_agent_trace(trace_id: str) -> dict | None:
+    sb = get_supabase()
+    res = sb.table("agent_traces").select("*").eq("id", trace_id).execute()
+    return res.data[0] if res.data else None
+
+
+def get_agent_steps(trace_id: str) -> list[dict]:
+    sb = get_supabase()
+    res = (
+        sb.table("agent_steps")
+        .select("*")
+        .eq("trace_id", trace_id)
+        .order("step_order")
+        .execute()
+    )
+    return res.data
+
+
 def save_agent_step(
     trace_id: str,
     step_order: int,
@@ -289,6 +576,13 @@ def save_agent_step(
     ).execute()
 
 
+def save_agent_steps(steps: list[dict]) -> None:
+    if not steps:
+        return
+    sb = get_supabase()
+    sb.table("agent_steps").insert(steps).execute()
+
+
 # ── Compliance Drafts (HITL) ──
 
 def create_compliance_draft(
@@ -373,6 +667,7 @@ def approve_draft(draft_id: str, edited_rulebook: dict | None = None) -> dict |
             "reviewed_at": datetime.now(timezone.utc).isoformat(),
         }
     ).eq("id", draft_id).execute()
+    invalidate_compliance_cache(jc)
 
     return get_draft_by_id(draft_id)
 
@@ -411,3 +706,55 @@ def get_latest_analysis(user_id: str) -> dict | None:
             return json.loads(result)
         return result
     return None
+
+
+def get_latest_analyses() -> dict[str, dict]:
+    sb = get_supabase()
+    rows = _fetch_all(lambda: sb.table("latest_analyses").select("user_id,result").order("user_id"))
+    latest: dict[str, dict] = {}
+    for row in rows:
+        result = row.get("result")
+        if not result:
+            continue
+        latest[row["user_id"]] = json.loads(result) if isinstance(result, str) else result
+    return latest
+
+
+# ── Analysis Jobs ──
+
+def create_analysis_job(job: dict) -> None:
+    sb = get_supabase()
+    sb.table("analysis_jobs").insert(job).execute()
+
+
+def update_analysis_job(job_id: str, fields: dict) -> None:
+    sb = get_supabase()
+    sb.table("analysis_jobs").update(fields).eq("id", job_id).execute()
+
+
+def get_analysis_job(job_id: str) -> dict | None:
+    sb = get_supabase()
+    res = sb.table("analysis_jobs").select("*").eq("id", job_id).execute()
+    return res.data[0] if res.data else None
+
+
+def list_analysis_jobs(status: str | None = None, limit: int = 50) -> list[dict]:
+    sb = get_supabase()
+    query = sb.table("analysis_jobs").select("*")
+    if status:
+        query = query.eq("status", status)
+    res = query.order("created_at", desc=True).limit(limit).execute()
+    return res.data
+
+
+def get_unfinished_analysis_jobs() -> list[dict]:
+    """Queued or running jobs, oldest first (re-enqueued on startup)."""
+    sb = get_supabase()
+    res = (
+        sb.table("analysis_jobs")
+        .select("*")
+        .in_("status", ["queued", "running"])
+        .order("created_at")
+        .execute()
+    )
+    return res.data
@@ -1,8 +1,11 @@
 """Geo utility functions for distance/speed calculations."""
 
 import math
+from functools import cache
 from typing import Optional
 
+import numpy as np
+
 # Approximate coordinates for countries (capital cities)
 COUNTRY_COORDS: dict[str, tuple[float, float]] = {
     # Europe
@@ -38,6 +41,140 @@ COUNTRY_COORDS: dict[str, tuple[float, float]] = {
     "ZA": (-33.9249, 18.4241),   # South Africa - Cape Town
 }
 
+# City coordinates for the cities the transaction generator emits
+# (scripts/faker_generator.py COUNTRY_CITIES).
+CITY_COORDS: dict[str, dict[str, tuple[float, float]]] = {
+    "MT": {
+        "Valletta": (35.8989, 14.5146),
+        "Sliema": (35.9122, 14.5042),
+        "St. Julian's": (35.9185, 14.4883),
+        "Mdina": (35.8867, 14.4031),
+    },
+    "IT": {
+        "Rome": (41.9028, 12.4964),
+        "Milan": (45.4642, 9.1900),
+        "Florence": (43.7696, 11.2558),
+        "Naples": (40.8518, 14.2681),
+    },
+    "DE": {
+        "Berlin": (52.5200, 13.4050),
+        "Munich": (48.1351, 11.5820),
+        "Frankfurt": (50.1109, 8.6821),
+        "Hamburg": (53.5511, 9.9937),
+    },
+    "GB": {
+        "London": (51.5074, -0.1278),
+        "Manchester": (53.4808, -2.2426),
+        "Edinburgh": (55.9533, -3.1883),
+        "Birmingham": (52.4862, -1.8904),
+    },
+    "FR": {
+        "Paris": (48.8566, 2.3522),
+        "Lyon": (45.7640, 4.8357),
+        "Marseille": (43.2965, 5.3698),
+    },
+    "ES": {
+        "Madrid": (40.4168, -3.7038),
+        "Barcelona": (41.3874, 2.1686),
+        "Seville": (37.3891, -5.9845),
+    },
+    "AE": {
+        "Dubai": (25.2048, 55.2708),
+        "Abu Dhabi": (24.4539, 54.3773),
+        "Sharjah": (25.3463, 55.4209),
+        "Ajman": (25.4052, 55.5136),
+    },
+    "SA": {
+        "Riyadh": (24.7136, 46.6753),
+        "Jeddah": (21.4858, 39.1925),
+        "Dammam": (26.4207, 50.0888),
+        "Mecca": (21.3891, 39.8579),
+    },
+    "BH": {
+        "Manama": (26.2285, 50.5860),
+        "Riffa": (26.1300, 50.5550),
+        "Muharraq": (26.2572, 50.6119),
+    },
+    "QA": {
+        "Doha": (25.2854, 51.5310),
+    },
+    "PK": {
+        "Islamabad": (33.6844, 73.0479),
+        "Karachi": (24.8607, 67.0011),
+        "Lahore": (31.5204, 74.3587),
+    },
+    "KY": {
+        "George Town": (19.2869, -81.3674),
+        "West Bay": (19.3667, -81.4167),
+        "Bodden Town": (19.2833, -81.2500),
+    },
+    "US": {
+        "New York": (40.7128, -74.0060),
+        "Miami": (25.7617, -80.1918),
+        "Los Angeles": (34.0522, -118.2437),
+        "Chicago": (41.8781, -87.6298),
+    },
+    "JM": {
+        "Kingston": (18.0179, -76.8099),
+        "Montego Bay": (18.4762, -77.8939),
+    },
+    "CN": {
+        "Beijing": (39.9042, 116.4074),
+        "Shanghai": (31.2304, 121.4737),
+        "Shenzhen": (22.5431, 114.0579),
+    },
+    "JP": {
+        "Tokyo": (35.6762, 139.6503),
+        "Osaka": (34.6937, 135.5023),
+        "Kyoto": (35.0116, 135.7681),
+    },
+    "IN": {
+        "New Delhi": (28.6139, 77.2090),
+        "Mumbai": (19.0760, 72.8777),
+        "Bangalore": (12.9716, 77.5946),
+    },
+    "SG": {
+        "Singapore": (1.3521, 103.8198),
+    },
+    "KP": {
+        "Pyongyang": (39.0392, 125.7625),
+        "Hamhung": (39.9183, 127.5364),
+        "Chongjin": (41.7956, 129.7758),
+    },
+    "IR": {
+        "Tehran": (35.6892, 51.3890),
+        "Isfahan": (32.6546, 51.6680),
+        "Mashhad": (36.2605, 59.6168),
+    },
+    "SY": {
+        "Damascus": (33.5138, 36.2765),
+        "Aleppo": (36.2021, 37.1343),
+        "Homs": (34.7324, 36.7137),
+    },
+    "CU": {
+        "Havana": (23.1136, -82.3666),
+        "Santiago de Cuba": (20.0247, -75.8219),
+        "Camagüey": (21.3808, -77.9170),
+    },
+    "RU": {
+        "Moscow": (55.7558, 37.6173),
+        "Saint Petersburg": (59.9311, 30.3609),
+        "Novosibirsk": (55.0084, 82.9357),
+    },
+    "NG": {
+        "Abuja": (9.0579, 7.4951),
+        "Lagos": (6.5244, 3.3792),
+        "Kano": (12.0022, 8.5920),
+    },
+    "ZA": {
+        "Cape Town": (-33.9249, 18.4241),
+        "Johannesburg": (-26.2041, 28.0473),
+        "Pretoria": (-25.7479, 28.2293),
+    },
+}
+
+EARTH_RADIUS_KM = 6371.0
+
 # Maximum commercial aircraft speed (km/h)
 MAX_TRAVEL_SPEED_KMH = 800.0
 
@@ -51,7 +188,7 @@ def calculate_distance_km(
     lat1: float, lon1: float, lat2: float, lon2: float
 ) -> float:
     """Calculate distance between two points using Haversine formula."""
-    R = 6371.0  # Earth radius in km
+    R = EARTH_RADIUS_KM
 
     lat1_rad = math.radians(lat1)
     lat2_rad = math.radians(lat2)
@@ -74,15 +211,93 @@ def calculate_min_travel_hours(distance_km: float) -> float:
     return round(distance_km / MAX_TRAVEL_SPEED_KMH, 2)
 
 
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorised Haversine distance (km, unrounded) for broadcastable coordinate arrays."""
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lon2) - np.asarray(lon1))
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS_KM * c
+
+
+@cache
+def _location_table() -> tuple[dict[str, int], dict[tuple[str, str], int], np.ndarray]:
+    """
+    Dense distance matrix (rounded to 0.1 km) over every known location:
+    each country's capital followed by every city in CITY_COORDS.
+    Built once, on first use.
+    """
+    country_index: dict[str, int] = {}
+    city_index: dict[tuple[str, str], int] = {}
+    coords: list[tuple[float, float]] = []
+
+    for code, latlon in COUNTRY_COORDS.items():
+        country_index[code] = len(coords)
+        coords.append(latlon)
+    for code, cities in CITY_COORDS.items():
+        for city, latlon in cities.items():
+            city_index[(code, city.casefold())] = len(coords)
+            coords.append(latlon)
+
+    points = np.array(coords, dtype=np.float64)
+    lat, lon = points[:, 0], points[:, 1]
+    matrix = np.round(haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :]), 1)
+    np.fill_diagonal(matrix, 0.0)
+    matrix.setflags(write=False)
+
+    return country_index, city_index, matrix
+
+
+def distance_matrix() -> np.ndarray:
+    """Read-only location distance matrix; index with location_index()."""
+    return _location_table()[2]
+
+
+def location_index(country_code: str, city: str | None = None) -> tuple[int, bool]:
+    """
+    Row of `distance_matrix()` for a location, and whether it resolved to the
+    city itself. Unknown cities fall back to the country's capital; unknown
+    countries return -1.
+    """
+    country_index, city_index, _ = _location_table()
+    country_code = country_code.upper()
+    if city:
+        idx = city_index.get((country_code, city.casefold()))
+        if idx is not None:
+            return idx, True
+    return country_index.get(country_code, -1), False
+
+
 def get_distance_between_countries(country1: str, country2: str) -> float:
     """Calculate distance between two countries using their capital coordinates."""
     if country1 == country2:
         return 0.0
 
-    coords1 = get_country_coords(country1)
-    coords2 = get_country_coords(country2)
+    idx1, _ = location_index(country1)
+    idx2, _ = location_index(country2)
+    if idx1 < 0 or idx2 < 0:
+        return 0.0
+
+    return float(distance_matrix()[idx1, idx2])
+
 
-    if not coords1 or not coords2:
+def get_distance_between_locations(
+    country1: str, city1: str | None, country2: str, city2: str | None
+) -> float:
+    """
+    Distance between two transaction locations, at city precision where the
+    city is known. Within one country the distance is only reported when both
+    cities are known; otherwise it is 0, as for any same-country move.
+    """
+    idx1, known1 = location_index(country1, city1)
+    idx2, known2 = location_index(country2, city2)
+    if idx1 < 0 or idx2 < 0:
+        return 0.0
+    if country1.upper() == country2.upper() and not (known1 and known2):
         return 0.0
 
-    return calculate_distance_km(coords1[0], coords1[1], coords2[0], coords2[1])
+    return float(distance_matrix()[idx1, idx2])
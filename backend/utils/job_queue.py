@@ -0,0 +1,415 @@
+"""
+In-process background job queue for agent workflows.
+
+Submitting a workflow persists a job row and returns immediately; a pool of
+asyncio workers pulls jobs in priority order (lower first, FIFO within a
+priority) and runs the registered handler. Jobs are stored in Supabase
+(`analysis_jobs`) or, when Supabase is not configured, in a local SQLite file,
+so queued and interrupted jobs are picked up again on the next startup.
+"""
+
+import os
+import json
+import asyncio
+import logging
+import sqlite3
+import threading
+import itertools
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from pydantic import BaseModel
+
+from models.job import AnalysisJob
+from utils import database as db
+from utils.async_database import run_db
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# "supabase" or "sqlite"; defaults to Supabase when it is configured.
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "").lower()
+JOB_SQLITE_PATH = os.getenv(
+    "JOB_SQLITE_PATH", str(Path(__file__).parent.parent / "data" / "jobs.sqlite3")
+)
+JOB_SHUTDOWN_TIMEOUT_SEC = float(os.getenv("JOB_SHUTDOWN_TIMEOUT_SEC", "10"))
+
+# Default priority per job kind; lower runs first. HITL pushes have a
+# reviewer waiting, bulk re-screens can wait behind single-user ingests.
+JOB_PRIORITIES = {
+    "compliance_push": 0,
+    "ingest_batch": 10,
+    "bulk_ingest": 20,
+}
+
+FINISHED_STATUSES = {"completed", "failed", "cancelled"}
+
+# handler(payload, on_event) -> result model. on_event receives the same
+# ("trace", {...}) / ("step", {...}) events as the SSE endpoints.
+JobHandler = Callable[[dict, Callable[[str, dict], Awaitable[None]]], Awaitable[BaseModel]]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobStore(ABC):
+    """Base class for job persistence; all methods are blocking."""
+
+    backend = "none"
+
+    @abstractmethod
+    def create(self, job: dict) -> None:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, fields: dict) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def list_jobs(self, status: str | None = None, limit: int = 50) -> list[dict]:
+        ...
+
+    @abstractmethod
+    def unfinished(self) -> list[dict]:
+        ...
+
+
+class SupabaseJobStore(JobStore):
+    backend = "supabase"
+
+    def create(self, job: dict) -> None:
+        db.create_analysis_job(job)
+
+    def update(self, job_id: str, fields: dict) -> None:
+        db.update_analysis_job(job_id, fields)
+
+    def get(self, job_id: str) -> dict | None:
+        return db.get_analysis_job(job_id)
+
+    def list_jobs(self, status: str | None = None, limit: int = 50) -> list[dict]:
+        return db.list_analysis_jobs(status, limit)
+
+    def unfinished(self) -> list[dict]:
+        return db.get_unfinished_analysis_jobs()
+
+
+class SQLiteJobStore(JobStore):
+    """Local job table for running without Supabase."""
+
+    backend = "sqlite"
+
+    _JSON_FIELDS = ("payload", "result")
+
+    def __init__(self, path: str = JOB_SQLITE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS analysis_jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                trace_id TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                completed_at TEXT
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status "
+            "ON analysis_jobs(status, priority, created_at)"
+        )
+        self._conn.commit()
+
+    def _encode(self, fields: dict) -> dict:
+        return {
+            k: json.dumps(v, default=str) if k in self._JSON_FIELDS and v is not None else v
+            for k, v in fields.items()
+        }
+
+    def _decode(self, row: sqlite3.Row) -> dict:
+        job = dict(row)
+        for k in self._JSON_FIELDS:
+            if job.get(k) is not None:
+                job[k] = json.loads(job[k])
+        return job
+
+    def create(self, job: dict) -> None:
+        job = self._encode(job)
+        columns = ", ".join(job)
+        placeholders = ", ".join("?" for _ in job)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO analysis_jobs ({columns}) VALUES ({placeholders})",
+                tuple(job.values()),
+            )
+            self._conn.commit()
+
+    def update(self, job_id: str, fields: dict) -> None:
+        fields = self._encode(fields)
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE analysis_jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM analysis_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._decode(row) if row else None
+
+    def list_jobs(self, status: str | None = None, limit: int = 50) -> list[dict]:
+        query = "SELECT * FROM analysis_jobs"
+        params: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, (*params, limit)).fetchall()
+        return [self._decode(r) for r in rows]
+
+    def unfinished(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM analysis_jobs WHERE status IN ('queued', 'running') "
+                "ORDER BY created_at"
+            ).fetchall()
+        return [self._decode(r) for r in rows]
+
+
+class JobQueue:
+    """
+    Priority queue plus a fixed pool of worker tasks.
+
+    Cancelling a queued job marks it so workers skip it; cancelling a running
+    job cancels its handler task. On shutdown, jobs still running are put
+    back to "queued" so the next process resumes them.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._handlers: dict[str, JobHandler] = {}
+        self._queue: asyncio.PriorityQueue | None = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self._running: dict[str, asyncio.Task] = {}
+        # Cancelled jobs whose queue entry or handler has not unwound yet.
+        self._cancelled: set[str] = set()
+        # Jobs with an entry in the PriorityQueue; re-enqueueing one is a no-op.
+        self._queued: set[str] = set()
+        self._seq = itertools.count()
+        self._stopping = False
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    @property
+    def started(self) -> bool:
+        return bool(self._worker_tasks)
+
+    async def start(self) -> None:
+        if self.started:
+            return
+        self._stopping = False
+        self._queue = asyncio.PriorityQueue()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        try:
+            pending = await run_db(self.store.unfinished)
+        except Exception as e:
+            logger.warning(f"Could not load unfinished jobs: {e}")
+            pending = []
+        for row in pending:
+            job = AnalysisJob(**row)
+            if job.status == "running":
+                await run_db(self.store.update, job.id, {"status": "queued"})
+                job.status = "queued"
+            self._enqueue(job)
+        logger.info(
+            f"Job queue started ({self.store.backend}, {self.workers} workers, "
+            f"{len(pending)} jobs resumed)"
+        )
+
+    def _enqueue(self, job: AnalysisJob) -> None:
+        if job.id in self._queued:
+            return
+        self._queued.add(job.id)
+        self._queue.put_nowait((job.priority, next(self._seq), job))
+
+    async def submit(self, kind: str, payload: dict, priority: int | None = None) -> AnalysisJob:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        await self.start()
+        job = AnalysisJob(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            priority=JOB_PRIORITIES.get(kind, 10) if priority is None else priority,
+            payload=payload,
+            created_at=_now(),
+        )
+        await run_db(self.store.create, job.model_dump(exclude_none=True))
+        self._enqueue(job)
+        return job
+
+    async def get(self, job_id: str) -> AnalysisJob | None:
+        row = await run_db(self.store.get, job_id)
+        return AnalysisJob(**row) if row else None
+
+    async def list_jobs(self, status: str | None = None, limit: int = 50) -> list[AnalysisJob]:
+        rows = await run_db(self.store.list_jobs, status, limit)
+        return [AnalysisJob(**r) for r in rows]
+
+    async def cancel(self, job_id: str) -> AnalysisJob | None:
+        job = await self.get(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return job
+        self._cancelled.add(job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            # The worker records the cancellation once the handler unwinds.
+            task.cancel()
+        else:
+            await self._finish(job_id, "cancelled")
+        return await self.get(job_id)
+
+    async def retry(self, job_id: str) -> AnalysisJob | None:
+        """Re-queue a failed or cancelled job with its original payload."""
+        job = await self.get(job_id)
+        if job is None or job.status not in ("failed", "cancelled"):
+            return job
+        await self.start()
+        self._cancelled.discard(job_id)
+        fields = {"status": "queued", "error": None, "result": None, "completed_at": None}
+        await run_db(self.store.update, job_id, fields)
+        job = job.model_copy(update=fields)
+        self._enqueue(job)
+        return job
+
+    async def _finish(self, job_id: str, status: str, result: dict | None = None, error: str | None = None) -> None:
+        await run_db(
+            self.store.update,
+            job_id,
+            {"status": status, "result": result, "error": error, "completed_at": _now()},
+        )
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            self._queued.discard(job.id)
+            try:
+                if job.id in self._cancelled:
+                    self._cancelled.discard(job.id)
+                    continue
+                # The entry may be stale: cancelled, or finished by another process.
+                row = await run_db(self.store.get, job.id)
+                if row is None or row["status"] != "queued":
+                    continue
+                await self._execute(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Job worker {index} failed on {job.id}")
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: AnalysisJob) -> None:
+        attempts = job.attempts + 1
+        await run_db(
+            self.store.update,
+            job.id,
+            {"status": "running", "attempts": attempts, "started_at": _now()},
+        )
+
+        async def on_event(event: str, data: dict) -> None:
+            if event == "trace":
+                await run_db(self.store.update, job.id, {"trace_id": data["trace_id"]})
+
+        task = asyncio.create_task(self._handlers[job.kind](job.payload, on_event))
+        self._running[job.id] = task
+        if job.id in self._cancelled:
+            # Cancelled between dequeue and now; cancel() found no task to stop.
+            task.cancel()
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if job.id in self._cancelled and not self._stopping:
+                await self._finish(job.id, "cancelled")
+                return
+            # Worker shutdown: stop the handler and leave the job to be resumed.
+            task.cancel()
+            await run_db(self.store.update, job.id, {"status": "queued"})
+            raise
+        except Exception as e:
+            detail = getattr(e, "detail", None)
+            error = str(detail) if detail is not None else str(e) or type(e).__name__
+            logger.warning(f"Job {job.id} ({job.kind}) failed on attempt {attempts}: {error}")
+            await self._finish(job.id, "failed", error=error)
+            return
+        finally:
+            self._running.pop(job.id, None)
+            self._cancelled.discard(job.id)
+
+        await self._finish(job.id, "completed", result=result.model_dump(mode="json"))
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.store.backend,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": len(self._running),
+        }
+
+    async def shutdown(self, timeout: float = JOB_SHUTDOWN_TIMEOUT_SEC) -> None:
+        """Stop the workers; interrupted jobs are re-queued in the store."""
+        if not self._worker_tasks:
+            return
+        self._stopping = True
+        for task in self._worker_tasks:
+            task.cancel()
+        done, pending = await asyncio.wait(self._worker_tasks, timeout=timeout)
+        if pending:
+            logger.warning(f"Job queue shutdown timed out with {len(pending)} workers still stopping")
+        self._worker_tasks = []
+
+
+_queue: JobQueue | None = None
+
+
+def _default_store() -> JobStore:
+    backend = JOB_STORE_BACKEND
+    if not backend:
+        has_supabase = bool(os.getenv("SUPABASE_URL")) and bool(os.getenv("SUPABASE_KEY"))
+        backend = "supabase" if has_supabase else "sqlite"
+    if backend == "supabase":
+        return SupabaseJobStore()
+    if backend != "sqlite":
+        logger.warning(f"Unknown JOB_STORE_BACKEND '{backend}', using sqlite")
+    return SQLiteJobStore()
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(_default_store())
+    return _queue
@@ -0,0 +1,254 @@
+"""
+Population-level baseline statistics per jurisdiction.
+
+Impact analysis needs to know how a jurisdiction's users behave, not who they
+are. `get_jurisdiction_summary` returns a fixed-size summary — user and
+income-level counts, percentiles and histograms of avg_tx_amount_usd and
+avg_daily_total_usd, and how many users sit above each monetary threshold
+the regulation names — so prompt size does not grow with the user count.
+
+The aggregation runs in Postgres (jurisdiction_baseline_aggregates in
+scripts/create_tables.sql). When that function is not deployed, rows for
+the jurisdiction are fetched with a server-side country filter and
+aggregated here with the same semantics. Summaries are cached per
+(jurisdiction, thresholds) for JURISDICTION_STATS_TTL_SEC.
+"""
+
+import os
+import re
+import time
+import bisect
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+
+from utils import async_database as adb
+
+logger = logging.getLogger(__name__)
+
+JURISDICTION_STATS_TTL_SEC = float(os.getenv("JURISDICTION_STATS_TTL_SEC", "300"))
+
+# Lower bucket edges in USD (width_bucket semantics: bucket i holds
+# edges[i-1] <= value < edges[i], the last bucket is open-ended).
+HISTOGRAM_EDGES_USD = [0.0, 50.0, 100.0, 250.0, 500.0, 1_000.0, 2_500.0, 5_000.0, 10_000.0, 25_000.0, 50_000.0]
+PERCENTILES = [0.5, 0.9, 0.95, 0.99]
+MAX_THRESHOLDS = 3
+METRICS = {
+    "avg_tx_amount_usd": "Avg tx amount",
+    "avg_daily_total_usd": "Avg daily total",
+}
+
+# Approximate conversion for thresholds quoted in other currencies.
+FX_TO_USD = {"USD": 1.0, "EUR": 1.08, "GBP": 1.27, "AED": 0.2723, "KYD": 1.2}
+_CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP"}
+
+_THRESHOLD = re.compile(
+    r"(?:over|above|exceed(?:ing|s)?|more than|greater than|in excess of)\s+"
+    r"(?P<pre>[$€£]|USD|EUR|GBP|AED|KYD)?\s*(?P<num>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)\s*(?P<mult>k\b|million\b)?"
+    r"\s*(?P<post>USD|EUR|GBP|AED|KYD)?"
+    r"(?:\s*\(~?\s*\$\s*(?P<usd>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)\))?",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class Threshold:
+    usd: float
+    source: str
+
+
+def regulation_thresholds(text: str) -> list[Threshold]:
+    """Monetary transaction thresholds ("transactions above AED 50,000") named in regulation text."""
+    found: dict[float, Threshold] = {}
+    for m in _THRESHOLD.finditer(text):
+        currency = (m.group("post") or m.group("pre") or "").upper()
+        currency = _CURRENCY_SYMBOLS.get(currency, currency)
+        if not currency:
+            continue
+        if m.group("usd"):
+            usd = float(m.group("usd").replace(",", ""))
+        else:
+            value = float(m.group("num").replace(",", ""))
+            mult = (m.group("mult") or "").lower()
+            value *= 1_000 if mult == "k" else 1_000_000 if mult == "million" else 1
+            usd = round(value * FX_TO_USD.get(currency, 1.0), 2)
+        found.setdefault(usd, Threshold(usd=usd, source=m.group(0).strip()))
+    return [found[usd] for usd in sorted(found)][:MAX_THRESHOLDS]
+
+
+def _percentile_cont(values: list[float], q: float) -> float:
+    pos = q * (len(values) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def aggregate_rows(
+    rows: list[dict],
+    edges: list[float],
+    percentiles: list[float],
+    thresholds: list[float],
+) -> dict:
+    """Python twin of jurisdiction_baseline_aggregates(); same output shape."""
+    income_levels: dict[str, int] = {}
+    for row in rows:
+        level = row.get("income_level")
+        income_levels[level] = income_levels.get(level, 0) + 1
+
+    metrics = {}
+    for metric in METRICS:
+        values = sorted(float(r[metric]) for r in rows if r.get(metric) is not None)
+        if not values:
+            continue
+        histogram: dict[str, int] = {}
+        for v in values:
+            bucket = str(bisect.bisect_right(edges, v))
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        metrics[metric] = {
+            "mean": sum(values) / len(values),
+            "max": values[-1],
+            "percentiles": [_percentile_cont(values, q) for q in percentiles],
+            "histogram": histogram,
+        }
+
+    def above(metric: str, t: float) -> int:
+        return sum(1 for r in rows if r.get(metric) is not None and r[metric] > t)
+
+    # max_tx_amount_usd stays 0 until a baseline has been derived from history.
+    largest = [max(r.get("max_tx_amount_usd") or 0.0, r.get("avg_tx_amount_usd") or 0.0) for r in rows]
+
+    return {
+        "user_count": len(rows),
+        "with_baseline": sum(1 for r in rows if r.get("avg_tx_amount_usd") is not None),
+        "income_levels": income_levels,
+        "metrics": metrics,
+        "thresholds": [
+            {
+                "threshold_usd": t,
+                "avg_tx_above": above("avg_tx_amount_usd", t),
+                "avg_daily_above": above("avg_daily_total_usd", t),
+                "max_tx_above": sum(1 for v in largest if v > t),
+            }
+            for t in sorted(thresholds)
+        ],
+    }
+
+
+def _usd(value: float) -> str:
+    return f"${value:,.0f}"
+
+
+def _bucket_label(bucket: int, edges: list[float]) -> str:
+    if bucket <= 0:
+        return f"<{_usd(edges[0])}"
+    if bucket >= len(edges):
+        return f"≥{_usd(edges[-1])}"
+    return f"{_usd(edges[bucket - 1])}–{_usd(edges[bucket])}"
+
+
+@dataclass
+class JurisdictionSummary:
+    jurisdiction_code: str
+    user_count: int
+    with_baseline: int
+    income_levels: dict[str, int]
+    metrics: dict[str, dict]
+    thresholds: list[dict] = field(default_factory=list)
+    threshold_sources: dict[float, str] = field(default_factory=dict)
+
+    @property
+    def users_above_threshold(self) -> int | None:
+        """Users whose largest transaction exceeded the lowest named threshold."""
+        if not self.thresholds:
+            return None
+        return self.thresholds[0]["max_tx_above"]
+
+    def _share(self, count: int) -> str:
+        return f"{count / self.user_count:.1%}" if self.user_count else "0%"
+
+    def to_prompt(self) -> str:
+        """Compact, fixed-size text for LLM prompts."""
+        if not self.user_count:
+            return "No users on record in this jurisdiction."
+
+        income = ", ".join(
+            f"{level} {count} ({self._share(count)})"
+            for level, count in sorted(self.income_levels.items(), key=lambda kv: str(kv[0]))
+        )
+        lines = [
+            f"Users: {self.user_count:,} ({self.with_baseline:,} with baselines)",
+            f"Income levels: {income}",
+        ]
+        for metric, label in METRICS.items():
+            stats = self.metrics.get(metric)
+            if not stats:
+                continue
+            pcts = ", ".join(
+                f"p{q * 100:g} {_usd(v)}" for q, v in zip(PERCENTILES, stats["percentiles"])
+            )
+            lines.append(f"{label} (USD): mean {_usd(stats['mean'])}, {pcts}, max {_usd(stats['max'])}")
+            histogram = stats["histogram"]
+            buckets = " | ".join(
+                f"{_bucket_label(int(b), HISTOGRAM_EDGES_USD)}: {histogram[b]}"
+                for b in sorted(histogram, key=int)
+            )
+            lines.append(f"  histogram: {buckets}")
+        for t in self.thresholds:
+            usd = t["threshold_usd"]
+            source = self.threshold_sources.get(usd)
+            named = f" (\"{source}\")" if source else ""
+            lines.append(
+                f"Threshold {_usd(usd)}{named}: avg tx above {t['avg_tx_above']} "
+                f"({self._share(t['avg_tx_above'])}), avg daily total above {t['avg_daily_above']} "
+                f"({self._share(t['avg_daily_above'])}), largest tx above {t['max_tx_above']} "
+                f"({self._share(t['max_tx_above'])})"
+            )
+        return "\n".join(lines)
+
+
+_summary_cache: dict[tuple[str, tuple[float, ...]], tuple[float, JurisdictionSummary]] = {}
+_summary_cache_lock = threading.Lock()
+
+
+def invalidate_summary_cache(jurisdiction_code: str | None = None) -> None:
+    with _summary_cache_lock:
+        for key in list(_summary_cache):
+            if jurisdiction_code is None or key[0] == jurisdiction_code.upper():
+                del _summary_cache[key]
+
+
+async def _aggregates(code: str, thresholds: list[float]) -> dict:
+    try:
+        return await adb.get_jurisdiction_aggregates(code, HISTOGRAM_EDGES_USD, PERCENTILES, thresholds)
+    except Exception as e:
+        logger.warning(f"jurisdiction_baseline_aggregates unavailable for {code}, aggregating rows instead: {e}")
+    rows = await adb.get_jurisdiction_baseline_rows(code)
+    return await asyncio.to_thread(aggregate_rows, rows, HISTOGRAM_EDGES_USD, PERCENTILES, thresholds)
+
+
+async def get_jurisdiction_summary(
+    jurisdiction_code: str,
+    thresholds: list[Threshold] | None = None,
+) -> JurisdictionSummary:
+    code = jurisdiction_code.upper()
+    thresholds = thresholds or []
+    key = (code, tuple(t.usd for t in thresholds))
+    with _summary_cache_lock:
+        entry = _summary_cache.get(key)
+    if entry and time.monotonic() - entry[0] < JURISDICTION_STATS_TTL_SEC:
+        return entry[1]
+
+    data = await _aggregates(code, [t.usd for t in thresholds])
+    summary = JurisdictionSummary(
+        jurisdiction_code=code,
+        user_count=int(data.get("user_count") or 0),
+        with_baseline=int(data.get("with_baseline") or 0),
+        income_levels=data.get("income_levels") or {},
+        metrics=data.get("metrics") or {},
+        thresholds=sorted(data.get("thresholds") or [], key=lambda t: t["threshold_usd"]),
+        threshold_sources={t.usd: t.source for t in thresholds},
+    )
+    with _summary_cache_lock:
+        _summary_cache[key] = (time.monotonic(), summary)
+    return summary
@@ -2,51 +2,164 @@ import os
 import json
 import logging
 import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from typing import Type, TypeVar
 from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
 from google import genai
 
+from utils.llm_cache import LLMCache, get_llm_cache, make_cache_key
+from utils.llm_limits import LLMAdmissionController, estimate_tokens
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-client = genai.Client(api_key=os.getenv("LLM_API_KEY"))
-
 MODEL_FAST = "gemini-2.0-flash"
 MODEL_PRO = "gemini-2.5-pro"
 
 MAX_RETRIES = 3
 
+# Per-call deadlines (seconds). The HTTP client timeout is set slightly above the
+# largest of these so asyncio cancels first and the connection is returned cleanly.
+LLM_TIMEOUT_SEC = {
+    MODEL_FAST: float(os.getenv("LLM_FAST_TIMEOUT_SEC", "30")),
+    MODEL_PRO: float(os.getenv("LLM_PRO_TIMEOUT_SEC", "120")),
+}
+LLM_DEFAULT_TIMEOUT_SEC = float(os.getenv("LLM_DEFAULT_TIMEOUT_SEC", "60"))
+
+# One client for the process: its async HTTP session (and connection pool) is
+# reused by every call.
+client = genai.Client(
+    api_key=os.getenv("LLM_API_KEY"),
+    http_options={"timeout": int((max(LLM_TIMEOUT_SEC.values()) + 5) * 1000)},
+)
+
+# Only used when the installed SDK has no native async interface; keeps blocking
+# LLM calls off the default executor shared with database work.
+_llm_executor: ThreadPoolExecutor | None = None
+
+# Per-model admission limits: (max concurrent requests, requests/min, tokens/min)
+admission = LLMAdmissionController(
+    limits={
+        MODEL_FAST: (
+            int(os.getenv("LLM_FAST_MAX_CONCURRENCY", "16")),
+            float(os.getenv("LLM_FAST_RPM", "1000")),
+            float(os.getenv("LLM_FAST_TPM", "1000000")),
+        ),
+        MODEL_PRO: (
+            int(os.getenv("LLM_PRO_MAX_CONCURRENCY", "4")),
+            float(os.getenv("LLM_PRO_RPM", "150")),
+            float(os.getenv("LLM_PRO_TPM", "2000000")),
+        ),
+    },
+    default=(4, 60, 250000),
+)
+
 T = TypeVar("T", bound=BaseModel)
 
 
+async def _generate_content(model: str, contents: str, config: dict):
+    aio = getattr(client, "aio", None)
+    if aio is not None:
+        return await aio.models.generate_content(model=model, contents=contents, config=config)
+
+    global _llm_executor
+    if _llm_executor is None:
+        _llm_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("LLM_EXECUTOR_WORKERS", "16")),
+            thread_name_prefix="llm",
+        )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _llm_executor,
+        functools.partial(client.models.generate_content, model=model, contents=contents, config=config),
+    )
+
+
+def _build_config(system_prompt: str, json_mode: bool, temperature: float) -> dict:
+    config = {
+        "temperature": temperature,
+        "system_instruction": system_prompt,
+    }
+    if json_mode:
+        config["response_mime_type"] = "application/json"
+    return config
+
+
+def _cache_key(
+    system_prompt: str,
+    user_prompt: str,
+    json_mode: bool,
+    temperature: float,
+    model: str | None,
+) -> str:
+    config = _build_config(system_prompt, json_mode, temperature)
+    return make_cache_key(model or MODEL_FAST, system_prompt, user_prompt, config)
+
+
+async def _cache_call(cache: LLMCache, fn, *args):
+    """Run a cache method, in a worker thread when the backend does I/O."""
+    if cache.blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
 async def call_llm(
     system_prompt: str,
     user_prompt: str,
     json_mode: bool = True,
     temperature: float = 0.3,
     model: str | None = None,
+    use_cache: bool = False,
+    timeout: float | None = None,
 ) -> str:
+    """
+    Call the LLM and return the raw text response.
+
+    With `use_cache=True` an identical earlier call (same model, prompts and
+    generation config) is answered from the response cache. JSON-mode
+    responses are only cached once they parse.
+
+    `timeout` bounds the provider call itself (admission queueing has its own
+    deadline); it defaults to the per-model LLM_TIMEOUT_SEC.
+    """
     selected_model = model or MODEL_FAST
-    config = {
-        "temperature": temperature,
-        "system_instruction": system_prompt,
-    }
-    if json_mode:
-        config["response_mime_type"] = "application/json"
+    config = _build_config(system_prompt, json_mode, temperature)
 
-    response = await asyncio.to_thread(
-        client.models.generate_content,
-        model=selected_model,
-        contents=user_prompt,
-        config=config,
-    )
+    cache = get_llm_cache() if use_cache else None
+    cache_key = None
+    if cache is not None:
+        cache_key = _cache_key(system_prompt, user_prompt, json_mode, temperature, selected_model)
+        cached = await _cache_call(cache, cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+    estimated = estimate_tokens(system_prompt, user_prompt)
+    async with admission.admit(selected_model, estimated) as ticket:
+        call_timeout = timeout or LLM_TIMEOUT_SEC.get(selected_model, LLM_DEFAULT_TIMEOUT_SEC)
+        try:
+            response = await asyncio.wait_for(
+                _generate_content(selected_model, user_prompt, config),
+                timeout=call_timeout,
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"LLM call to {selected_model} timed out after {call_timeout}s")
+        ticket.record_usage(getattr(response, "usage_metadata", None))
 
     content = response.text
     if content is None:
         raise ValueError("LLM returned empty content")
 
+    if cache is not None:
+        try:
+            if json_mode:
+                json.loads(content)
+            await _cache_call(cache, cache.set, cache_key, content)
+        except json.JSONDecodeError:
+            pass
+
     return content
 
 
@@ -55,6 +168,8 @@ async def call_llm_json(
     user_prompt: str,
     temperature: float = 0.3,
     model: str | None = None,
+    use_cache: bool = False,
+    timeout: float | None = None,
 ) -> dict:
     content = await call_llm(
         system_prompt=system_prompt,
@@ -62,6 +177,8 @@ async def call_llm_json(
         json_mode=True,
         temperature=temperature,
         model=model,
+        use_cache=use_cache,
+        timeout=timeout,
     )
     return json.loads(content)
 
@@ -73,6 +190,8 @@ async def call_llm_validated(
     temperature: float = 0.3,
     max_retries: int = MAX_RETRIES,
     model: str | None = None,
+    use_cache: bool = False,
+    timeout: float | None = None,
 ) -> tuple[T, int]:
     """
     Call LLM with Pydantic validation retry loop.
@@ -82,6 +201,9 @@ async def call_llm_validated(
       2. Parse and validate against `response_model`.
       3. If ValidationError, retry with error feedback in the prompt.
 
+    Only the first attempt may be served from the cache; a cached response
+    that fails validation is evicted before retrying.
+
     Returns (validated_model, retry_count).
     Raises the last exception after all retries are exhausted.
     """
@@ -96,6 +218,8 @@ async def call_llm_validated(
                 json_mode=True,
                 temperature=temperature,
                 model=model,
+                use_cache=use_cache and attempt == 1,
+                timeout=timeout,
             )
 
             data = json.loads(raw)
@@ -104,6 +228,10 @@ async def call_llm_validated(
 
         except (ValidationError, json.JSONDecodeError) as e:
             last_error = e
+            cache = get_llm_cache()
+            if use_cache and attempt == 1 and cache is not None:
+                key = _cache_key(system_prompt, user_prompt, True, temperature, model)
+                await _cache_call(cache, cache.delete, key)
             error_msg = str(e)
             logger.warning(
                 f"LLM output validation failed (attempt {attempt}/{max_retries}): {error_msg[:200]}"
@@ -125,3 +253,11 @@ async def call_llm_validated(
                 break
 
     raise last_error or RuntimeError("LLM call exhausted all retries")
+
+
+def get_llm_metrics() -> dict:
+    cache = get_llm_cache()
+    return {
+        "cache": cache.stats() if cache is not None else None,
+        "admission": admission.metrics(),
+    }
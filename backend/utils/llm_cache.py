@@ -0,0 +1,249 @@
+"""Response cache for LLM calls, keyed on a hash of model, prompts and config."""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+LLM_CACHE_TTL_SEC = float(os.getenv("LLM_CACHE_TTL_SEC", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH", str(Path(__file__).parent.parent / "data" / "llm_cache.sqlite3")
+)
+
+
+def make_cache_key(model: str, system_prompt: str, user_prompt: str, config: dict) -> str:
+    payload = json.dumps(
+        {
+            "model": model,
+            "system_prompt": system_prompt,
+            "user_prompt": user_prompt,
+            "config": config,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache(ABC):
+    """
+    Base class: TTL bookkeeping and hit/miss counters shared by all backends.
+
+    `blocking` marks backends whose methods do I/O; callers on the event loop
+    run those in a worker thread.
+    """
+
+    backend = "none"
+    blocking = False
+
+    def __init__(self, ttl_sec: float, max_entries: int):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "size": self.size(),
+            "max_entries": self.max_entries,
+            "ttl_sec": self.ttl_sec,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class MemoryLLMCache(LLMCache):
+    """In-process LRU cache with per-entry expiry."""
+
+    backend = "memory"
+
+    def __init__(self, ttl_sec: float = LLM_CACHE_TTL_SEC, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        super().__init__(ttl_sec, max_entries)
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_sec, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteLLMCache(LLMCache):
+    """
+    On-disk cache that survives restarts; evicts least-recently-used rows.
+
+    Reads never write: hits note their access time in memory and expired rows
+    are left in place. Both are applied on the next `set`, in the same commit
+    as the insert, before eviction picks the least-recently-used rows.
+    """
+
+    backend = "sqlite"
+    blocking = True
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl_sec: float = LLM_CACHE_TTL_SEC,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+    ):
+        super().__init__(ttl_sec, max_entries)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)"
+        )
+        self._conn.commit()
+        self._touched: dict[str, float] = {}
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._touched.pop(key, None)
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            if self._touched:
+                self._conn.executemany(
+                    "UPDATE llm_cache SET last_used = ? WHERE key = ?",
+                    [(used, touched) for touched, used in self._touched.items()],
+                )
+                self._touched.clear()
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl_sec, now),
+            )
+            overflow = self._size_locked() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._touched.pop(key, None)
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def _size_locked(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def size(self) -> int:
+        with self._lock:
+            return self._size_locked()
+
+
+_cache: LLMCache | None = None
+_cache_initialised = False
+
+
+def get_llm_cache() -> LLMCache | None:
+    """Return the configured cache backend, or None when LLM_CACHE_BACKEND=off."""
+    global _cache, _cache_initialised
+    if not _cache_initialised:
+        _cache_initialised = True
+        if LLM_CACHE_BACKEND == "memory":
+            _cache = MemoryLLMCache()
+        elif LLM_CACHE_BACKEND == "sqlite":
+            _cache = SQLiteLLMCache()
+        elif LLM_CACHE_BACKEND not in ("off", "none", ""):
+            logger.warning(f"Unknown LLM_CACHE_BACKEND '{LLM_CACHE_BACKEND}', caching disabled")
+    return _cache
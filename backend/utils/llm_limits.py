@@ -0,0 +1,179 @@
+"""
+Admission control for LLM calls.
+
+Every Gemini request passes through a per-model gate before it is sent:
+  1. a concurrency semaphore (max in-flight requests for that model),
+  2. a requests-per-minute token bucket,
+  3. a tokens-per-minute token bucket (charged with an estimate up front and
+     reconciled with the provider's usage metadata afterwards).
+
+Waiting callers queue in arrival order. A caller that cannot be admitted
+before its deadline gets LLMAdmissionTimeout, which agents already treat like
+any other LLM failure and fall back to deterministic logic.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+LLM_ADMISSION_TIMEOUT_SEC = float(os.getenv("LLM_ADMISSION_TIMEOUT_SEC", "30"))
+# Completion allowance added to the prompt estimate when charging the TPM bucket.
+LLM_EST_OUTPUT_TOKENS = int(os.getenv("LLM_EST_OUTPUT_TOKENS", "512"))
+
+_WAIT_SAMPLES = 500
+
+
+class LLMAdmissionTimeout(RuntimeError):
+    pass
+
+
+def estimate_tokens(*texts: str) -> int:
+    # ~4 characters per token is close enough for rate-limit accounting.
+    return sum(len(t) for t in texts) // 4 + LLM_EST_OUTPUT_TOKENS
+
+
+class TokenBucket:
+    """Continuously refilling bucket; `per_minute` tokens become available each minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float, deadline: float) -> None:
+        amount = min(amount, self.capacity)
+        # The lock keeps waiters FIFO: only the head of the queue sleeps on
+        # refill. Waiting for the lock is bounded by the caller's own deadline,
+        # so callers queued behind a sleeper still time out on time.
+        try:
+            await asyncio.wait_for(self._lock.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise LLMAdmissionTimeout("rate limit queue wait exceeded deadline") from None
+        try:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+                if time.monotonic() + wait > deadline:
+                    raise LLMAdmissionTimeout("rate limit wait would exceed deadline")
+                await asyncio.sleep(wait)
+        finally:
+            self._lock.release()
+
+    def adjust(self, delta: float) -> None:
+        """Charge (positive) or refund (negative) tokens after the fact; may go negative."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class ModelGate:
+    def __init__(self, model: str, max_concurrency: int, rpm: float, tpm: float):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.timed_out = 0
+        self._waits_ms: deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+    def metrics(self) -> dict:
+        waits = sorted(self._waits_ms)
+        p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+        return {
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "admitted": self.admitted,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(sum(waits) / len(waits), 1) if waits else 0.0,
+            "p95_wait_ms": round(p95, 1),
+            "max_wait_ms": round(waits[-1], 1) if waits else 0.0,
+            "rpm_available": round(self.requests.tokens, 1),
+            "tpm_available": round(self.tokens.tokens),
+        }
+
+
+class Admission:
+    """Handle for one admitted call; reconciles the TPM charge on exit."""
+
+    def __init__(self, gate: ModelGate, estimated_tokens: int):
+        self._gate = gate
+        self._estimated_tokens = estimated_tokens
+
+    def record_usage(self, usage_metadata) -> None:
+        total = getattr(usage_metadata, "total_token_count", None) if usage_metadata else None
+        if total:
+            self._gate.tokens.adjust(total - self._estimated_tokens)
+
+
+class LLMAdmissionController:
+    def __init__(self, limits: dict[str, tuple[int, float, float]], default: tuple[int, float, float]):
+        self._limits = limits
+        self._default = default
+        self._gates: dict[str, ModelGate] = {}
+
+    def gate(self, model: str) -> ModelGate:
+        gate = self._gates.get(model)
+        if gate is None:
+            concurrency, rpm, tpm = self._limits.get(model, self._default)
+            gate = ModelGate(model, concurrency, rpm, tpm)
+            self._gates[model] = gate
+        return gate
+
+    @asynccontextmanager
+    async def admit(self, model: str, estimated_tokens: int, timeout: float = LLM_ADMISSION_TIMEOUT_SEC):
+        gate = self.gate(model)
+        start = time.monotonic()
+        deadline = start + timeout
+        gate.waiting += 1
+        acquired = False
+        try:
+            await asyncio.wait_for(gate.semaphore.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+            acquired = True
+            await gate.requests.acquire(1, deadline)
+            await gate.tokens.acquire(estimated_tokens, deadline)
+        except (asyncio.TimeoutError, LLMAdmissionTimeout):
+            gate.waiting -= 1
+            gate.timed_out += 1
+            if acquired:
+                gate.semaphore.release()
+            logger.warning(
+                f"LLM admission timed out for {model} after {time.monotonic() - start:.1f}s "
+                f"(queue depth {gate.waiting})"
+            )
+            raise LLMAdmissionTimeout(f"LLM admission for {model} timed out after {timeout}s")
+        except BaseException:
+            gate.waiting -= 1
+            if acquired:
+                gate.semaphore.release()
+            raise
+
+        gate.waiting -= 1
+        gate.in_flight += 1
+        gate.admitted += 1
+        gate._waits_ms.append((time.monotonic() - start) * 1000)
+        try:
+            yield Admission(gate, estimated_tokens)
+        finally:
+            gate.in_flight -= 1
+            gate.semaphore.release()
+
+    def metrics(self) -> dict:
+        return {model: gate.metrics() for model, gate in self._gates.items()}
@@ -0,0 +1,140 @@
+"""
+KLL quantile sketch (Karnin, Lang & Liberty, 2016).
+
+A mergeable streaming summary answering rank/quantile queries with error
+of roughly 1.65/k of n, in O(k) space. Compaction alternates the kept
+offset per level instead of flipping a coin, so the same stream always
+produces the same sketch.
+"""
+
+import math
+
+DEFAULT_K = 200
+_C = 2.0 / 3.0
+
+
+class KLLSketch:
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.n = 0
+        self.compactors: list[list[float]] = [[]]
+        self.offsets: list[int] = [0]
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    # ── Construction ──
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * _C ** depth)))
+
+    def _grow(self) -> None:
+        self.compactors.append([])
+        self.offsets.append(0)
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compact_level(self, level: int) -> None:
+        items = sorted(self.compactors[level])
+        keep = [items.pop()] if len(items) % 2 else []
+        offset = self.offsets[level]
+        self.offsets[level] ^= 1
+        self.compactors[level + 1].extend(items[offset::2])
+        self.compactors[level] = keep
+
+    def _compress(self) -> None:
+        while self._size >= self._max_size:
+            for level in range(len(self.compactors)):
+                if len(self.compactors[level]) >= self._capacity(level):
+                    if level + 1 >= len(self.compactors):
+                        self._grow()
+                    self._compact_level(level)
+                    self._size = sum(len(c) for c in self.compactors)
+                    if self._size < self._max_size:
+                        return
+                    break
+            else:
+                return
+
+    def update(self, value: float) -> None:
+        self.compactors[0].append(float(value))
+        self.n += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._size = sum(len(c) for c in self.compactors)
+        self._compress()
+
+    # ── Queries ──
+
+    def weighted_items(self) -> list[tuple[float, int]]:
+        """(value, weight) pairs sorted by value; weights sum to n."""
+        items = [(x, 1 << level) for level, c in enumerate(self.compactors) for x in c]
+        items.sort()
+        return items
+
+    def quantile(self, q: float) -> float | None:
+        if not self.n:
+            return None
+        return _weighted_quantile(self.weighted_items(), q)
+
+    def rank(self, value: float) -> float:
+        """Approximate fraction of the stream that is <= value."""
+        if not self.n:
+            return 0.0
+        items = self.weighted_items()
+        below = sum(w for x, w in items if x <= value)
+        return below / sum(w for _, w in items)
+
+    def median_and_mad(self) -> tuple[float, float] | None:
+        """Median and median absolute deviation, both estimated from the sketch."""
+        if not self.n:
+            return None
+        items = self.weighted_items()
+        median = _weighted_quantile(items, 0.5)
+        deviations = sorted((abs(x - median), w) for x, w in items)
+        return median, _weighted_quantile(deviations, 0.5)
+
+    # ── Serialisation ──
+
+    def to_dict(self, ndigits: int | None = None) -> dict:
+        if ndigits is None:
+            compactors = [list(c) for c in self.compactors]
+        else:
+            compactors = [[round(x, ndigits) for x in c] for c in self.compactors]
+        return {
+            "k": self.k,
+            "n": self.n,
+            "compactors": compactors,
+            "offsets": list(self.offsets),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "KLLSketch":
+        sketch = cls(int(data.get("k", DEFAULT_K)) if data else DEFAULT_K)
+        if not data or not data.get("compactors"):
+            return sketch
+        sketch.compactors = [[float(x) for x in c] for c in data["compactors"]]
+        offsets = list(data.get("offsets") or [])
+        sketch.offsets = (offsets + [0] * len(sketch.compactors))[: len(sketch.compactors)]
+        sketch.n = int(data.get("n", 0))
+        sketch._size = sum(len(c) for c in sketch.compactors)
+        sketch._max_size = sum(sketch._capacity(h) for h in range(len(sketch.compactors)))
+        return sketch
+
+
+def _weighted_quantile(items: list[tuple[float, int]], q: float) -> float:
+    total = sum(w for _, w in items)
+    target = q * total
+    running = 0
+    for x, w in items:
+        running += w
+        if running >= target:
+            return x
+    return items[-1][0]
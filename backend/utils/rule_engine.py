@@ -0,0 +1,411 @@
+"""
+Compiled, data-driven risk scoring.
+
+A rulebook's `risk_score.rules` entries are free text ("Single tx > 5× user
+avg", "≥4 tx in ≤15 min (burst)", ...). `compile_rulebook` matches each entry
+against a set of known rule templates, extracts its parameters, and produces a
+predicate that scores a PreprocessedTransaction. Compiled rulebooks are cached
+by (jurisdiction_code, version, rules hash), so a newly approved or edited
+rulebook is picked up on its first use without a restart.
+
+Rule text that matches no template is kept in `CompiledRulebook.unmatched` and
+contributes no points; it is still applied by the LLM detector.
+"""
+
+import re
+import json
+import bisect
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional, Sequence
+
+from models.user import UserProfile, UserBaseline
+from models.transaction import PreprocessedTransaction
+from models.compliance import Rulebook
+from utils.geo import calculate_min_travel_hours, get_distance_between_countries
+
+logger = logging.getLogger(__name__)
+
+GEO_HOP_MIN_DISTANCE_KM = 500
+STRUCTURING_DEFAULT_THRESHOLD_USD = 10_000.0
+STRUCTURING_BAND = 0.9  # "just below" = within 10% under the threshold
+SANCTIONED_COUNTRIES = {"KP", "IR", "SY", "CU"}
+# "High volume inconsistent with profile": daily total this many times the
+# user's own avg daily total. Scored as the top tier of the daily-total rules.
+PROFILE_VOLUME_MULTIPLE = 5.0
+
+COMPILED_CACHE_SIZE = 64
+
+_NUM = r"(\d+(?:\.\d+)?)"
+_MULT = r"\s*[×x*]"
+
+
+def risk_band_for_score(score: int) -> str:
+    if score >= 75:
+        return "HIGH"
+    elif score >= 50:
+        return "MEDIUM"
+    elif score >= 25:
+        return "LOW"
+    return "CLEAN"
+
+
+class ScoringContext:
+    """Per-batch inputs shared by every predicate."""
+
+    def __init__(
+        self,
+        preprocessed: Sequence[PreprocessedTransaction],
+        baseline: UserBaseline,
+        profile: UserProfile,
+    ):
+        self.preprocessed = preprocessed
+        self.baseline = baseline
+        self.profile = profile
+        self._epochs: list[Optional[float]] | None = None
+        self._sorted_epochs: list[float] | None = None
+        self._day_ends: set[int] | None = None
+
+    def epochs(self) -> list[Optional[float]]:
+        if self._epochs is None:
+            epochs = []
+            for ptx in self.preprocessed:
+                try:
+                    epochs.append(datetime.fromisoformat(ptx.timestamp.replace("Z", "+00:00")).timestamp())
+                except Exception:
+                    epochs.append(None)
+            self._epochs = epochs
+            self._sorted_epochs = sorted(e for e in epochs if e is not None)
+        return self._epochs
+
+    def is_day_end(self, index: int) -> bool:
+        """True for the batch's last transaction of its calendar day (its daily total is final)."""
+        if self._day_ends is None:
+            last: dict[str, int] = {}
+            for i, ptx in enumerate(self.preprocessed):
+                last[ptx.timestamp[:10]] = i
+            self._day_ends = set(last.values())
+        return index in self._day_ends
+
+    def count_in_window(self, index: int, window_sec: float) -> int:
+        """Number of batch transactions in the window (t - window_sec, t] ending at `index`."""
+        t = self.epochs()[index]
+        if t is None:
+            return 0
+        lo = bisect.bisect_right(self._sorted_epochs, t - window_sec)
+        hi = bisect.bisect_right(self._sorted_epochs, t)
+        return hi - lo
+
+
+# A predicate returns a short flag description when the rule fires, else None.
+Predicate = Callable[[int, PreprocessedTransaction, ScoringContext], Optional[str]]
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    category: str
+    rule: str
+    points: int
+    predicate: Predicate
+    # Rules sharing a group are tiers of one check (e.g. >3× and >5× avg):
+    # only the highest-scoring match in the group counts per transaction.
+    group: Optional[str] = None
+
+
+@dataclass
+class ScoreResult:
+    risk_score: int
+    risk_band: str
+    flags: list[str]
+    total_points: int
+    tx_points: list[int] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class CompiledRulebook:
+    rules: tuple[CompiledRule, ...]
+    unmatched: tuple[str, ...]
+
+    def score(
+        self,
+        preprocessed: Sequence[PreprocessedTransaction],
+        baseline: UserBaseline,
+        profile: UserProfile,
+    ) -> ScoreResult:
+        ctx = ScoringContext(preprocessed, baseline, profile)
+        total_points = 0
+        flags: list[str] = []
+        tx_points: list[int] = []
+
+        for i, ptx in enumerate(preprocessed):
+            best_in_group: dict[str, tuple[int, str]] = {}
+            points = 0
+            for rule in self.rules:
+                detail = rule.predicate(i, ptx, ctx)
+                if detail is None:
+                    continue
+                flag = f"{detail} [+{rule.points}pts]"
+                if rule.group is None:
+                    points += rule.points
+                    flags.append(flag)
+                else:
+                    current = best_in_group.get(rule.group)
+                    if current is None or rule.points > current[0]:
+                        best_in_group[rule.group] = (rule.points, flag)
+            for group_points, flag in best_in_group.values():
+                points += group_points
+                flags.append(flag)
+            tx_points.append(points)
+            total_points += points
+
+        risk_score = min(total_points, 100)
+        return ScoreResult(
+            risk_score=risk_score,
+            risk_band=risk_band_for_score(risk_score),
+            flags=list(dict.fromkeys(flags)),
+            total_points=total_points,
+            tx_points=tx_points,
+        )
+
+
+# ── Rule templates ──
+# Each template is (pattern, builder). The builder receives the regex match and
+# returns (predicate, group).
+
+def _amount_multiple(m: re.Match):
+    k = float(m.group(1))
+
+    def predicate(i, ptx, ctx):
+        avg = ctx.baseline.avg_tx_amount_usd
+        if avg > 0 and ptx.transaction_amount_usd > k * avg:
+            return f"Single tx ${ptx.transaction_amount_usd:,.0f} > {k:g}× avg ${avg:,.0f}"
+        return None
+
+    return predicate, "amount_multiple"
+
+
+def _amount_absolute(m: re.Match):
+    limit = _parse_amount(m.group(1), m.group(2))
+
+    def predicate(i, ptx, ctx):
+        if ptx.transaction_amount_usd > limit:
+            return f"Single tx ${ptx.transaction_amount_usd:,.0f} exceeds ${limit:,.0f}"
+        return None
+
+    return predicate, "amount_absolute"
+
+
+def _daily_total_multiple(m: re.Match):
+    k = float(m.group(1))
+
+    def predicate(i, ptx, ctx):
+        avg = ctx.baseline.avg_daily_total_usd
+        if avg > 0 and ptx.daily_total_usd > k * avg:
+            return f"Daily total ${ptx.daily_total_usd:,.0f} > {k:g}× avg daily ${avg:,.0f}"
+        return None
+
+    return predicate, "daily_total_multiple"
+
+
+def _burst(m: re.Match):
+    count = int(float(m.group(1)))
+    window_sec = float(m.group(2)) * 60
+
+    def predicate(i, ptx, ctx):
+        n = ctx.count_in_window(i, window_sec)
+        if n >= count:
+            return f"Burst: {n} tx within {window_sec / 60:g} min"
+        return None
+
+    return predicate, "burst"
+
+
+def _frequency_multiple(m: re.Match):
+    k = float(m.group(1))
+
+    def predicate(i, ptx, ctx):
+        avg = ctx.baseline.avg_tx_per_day
+        if avg > 0 and ptx.tx_count_per_day > k * avg:
+            return f"Frequency spike: {ptx.tx_count_per_day} tx/day > {k:g}× avg {avg}"
+        return None
+
+    return predicate, "frequency"
+
+
+def _frequency_absolute(m: re.Match):
+    limit = int(float(m.group(1)))
+
+    def predicate(i, ptx, ctx):
+        if ptx.tx_count_per_day > limit:
+            return f"{ptx.tx_count_per_day} tx in one day exceeds {limit}"
+        return None
+
+    return predicate, "frequency"
+
+
+def _new_country(m: re.Match):
+    def predicate(i, ptx, ctx):
+        if ptx.is_new_country:
+            return f"New country {ptx.transaction_country} never seen in history"
+        return None
+
+    return predicate, "new_country"
+
+
+def _geo_hop_distance_km(ptx) -> float:
+    """
+    Country-level (capital-to-capital) distance of a move, which is what the
+    geo-hop rule judges. City coordinates put ordinary same-day trips such as
+    Valletta -> Milan or Riyadh -> Jeddah over the speed limit; the city
+    distance stays on the row for prompts and reports.
+    """
+    if ptx.distance_km <= 0:
+        return 0.0
+    return get_distance_between_countries(ptx.previous_country, ptx.transaction_country)
+
+
+def _geo_hop(m: re.Match):
+    def predicate(i, ptx, ctx):
+        distance_km = _geo_hop_distance_km(ptx)
+        if distance_km > GEO_HOP_MIN_DISTANCE_KM and ptx.time_since_last_sec > 0:
+            min_hours = calculate_min_travel_hours(distance_km)
+            if ptx.actual_travel_hours < min_hours:
+                speed = distance_km / max(ptx.actual_travel_hours, 0.01)
+                return f"Impossible geo hop: {speed:,.0f} km/h exceeds 800 km/h threshold"
+        return None
+
+    return predicate, "geo_hop"
+
+
+def _structuring(m: re.Match):
+    threshold = STRUCTURING_DEFAULT_THRESHOLD_USD
+    amount = re.search(r"[$€£]\s*([\d,]+(?:\.\d+)?)\s*(k)?", m.string)
+    if amount:
+        threshold = _parse_amount(amount.group(1), amount.group(2))
+    floor = threshold * STRUCTURING_BAND
+
+    # Judged once per day on its final total: a day merely passing through the
+    # band on its way above the threshold is not structuring.
+    def predicate(i, ptx, ctx):
+        if ctx.is_day_end(i) and floor <= ptx.daily_total_usd < threshold:
+            return f"Structuring: daily total ${ptx.daily_total_usd:,.0f} just below ${threshold:,.0f}"
+        return None
+
+    return predicate, "structuring"
+
+
+def _sanctions(m: re.Match):
+    def predicate(i, ptx, ctx):
+        if ptx.transaction_country in SANCTIONED_COUNTRIES:
+            return f"Sanctioned jurisdiction {ptx.transaction_country}"
+        return None
+
+    return predicate, "sanctions"
+
+
+def _profile_volume(m: re.Match):
+    def predicate(i, ptx, ctx):
+        avg = ctx.baseline.avg_daily_total_usd
+        if avg > 0 and ptx.daily_total_usd > PROFILE_VOLUME_MULTIPLE * avg:
+            return (
+                f"Daily volume ${ptx.daily_total_usd:,.0f} > {PROFILE_VOLUME_MULTIPLE:g}× avg daily "
+                f"${avg:,.0f}, inconsistent with profile"
+            )
+        return None
+
+    return predicate, "daily_total_multiple"
+
+
+RULE_TEMPLATES: list[tuple[re.Pattern, Callable]] = [
+    (re.compile(r"single (?:tx|transaction).*?>\s*" + _NUM + _MULT), _amount_multiple),
+    (re.compile(r"single (?:tx|transaction).*?(?:>|exceed\w*|over|above)\s*[$€£]\s*([\d,]+(?:\.\d+)?)\s*(k)?"), _amount_absolute),
+    (re.compile(r"daily (?:total|volume|amount).*?>\s*" + _NUM + _MULT), _daily_total_multiple),
+    (re.compile(r"[≥>]=?\s*" + _NUM + r"\s*(?:tx|transactions?)\s*(?:in|within)\s*[≤<]=?\s*" + _NUM + r"\s*min"), _burst),
+    (re.compile(r"(?:tx|transactions?)\s*(?:per|/)\s*day.*?>\s*" + _NUM + _MULT), _frequency_multiple),
+    (re.compile(r"more than\s*" + _NUM + r"\s*(?:tx|transactions?)\s*(?:in|per)\s*(?:a\s*)?(?:single\s*)?day"), _frequency_absolute),
+    (re.compile(r"impossible|geo[\s-]?hop|rapid country switching"), _geo_hop),
+    (re.compile(r"new country"), _new_country),
+    (re.compile(r"structuring|smurfing"), _structuring),
+    (re.compile(r"sanction"), _sanctions),
+    (re.compile(r"inconsistent with (?:the\s*)?(?:declared\s*)?profile"), _profile_volume),
+]
+
+
+def _parse_amount(number: str, thousands_suffix: str | None) -> float:
+    value = float(number.replace(",", ""))
+    return value * 1000 if thousands_suffix else value
+
+
+def compile_rulebook(rulebook: Rulebook) -> CompiledRulebook:
+    compiled: list[CompiledRule] = []
+    unmatched: list[str] = []
+
+    for entry in rulebook.risk_score.get("rules", []):
+        if not isinstance(entry, dict):
+            continue
+        text = str(entry.get("rule", ""))
+        try:
+            points = int(entry.get("points", 0))
+        except (TypeError, ValueError):
+            unmatched.append(text)
+            continue
+
+        lowered = text.lower()
+        for pattern, builder in RULE_TEMPLATES:
+            m = pattern.search(lowered)
+            if m:
+                predicate, group = builder(m)
+                compiled.append(
+                    CompiledRule(
+                        category=str(entry.get("category", "")),
+                        rule=text,
+                        points=points,
+                        predicate=predicate,
+                        group=group,
+                    )
+                )
+                break
+        else:
+            unmatched.append(text)
+
+    if unmatched:
+        logger.info(f"Rule engine: {len(unmatched)} rules have no deterministic template: {unmatched}")
+
+    return CompiledRulebook(rules=tuple(compiled), unmatched=tuple(unmatched))
+
+
+_compiled_cache: OrderedDict[tuple[str, str, str], CompiledRulebook] = OrderedDict()
+_compiled_cache_lock = threading.Lock()
+
+
+def get_compiled_rulebook(
+    rulebook: Rulebook,
+    jurisdiction_code: str,
+    version: str | None = None,
+) -> CompiledRulebook:
+    """
+    Return the compiled form of `rulebook`, compiling it at most once per
+    (jurisdiction_code, version, hash of the scoring rules). The hash keeps a
+    rulebook edited without a version bump from reusing stale rules.
+    """
+    digest = hashlib.sha1(
+        json.dumps(rulebook.risk_score.get("rules", []), sort_keys=True, default=str).encode()
+    ).hexdigest()
+    key = (jurisdiction_code.upper(), version or "", digest)
+
+    with _compiled_cache_lock:
+        compiled = _compiled_cache.get(key)
+        if compiled is not None:
+            _compiled_cache.move_to_end(key)
+            return compiled
+
+    compiled = compile_rulebook(rulebook)
+    with _compiled_cache_lock:
+        _compiled_cache[key] = compiled
+        while len(_compiled_cache) > COMPILED_CACHE_SIZE:
+            _compiled_cache.popitem(last=False)
+    return compiled
@@ -0,0 +1,220 @@
+"""Buffered agent-trace persistence.
+
+Trace writes (the trace row, each agent step, the final status) are queued
+without blocking and written by a few background flushers. Each flusher drains
+its queue in batches, so one PostgREST round-trip covers many traces' steps
+and the request path never waits on the database.
+"""
+
+import os
+import asyncio
+import logging
+import uuid
+import zlib
+
+from models.agent_log import AgentLogEntry
+from utils import database as db
+from utils.async_database import run_db
+
+logger = logging.getLogger(__name__)
+
+TRACE_QUEUE_MAX = int(os.getenv("TRACE_QUEUE_MAX", "1000"))
+TRACE_FLUSHERS = int(os.getenv("TRACE_FLUSHERS", "4"))
+TRACE_BATCH_MAX = int(os.getenv("TRACE_BATCH_MAX", "200"))
+TRACE_SHUTDOWN_TIMEOUT_SEC = float(os.getenv("TRACE_SHUTDOWN_TIMEOUT_SEC", "10"))
+
+_STOP = object()
+
+
+class TraceWriter:
+    """
+    Background flushers for trace writes.
+
+    Writes are routed to one of TRACE_FLUSHERS queues by trace id, so all
+    writes of a trace stay in submission order (its insert lands before its
+    steps and its completion) while different traces flush concurrently. A
+    flusher takes up to TRACE_BATCH_MAX queued writes at a time and sends them
+    as one insert of new traces, one insert of steps, then the completions.
+
+    Queues are bounded and never block the caller: when one is full the write
+    is dropped and logged.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = TRACE_QUEUE_MAX,
+        flushers: int = TRACE_FLUSHERS,
+        batch_max: int = TRACE_BATCH_MAX,
+    ):
+        self._max_queue = max_queue
+        self._flushers = max(flushers, 1)
+        self._batch_max = max(batch_max, 1)
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        self.dropped = 0
+
+    @property
+    def _running(self) -> bool:
+        return bool(self._tasks) and not all(task.done() for task in self._tasks)
+
+    def _ensure_started(self) -> None:
+        if self._running:
+            return
+        per_queue = max(self._max_queue // self._flushers, 1)
+        self._queues = [asyncio.Queue(maxsize=per_queue) for _ in range(self._flushers)]
+        self._tasks = [asyncio.create_task(self._run(queue)) for queue in self._queues]
+
+    def _put(self, trace_id: str, kind: str, payload) -> None:
+        self._ensure_started()
+        queue = self._queues[zlib.crc32(trace_id.encode()) % len(self._queues)]
+        try:
+            queue.put_nowait((kind, payload))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Trace queue full, dropped {kind} write for trace {trace_id}")
+
+    def create(self, trace: dict) -> None:
+        self._put(trace["id"], "create", trace)
+
+    def steps(self, trace_id: str, steps: list[dict]) -> None:
+        if steps:
+            self._put(trace_id, "steps", steps)
+
+    def complete(self, trace_id: str, result: dict | None = None, failed: bool = False) -> None:
+        self._put(trace_id, "complete", (trace_id, result, failed))
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self._batch_max and not queue.empty():
+                batch.append(queue.get_nowait())
+            stop = any(item is _STOP for item in batch)
+            try:
+                await self._write([item for item in batch if item is not _STOP])
+            finally:
+                for _ in batch:
+                    queue.task_done()
+            if stop:
+                return
+
+    async def _write(self, batch: list[tuple[str, object]]) -> None:
+        creates = [payload for kind, payload in batch if kind == "create"]
+        steps = [step for kind, payload in batch if kind == "steps" for step in payload]
+        completes = [payload for kind, payload in batch if kind == "complete"]
+        if creates:
+            await self._attempt(f"insert of {len(creates)} traces", db.create_agent_traces, creates)
+        if steps:
+            await self._attempt(f"insert of {len(steps)} steps", db.save_agent_steps, steps)
+        for trace_id, result, failed in completes:
+            await self._attempt(
+                f"completion of {trace_id}", db.complete_agent_trace, trace_id, result=result, failed=failed
+            )
+
+    async def _attempt(self, what: str, fn, *args, **kwargs) -> None:
+        try:
+            await run_db(fn, *args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Trace write failed ({what}): {e}")
+
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    async def flush(self) -> None:
+        if self._running:
+            await asyncio.gather(*(queue.join() for queue in self._queues))
+
+    async def shutdown(self, timeout: float = TRACE_SHUTDOWN_TIMEOUT_SEC) -> None:
+        """Drain pending writes and stop the flushers (call on app shutdown)."""
+        if not self._running:
+            return
+        for queue in self._queues:
+            await queue.put(_STOP)
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        if pending:
+            logger.warning(
+                f"Trace writer shutdown timed out with {self.queue_depth()} writes pending"
+            )
+            for task in pending:
+                task.cancel()
+        self._tasks = []
+
+
+_writer: TraceWriter | None = None
+
+
+def get_trace_writer() -> TraceWriter:
+    global _writer
+    if _writer is None:
+        _writer = TraceWriter()
+    return _writer
+
+
+class TraceRecorder:
+    """
+    Records one agent trace through the shared TraceWriter.
+
+    The trace row is queued on `start`, each step as soon as it is recorded
+    (so progress polling sees a running trace fill in), and the final status
+    on `complete`. Workflows must reach `complete` on every path; a trace left
+    unfinished stays "running".
+    """
+
+    def __init__(
+        self,
+        trace_type: str,
+        user_id: str | None = None,
+        jurisdiction_code: str | None = None,
+        writer: TraceWriter | None = None,
+    ):
+        self.trace_id = str(uuid.uuid4())
+        self.trace_type = trace_type
+        self.user_id = user_id
+        self.jurisdiction_code = jurisdiction_code
+        self._writer = writer or get_trace_writer()
+        self._step_count = 0
+        self._completed = False
+
+    async def start(self) -> str:
+        self._writer.create(
+            {
+                "id": self.trace_id,
+                "trace_type": self.trace_type,
+                "user_id": self.user_id,
+                "jurisdiction_code": self.jurisdiction_code,
+            }
+        )
+        return self.trace_id
+
+    def record(
+        self,
+        log: AgentLogEntry,
+        output: dict | None = None,
+    ) -> None:
+        self._step_count += 1
+        self._writer.steps(
+            self.trace_id,
+            [
+                {
+                    "trace_id": self.trace_id,
+                    "step_order": self._step_count,
+                    "agent": log.agent,
+                    "icon": log.icon,
+                    "status": log.status,
+                    "message": log.message,
+                    "duration_ms": log.duration_ms,
+                    "retry_count": log.retry_count,
+                    "retry_type": log.retry_type,
+                    "output": output,
+                }
+            ],
+        )
+
+    @property
+    def completed(self) -> bool:
+        return self._completed
+
+    async def complete(self, result: dict | None = None, failed: bool = False) -> None:
+        if self._completed:
+            return
+        self._completed = True
+        self._writer.complete(self.trace_id, result=result, failed=failed)
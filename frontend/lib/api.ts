@@ -1,11 +1,19 @@
 import type {
+  AgentStreamHandlers,
+  AnalysisJob,
+  AnalysisJobStatus,
+  BulkIngestRequest,
+  BulkIngestResponse,
   InitResponse,
   FullAnalysisResponse,
   ComplianceData,
   CompliancePushResponse,
   ComplianceDraft,
+  ImpactSimulation,
   IngestBatchRequest,
   Rulebook,
+  TransactionHistoryCursor,
+  TransactionHistoryPage,
 } from "./types";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
@@ -27,10 +35,84 @@ async function fetchApi<T>(url: string, options?: RequestInit): Promise<T> {
   return response.json();
 }
 
+// Reads a text/event-stream response from the streaming workflow endpoints,
+// dispatching progress events (`trace`/`step`, or `job`/`user` for bulk
+// ingest) and resolving with the `result` event.
+async function streamApi<T>(
+  url: string,
+  body: unknown,
+  handlers: AgentStreamHandlers
+): Promise<T> {
+  const response = await fetch(`${API_URL}${url}`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Accept: "text/event-stream",
+    },
+    body: JSON.stringify(body),
+  });
+
+  if (!response.ok || !response.body) {
+    const error = await response.text();
+    throw new Error(`API error ${response.status}: ${error}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary: number;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+      if (event === "trace") handlers.onTrace?.(payload.trace_id);
+      else if (event === "step") handlers.onStep?.(payload);
+      else if (event === "job") handlers.onJob?.(payload);
+      else if (event === "user") handlers.onUser?.(payload);
+      else if (event === "result") return payload as T;
+      else if (event === "error") {
+        throw new Error(`API error ${payload.status_code}: ${JSON.stringify(payload.detail)}`);
+      }
+    }
+  }
+
+  throw new Error("Stream ended without a result");
+}
+
 export async function getInit(): Promise<InitResponse> {
   return fetchApi<InitResponse>("/api/init");
 }
 
+export async function getTransactionHistory(
+  userId: string,
+  cursor?: TransactionHistoryCursor | null,
+  limit = 100
+): Promise<TransactionHistoryPage> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) {
+    params.set("before", cursor.before);
+    params.set("before_id", String(cursor.before_id));
+  }
+  return fetchApi<TransactionHistoryPage>(
+    `/api/users/${userId}/transactions?${params.toString()}`
+  );
+}
+
 export async function getCompliance(jurisdictionCode: string): Promise<ComplianceData> {
   return fetchApi<ComplianceData>(`/api/compliance/${jurisdictionCode}`);
 }
@@ -63,6 +145,32 @@ export async function pushCompliance(
   );
 }
 
+export async function ingestBatchStream(
+  request: IngestBatchRequest,
+  handlers: AgentStreamHandlers
+): Promise<FullAnalysisResponse> {
+  return streamApi<FullAnalysisResponse>("/api/ingest-batch/stream", request, handlers);
+}
+
+export async function bulkIngestStream(
+  request: BulkIngestRequest,
+  handlers: AgentStreamHandlers
+): Promise<BulkIngestResponse> {
+  return streamApi<BulkIngestResponse>("/api/ingest-batch/bulk/stream", request, handlers);
+}
+
+export async function pushComplianceStream(
+  jurisdictionCode: string,
+  regulationUpdateId: string,
+  handlers: AgentStreamHandlers
+): Promise<CompliancePushResponse> {
+  return streamApi<CompliancePushResponse>(
+    `/api/compliance/${jurisdictionCode}/push/stream`,
+    { regulation_update_id: regulationUpdateId },
+    handlers
+  );
+}
+
 export async function getDrafts(
   jurisdictionCode?: string
 ): Promise<{ drafts: ComplianceDraft[] }> {
@@ -72,6 +180,16 @@ export async function getDrafts(
   return fetchApi<{ drafts: ComplianceDraft[] }>(url);
 }
 
+export async function getDraftImpact(
+  draftId: string,
+  days?: number
+): Promise<ImpactSimulation> {
+  const url = days !== undefined
+    ? `/api/drafts/${draftId}/impact?days=${days}`
+    : `/api/drafts/${draftId}/impact`;
+  return fetchApi<ImpactSimulation>(url);
+}
+
 export async function approveDraft(
   draftId: string,
   editedRulebook?: Rulebook
@@ -86,3 +204,39 @@ export async function approveDraft(
     }
   );
 }
+
+export async function submitIngestBatchJob(request: IngestBatchRequest): Promise<AnalysisJob> {
+  return fetchApi<AnalysisJob>("/api/jobs/ingest-batch", {
+    method: "POST",
+    body: JSON.stringify(request),
+  });
+}
+
+export async function submitBulkIngestJob(request: BulkIngestRequest): Promise<AnalysisJob> {
+  return fetchApi<AnalysisJob>("/api/jobs/ingest-batch/bulk", {
+    method: "POST",
+    body: JSON.stringify(request),
+  });
+}
+
+export async function submitPushComplianceJob(
+  jurisdictionCode: string,
+  regulationUpdateId: string
+): Promise<AnalysisJob> {
+  return fetchApi<AnalysisJob>(`/api/jobs/compliance/${jurisdictionCode}/push`, {
+    method: "POST",
+    body: JSON.stringify({ regulation_update_id: regulationUpdateId }),
+  });
+}
+
+export async function getJob(jobId: string): Promise<AnalysisJobStatus> {
+  return fetchApi<AnalysisJobStatus>(`/api/jobs/${jobId}`);
+}
+
+export async function cancelJob(jobId: string): Promise<AnalysisJob> {
+  return fetchApi<AnalysisJob>(`/api/jobs/${jobId}/cancel`, { method: "POST" });
+}
+
+export async function retryJob(jobId: string): Promise<AnalysisJob> {
+  return fetchApi<AnalysisJob>(`/api/jobs/${jobId}/retry`, { method: "POST" });
+}
@@ -102,6 +102,17 @@ export interface InitResponse {
   users: UserWithState[];
 }
 
+export interface TransactionHistoryCursor {
+  before: string;
+  before_id: number;
+}
+
+export interface TransactionHistoryPage {
+  user_id: string;
+  transactions: RawTransaction[];
+  next_cursor: TransactionHistoryCursor | null;
+}
+
 export interface FullAnalysisResponse {
   user_id: string;
   user_name: string;
@@ -161,6 +172,40 @@ export interface ComplianceDraft {
   reviewed_at?: string;
 }
 
+export interface UserBandChange {
+  user_id: string;
+  old_band: RiskBand;
+  new_band: RiskBand;
+  old_score: number;
+  new_score: number;
+}
+
+export interface ImpactSimulation {
+  draft_id: string;
+  jurisdiction_code: string;
+  proposed_version: string;
+  history_since?: string | null;
+  users: number;
+  transactions: number;
+  days_scored: number;
+  users_band_changed: number;
+  users_escalated: number;
+  users_deescalated: number;
+  transactions_band_changed: number;
+  transactions_flagged_old: number;
+  transactions_flagged_new: number;
+  user_bands_old: Record<RiskBand, number>;
+  user_bands_new: Record<RiskBand, number>;
+  user_band_transitions: Record<string, number>;
+  transaction_band_transitions: Record<string, number>;
+  top_changes: UserBandChange[];
+  unmatched_rules_old: string[];
+  unmatched_rules_new: string[];
+  partitions: number;
+  workers: number;
+  duration_ms: number;
+}
+
 export interface IngestBatchRequest {
   user_id: string;
   num_transactions: number;
@@ -172,3 +217,66 @@ export interface IngestBatchRequest {
     transaction_currency?: string;
   };
 }
+
+export interface BulkIngestRequest
+  extends Partial<Omit<IngestBatchRequest, "user_id">> {
+  user_ids?: string[];
+  jurisdiction_code?: string;
+  concurrency?: number;
+}
+
+export interface BulkUserResult {
+  user_id: string;
+  status: "success" | "error";
+  risk_score?: number;
+  risk_band?: RiskBand;
+  risk_profile?: "low" | "medium" | "high";
+  flags: string[];
+  trace_id?: string;
+  duration_ms: number;
+  error?: string;
+}
+
+export interface BulkIngestResponse {
+  job_id: string;
+  jurisdiction_code?: string;
+  rulebook_versions: Record<string, string>;
+  concurrency: number;
+  total_users: number;
+  succeeded: number;
+  failed: number;
+  band_counts: Record<RiskBand, number>;
+  avg_risk_score?: number;
+  duration_ms: number;
+  results: BulkUserResult[];
+}
+
+export interface AgentStreamHandlers {
+  onTrace?: (traceId: string) => void;
+  onStep?: (step: AgentLogEntry) => void;
+  onJob?: (job: { job_id: string; total_users: number; concurrency: number }) => void;
+  onUser?: (result: BulkUserResult) => void;
+}
+
+export type JobKind = "ingest_batch" | "bulk_ingest" | "compliance_push";
+
+export interface AnalysisJob {
+  id: string;
+  kind: JobKind;
+  priority: number;
+  status: "queued" | "running" | "completed" | "failed" | "cancelled";
+  payload: Record<string, unknown>;
+  trace_id?: string;
+  result?: FullAnalysisResponse | BulkIngestResponse | CompliancePushResponse;
+  error?: string;
+  attempts: number;
+  created_at: string;
+  started_at?: string;
+  completed_at?: string;
+}
+
+export interface AnalysisJobStatus {
+  job: AnalysisJob;
+  trace?: Record<string, unknown>;
+  steps: AgentLogEntry[];
+}